@@ -1,15 +1,27 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 import json
 import os
+import itertools
 import threading
 import time
 from datetime import datetime, timedelta
 import logging
 import traceback
 
+from storage import FileSnapshot, HistoricalStore, CitizenReportLog, JobStore, ProcessLock
+from spatial_index import GridIndex, parse_bbox
+from heatmap import build_heatmap_pyramid, DEFAULT_HEATMAP_ZOOM
+from incident_stats import IncidentStats, BUCKETS
+from incident_identity import IncidentIdentity, FINGERPRINT_KEY, unique_incidents, entry_with_fingerprints
+from http_cache import VersionedResponseCache
+from event_stream import VersionBroadcaster
+from pipeline_jobs import PipelineJobs, PipelineBusy
+from scheduler import PipelineScheduler
+from metrics import REGISTRY, merge_families, load_snapshots, render as render_metrics
+
 # Importamos el grafo de LangGraph
 try:
-    from gguard import graph, State, supervisor_agent, scraper_agent, router_agent, reporter_agent
+    from gguard import graph, State, supervisor_agent, scraper_agent, router_agent, reporter_agent, set_security_data_publisher
 except ImportError:
     print("No se pudo importar LangGraph. Asegúrate de tener el archivo langgraph_security.py en el mismo directorio.")
 
@@ -23,6 +35,8 @@ app = Flask(__name__)
 
 # Almacenamiento para datos históricos
 HISTORICAL_DATA_FILE = "historical_data.json"
+HISTORICAL_DB_FILE = os.getenv("HISTORICAL_DB_FILE", "historical_data.db")
+HISTORY_MAX_ENTRIES = int(os.getenv("HISTORY_MAX_ENTRIES", 100))
 CURRENT_DATA_FILE = "security_data.json"
 UPDATE_INTERVAL = 600  # 10 minutos en segundos
 
@@ -36,189 +50,243 @@ current_data = {
     "reports": {}
 }
 
-historical_data = []
+# Historial en SQLite indexado por timestamp (sustituye a la lista completa en memoria)
+history_store = HistoricalStore(HISTORICAL_DB_FILE, max_entries=HISTORY_MAX_ENTRIES)
+
+# Copia en memoria de security_data.json; se recarga solo cuando el pipeline publica una versión nueva.
+# En el proceso que ejecuta el pipeline el reporter la publica directamente; los demás
+# workers detectan la versión nueva por el stat del archivo
+security_snapshot = FileSnapshot(CURRENT_DATA_FILE, default=current_data)
+
+# Migración que guarda las huellas SimHash que falten en el historial; solo un worker a la vez la ejecuta
+history_fingerprints_lock = ProcessLock(f"{HISTORICAL_DB_FILE}.huellas.lock")
+HISTORY_FINGERPRINTS_VERSION = 1
+MISSING_FINGERPRINTS = (
+    "EXISTS (SELECT 1 FROM json_each(data, '$.incidents') "
+    f"WHERE json_type(value, '$.{FINGERPRINT_KEY}') IS NULL)"
+)
 
-# Función para cargar datos históricos
+# Función para preparar el almacén de datos históricos
 def load_historical_data():
-    global historical_data
     try:
-        if os.path.exists(HISTORICAL_DATA_FILE):
-            with open(HISTORICAL_DATA_FILE, 'r', encoding='utf-8') as f:
-                historical_data = json.load(f)
-            logger.info(f"Datos históricos cargados: {len(historical_data)} registros")
-        else:
-            historical_data = []
-            logger.info("No hay archivo de datos históricos, se inicia con lista vacía")
+        # Migrar el antiguo historical_data.json la primera vez que se usa el almacén
+        history_store.import_json(HISTORICAL_DATA_FILE)
+        logger.info(f"Datos históricos disponibles: {history_store.count()} registros")
+        # Registros guardados sin la huella de sus incidentes (importados o de versiones anteriores);
+        # una vez migrado el almacén, arrancar solo consulta su versión
+        if history_store.schema_version() < HISTORY_FINGERPRINTS_VERSION and history_fingerprints_lock.acquire():
+            try:
+                updated = history_store.migrate(HISTORY_FINGERPRINTS_VERSION, entry_with_fingerprints,
+                                                where=MISSING_FINGERPRINTS)
+                if updated:
+                    logger.info(f"Huellas SimHash guardadas en {updated} registros históricos")
+            finally:
+                history_fingerprints_lock.release()
     except Exception as e:
         logger.error(f"Error al cargar datos históricos: {str(e)}")
-        historical_data = []
 
-# Función para guardar datos históricos
-def save_historical_data():
+# Función para guardar un nuevo registro histórico
+def save_historical_data(entry):
     try:
-        with open(HISTORICAL_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(historical_data, f, ensure_ascii=False, indent=2)
-        logger.info(f"Datos históricos guardados: {len(historical_data)} registros")
+        # La huella de cada incidente se guarda con él para no recalcularla al deduplicar el historial
+        entry = entry_with_fingerprints(entry) or entry
+        with incident_stats_lock:
+            in_sync = incident_stats_version["history"] == history_store.version()
+            pruned = history_store.append(entry)
+            # Actualizar los contadores con el registro nuevo y los que salieron del historial
+            if in_sync:
+                incident_stats.add_entry(entry)
+                for old_entry in pruned:
+                    incident_stats.remove_entry(old_entry)
+                incident_stats_version["history"] = history_store.version()
+        logger.info(f"Datos históricos guardados: {history_store.count()} registros")
     except Exception as e:
         logger.error(f"Error al guardar datos históricos: {str(e)}")
 
-# Función para cargar datos actuales
-def load_current_data():
+# Contadores de incidentes por tipo, gravedad y periodo para /api/incident_types
+incident_stats = IncidentStats()
+incident_stats_version = {"history": None}
+incident_stats_lock = threading.Lock()
+
+def sync_incident_stats():
+    # Recontar el historial solo si otro proceso lo modificó; los reportes ciudadanos
+    # se cuentan conforme el registro los lee
+    citizen_log.version()
+    with incident_stats_lock:
+        version = history_store.version()
+        if version != incident_stats_version["history"]:
+            incident_stats.reset("system")
+            for entry in history_store.iter_all():
+                incident_stats.add_entry(entry)
+            incident_stats_version["history"] = version
+    return incident_stats
+
+# Función para cargar datos actuales (desde la copia en memoria, sin leer el archivo en cada petición)
+def load_current_data(force=False):
     global current_data
-    try:
-        if os.path.exists(CURRENT_DATA_FILE):
-            with open(CURRENT_DATA_FILE, 'r', encoding='utf-8') as f:
-                current_data = json.load(f)
-            logger.info(f"Datos actuales cargados, timestamp: {current_data.get('timestamp', 'desconocido')}")
-        else:
-            logger.warning("No hay archivo de datos actuales")
-    except Exception as e:
-        logger.error(f"Error al cargar datos actuales: {str(e)}")
+    snapshot = security_snapshot.reload() if force else security_snapshot.get()
+    current_data = snapshot.data
+    if force:
+        logger.info(f"Datos actuales cargados, timestamp: {current_data.get('timestamp', 'desconocido')}")
+    return current_data
 
-# Función para ejecutar el grafo de LangGraph
-def run_langgraph_analysis():
+# Función para ejecutar el grafo de LangGraph; ``progress`` recibe el nombre de cada nodo al terminar
+def run_langgraph_analysis(progress=None):
     try:
         logger.info("Iniciando análisis con LangGraph...")
         initial_state = {"start_signal": "Y", "raw_data": None, "all_incidents": []}
-        result = graph.invoke(initial_state)
+        for update in graph.stream(initial_state, stream_mode="updates"):
+            for node in update:
+                logger.info(f"Etapa completada: {node}")
+                if progress:
+                    progress(node)
         logger.info("Análisis con LangGraph completado")
         
-        # Cargar los datos generados por LangGraph
-        load_current_data()
+        # Publicar los datos generados por LangGraph
+        load_current_data(force=True)
         
         # Añadir datos actuales al historial evitando duplicados
         if current_data and current_data.get("timestamp") and current_data.get("incidents"):
             # Verificar si los incidentes son realmente nuevos (no solo por timestamp)
             is_new_data = True
             
-            # Crear un conjunto de "huellas digitales" de incidentes actuales
-            current_incident_signatures = set()
-            for incident in current_data.get("incidents", []):
-                # Garantizar que todos los valores son strings antes de usar slicing
-                titulo = str(incident.get('titulo', '')) if incident.get('titulo') is not None else ''
-                lugar = str(incident.get('lugar', '')) if incident.get('lugar') is not None else ''
-                tipo = str(incident.get('tipo', '')) if incident.get('tipo') is not None else ''
-                
-                # Crear una firma única combinando título, lugar y tipo
-                # Garantizar que todos los valores son strings antes de usar slicing
-                titulo = str(incident.get('titulo', '')) if incident.get('titulo') is not None else ''
-                lugar = str(incident.get('lugar', '')) if incident.get('lugar') is not None else ''
-                tipo = str(incident.get('tipo', '')) if incident.get('tipo') is not None else ''
-                                
-                # Crear una firma única combinando título, lugar y tipo
-                signature = f"{titulo[:50]}|{lugar[:30]}|{tipo}"
-                current_incident_signatures.add(signature)
-            
-            # Verificar los últimos 3 registros históricos para evitar duplicados recientes
-            for recent_entry in historical_data[:3]:
-                recent_signatures = set()
+            # Índice de identidad con los incidentes de los últimos 3 registros históricos
+            recent_identity = IncidentIdentity()
+            for recent_entry in history_store.latest(3):
                 for incident in recent_entry.get("incidents", []):
-                    titulo = str(incident.get('titulo', '')) if incident.get('titulo') is not None else ''
-                    lugar = str(incident.get('lugar', '')) if incident.get('lugar') is not None else ''
-                    tipo = str(incident.get('tipo', '')) if incident.get('tipo') is not None else ''
-                                    
-                    # Crear una firma única combinando título, lugar y tipo
-                    signature = f"{titulo[:50]}|{lugar[:30]}|{tipo}"
-                    recent_signatures.add(signature)
-                
-                # Si más del 80% de los incidentes son iguales, considerar como duplicado
-                if recent_signatures and len(current_incident_signatures.intersection(recent_signatures)) / len(current_incident_signatures) > 0.8:
-                    is_new_data = False
-                    logger.info("Datos similares ya existen en el historial reciente, no se añadirán")
-                    break
+                    recent_identity.add(incident)
+            
+            # Si más del 80% de los incidentes ya se vieron recientemente, considerar como duplicado
+            current_incidents = current_data.get("incidents", [])
+            repeated = sum(1 for incident in current_incidents if incident in recent_identity)
+            if len(recent_identity) and repeated / len(current_incidents) > 0.8:
+                is_new_data = False
+                logger.info("Datos similares ya existen en el historial reciente, no se añadirán")
             
             # Si son datos nuevos, añadirlos al historial
             if is_new_data:
-                historical_data.insert(0, current_data.copy())  # Añadir al principio (más reciente)
-                # Mantener solo los últimos 100 registros para evitar que el archivo crezca demasiado
-                if len(historical_data) > 100:
-                    historical_data.pop()
-                save_historical_data()
+                # El almacén conserva solo los últimos HISTORY_MAX_ENTRIES registros
+                save_historical_data(current_data)
+                # Precalcular el mapa de calor con el nuevo registro
+                get_heatmap_pyramid()
                 logger.info("Nuevos datos añadidos al historial")
         
+        # Avisar a los navegadores conectados al canal de eventos
+        update_broadcaster.notify()
+        
         return True
     except Exception as e:
         logger.error(f"Error al ejecutar LangGraph: {str(e)}")
         logger.error(traceback.format_exc())
         return False
+    finally:
+        publish_metrics_snapshot()
 
-# Función para actualización periódica
-def periodic_update():
-    while True:
-        try:
-            logger.info("Iniciando actualización periódica...")
-            run_langgraph_analysis()
-            logger.info(f"Actualización completada. Próxima actualización en {UPDATE_INTERVAL} segundos")
-            time.sleep(UPDATE_INTERVAL)
-        except Exception as e:
-            logger.error(f"Error en actualización periódica: {str(e)}")
-            logger.error(traceback.format_exc())
-            time.sleep(60)  # Esperar un minuto antes de reintentar en caso de error
+# Métricas de este proceso para /metrics; el proceso que ejecuta el pipeline deja una copia
+# en METRICS_SNAPSHOT_DIR para que cualquier worker las incluya
+METRICS_SNAPSHOT_DIR = os.getenv("METRICS_SNAPSHOT_DIR", "metrics_snapshots")
+
+def publish_metrics_snapshot():
+    try:
+        os.makedirs(METRICS_SNAPSHOT_DIR, exist_ok=True)
+        REGISTRY.write_snapshot(os.path.join(METRICS_SNAPSHOT_DIR, f"{os.getpid()}.json"))
+    except Exception as e:
+        logger.error(f"No se pudieron guardar las métricas: {str(e)}")
+
+# Ejecuciones del pipeline en segundo plano: una a la vez en todos los workers, compartidas
+# entre el botón de actualización y la actualización periódica
+PIPELINE_JOBS_DB_FILE = os.getenv("PIPELINE_JOBS_DB_FILE", "pipeline_jobs.db")
+PIPELINE_LOCK_FILE = os.getenv("PIPELINE_LOCK_FILE", "pipeline.lock")
+SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE", "scheduler.lock")
+# Con SCHEDULER_ENABLED=0 (p. ej. en pruebas de carga) los workers solo atienden peticiones
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+
+def pipeline_stages():
+    try:
+        return [node for node in graph.nodes if not node.startswith("__")]
+    except NameError:
+        return []
+
+pipeline_jobs = PipelineJobs(
+    run_langgraph_analysis,
+    stages=pipeline_stages(),
+    store=JobStore(PIPELINE_JOBS_DB_FILE),
+    lock=ProcessLock(PIPELINE_LOCK_FILE)
+)
+
+# Actualización periódica: solo el worker que obtiene el bloqueo del planificador ejecuta el pipeline
+scheduler = PipelineScheduler(
+    pipeline_jobs,
+    interval=UPDATE_INTERVAL,
+    lock_path=SCHEDULER_LOCK_FILE,
+    last_update=lambda: security_snapshot.get().data.get("timestamp")
+)
 
 from datetime import datetime, timedelta
 import uuid
 
 # Variables globales adicionales
 CITIZEN_REPORTS_FILE = "citizen_reports.json"
-citizen_reports = []
+CITIZEN_REPORTS_LOG = os.getenv("CITIZEN_REPORTS_LOG", "citizen_reports.jsonl")
+CITIZEN_REPORTS_RETENTION_DAYS = int(os.getenv("CITIZEN_REPORTS_RETENTION_DAYS", 1))
+
+# Registro append-only de reportes ciudadanos con commit agrupado y compactación periódica
+citizen_log = CitizenReportLog(CITIZEN_REPORTS_LOG, retention_days=CITIZEN_REPORTS_RETENTION_DAYS)
+citizen_log.add_listener(incident_stats.add_report, lambda: incident_stats.reset("citizen"))
 
 # Función para cargar reportes ciudadanos
 def load_citizen_reports():
-    global citizen_reports
     try:
-        if os.path.exists(CITIZEN_REPORTS_FILE):
-            with open(CITIZEN_REPORTS_FILE, 'r', encoding='utf-8') as f:
-                citizen_reports = json.load(f)
-            
-            # Filtrar solo reportes de las últimas 24 horas
-            one_day_ago = (datetime.now() - timedelta(days=1)).isoformat()
-            citizen_reports = [report for report in citizen_reports if report.get("timestamp", "") >= one_day_ago]
-            
-            logger.info(f"Reportes ciudadanos cargados: {len(citizen_reports)} reportes")
-        else:
-            citizen_reports = []
-            logger.info("No hay archivo de reportes ciudadanos, se inicia con lista vacía")
+        # Migrar el antiguo citizen_reports.json la primera vez que se usa el registro
+        citizen_log.open(legacy_json_path=CITIZEN_REPORTS_FILE)
+        logger.info(f"Reportes ciudadanos cargados: {len(citizen_log)} reportes")
     except Exception as e:
         logger.error(f"Error al cargar reportes ciudadanos: {str(e)}")
-        citizen_reports = []
 
-# Función para guardar reportes ciudadanos
-def save_citizen_reports():
-    try:
-        with open(CITIZEN_REPORTS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(citizen_reports, f, ensure_ascii=False, indent=2)
-        logger.info(f"Reportes ciudadanos guardados: {len(citizen_reports)} reportes")
-    except Exception as e:
-        logger.error(f"Error al guardar reportes ciudadanos: {str(e)}")
+# Función para guardar un reporte ciudadano (espera a que su lote quede en disco)
+def save_citizen_report(report):
+    citizen_log.append(report)
+    update_broadcaster.notify()
 
-# Añadir esta función a la inicialización de la aplicación
+# Inicialización de cada proceso que atiende peticiones (con gunicorn, en cada worker
+# después del fork: ver gunicorn.conf.py)
 def initialize_app():
-    # Código existente...
+    set_security_data_publisher(security_snapshot.publish)
     load_historical_data()
     load_current_data()
-    load_citizen_reports()  # Cargar reportes ciudadanos
+    load_citizen_reports()
     
-    # Iniciar hilo de actualización periódica
-    update_thread = threading.Thread(target=periodic_update, daemon=True)
-    update_thread.start()
-    logger.info("Hilo de actualización periódica iniciado")
+    # Todos los workers arrancan el planificador; solo el líder ejecuta el pipeline
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+        logger.info("Planificador de actualización periódica iniciado")
     
 # Rutas de la aplicación Flask
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# Respuestas serializadas y comprimidas por versión de los datos (ETag / 304)
+security_data_response = VersionedResponseCache("security_data")
+all_incidents_response = VersionedResponseCache("all_incidents")
+
 @app.route('/api/security_data', methods=['GET'])
 def get_security_data():
+    snapshot = security_snapshot.get()
     load_current_data()
     
     # Si no hay datos actuales o están vacíos, usar el más reciente del historial
     if not current_data or not current_data.get("incidents"):
-        logger.info("No hay datos actuales, usando datos del historial")
-        if historical_data and len(historical_data) > 0:
-            return jsonify(historical_data[0])  # Devolver el más reciente
+        version = ("historial", history_store.version())
+        
+        def build():
+            logger.info("No hay datos actuales, usando datos del historial")
+            latest_entries = history_store.latest(1)
+            return latest_entries[0] if latest_entries else current_data  # Devolver el más reciente
+        
+        return security_data_response.respond(version, build)
     
-    return jsonify(current_data)
+    return security_data_response.respond(("actual", snapshot.version), lambda: snapshot.data)
 
 @app.route('/api/latest_news', methods=['GET'])
 def get_latest_news():
@@ -226,28 +294,16 @@ def get_latest_news():
     # Cargar datos actuales y históricos
     load_current_data()
     
-    # Combinar incidentes actuales con históricos
-    all_incidents = []
-    
-    # Añadir incidentes actuales si existen
+    # Combinar incidentes actuales con los de los últimos 5 registros históricos
+    candidates = []
     if current_data and current_data.get("incidents"):
-        all_incidents.extend(current_data.get("incidents"))
-    
-    # Añadir incidentes históricos
-    for entry in historical_data[:5]:  # Revisar en los últimos 5 registros históricos
+        candidates.extend(current_data.get("incidents"))
+    for entry in history_store.latest(5):
         if entry and entry.get("incidents"):
-            for incident in entry.get("incidents"):
-                # Comprobar si este incidente ya está en la lista (evitar duplicados)
-                is_duplicate = False
-                for existing in all_incidents:
-                    if (existing.get("titulo") == incident.get("titulo") or 
-                        (existing.get("lugar") == incident.get("lugar") and 
-                         existing.get("tipo") == incident.get("tipo"))):
-                        is_duplicate = True
-                        break
-                
-                if not is_duplicate:
-                    all_incidents.append(incident)
+            candidates.extend(entry.get("incidents"))
+    
+    # Evitar duplicados (la misma nota publicada por varios medios cuenta una vez)
+    all_incidents = unique_incidents(candidates)
     
     # Ordenar por fecha (si está disponible) y tomar los 3 más recientes
     try:
@@ -270,62 +326,88 @@ def get_historical_data():
     
     # Filtrar datos por fecha
     cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-    filtered_data = [item for item in historical_data if item.get("timestamp", "") >= cutoff_date]
+    filtered_data = history_store.since(cutoff_date)
     
     return jsonify(filtered_data)
 
 @app.route('/api/incident_types', methods=['GET'])
 def get_incident_types():
-    # Conteo de tipos de incidentes desde los datos históricos
-    incident_types = {}
-    for data in historical_data:
-        for incident in data.get("incidents", []):
-            incident_type = incident.get("tipo", "desconocido")
-            if incident_type in incident_types:
-                incident_types[incident_type] += 1
-            else:
-                incident_types[incident_type] = 1
-    
-    return jsonify(incident_types)
+    # Conteos precalculados; sin parámetros se mantiene la respuesta original (tipos del historial)
+    stats = sync_incident_stats()
+    since = request.args.get('since')
+    bucket = request.args.get('bucket')
+    source = request.args.get('source', 'system')
+
+    if bucket and bucket not in BUCKETS:
+        return jsonify({"status": "error", "message": f"bucket debe ser uno de: {', '.join(BUCKETS)}"}), 400
+    if source not in ('system', 'citizen', 'all'):
+        return jsonify({"status": "error", "message": "source debe ser system, citizen o all"}), 400
+    if since:
+        try:
+            since = datetime.fromisoformat(since).isoformat()
+        except ValueError:
+            return jsonify({"status": "error", "message": "since debe ser una fecha ISO 8601"}), 400
+
+    if not since and not bucket and 'source' not in request.args:
+        return jsonify(stats.totals())
+
+    return jsonify(stats.summary(since_iso=since or "", bucket=bucket or "day", source=source))
+
+# Pirámide del mapa de calor; se recalcula solo cuando cambia el historial
+heatmap_cache = {"version": None, "pyramid": None}
+heatmap_lock = threading.Lock()
+
+def get_heatmap_pyramid():
+    version = history_store.version()
+    if heatmap_cache["version"] != version:
+        with heatmap_lock:
+            if heatmap_cache["version"] != version:
+                pyramid = build_heatmap_pyramid(history_store.iter_all())
+                heatmap_cache["pyramid"] = pyramid
+                heatmap_cache["version"] = version
+                logger.info(f"Mapa de calor recalculado: {pyramid.points} incidentes en {len(pyramid.levels)} niveles de zoom")
+    return heatmap_cache["pyramid"]
 
 @app.route('/api/heatmap_data', methods=['GET'])
 def get_heatmap_data():
-    # Datos para el mapa de calor (todas las coordenadas)
-    heatmap_points = []
-    for data in historical_data:
-        for incident in data.get("incidents", []):
-            coords = incident.get("coordenadas")
-            if coords and coords.get("lat") and coords.get("lng"):
-                # Añadir intensidad basada en la gravedad
-                intensity = 1
-                if incident.get("gravedad") == "alta":
-                    intensity = 1.5
-                elif incident.get("gravedad") == "crítica":
-                    intensity = 2.0
-                
-                heatmap_points.append({
-                    "lat": coords.get("lat"),
-                    "lng": coords.get("lng"),
-                    "intensity": intensity
-                })
+    """Densidad de incidentes agrupada por celdas: ?zoom=N&bbox=minLng,minLat,maxLng,maxLat"""
+    try:
+        zoom = request.args.get('zoom', default=DEFAULT_HEATMAP_ZOOM, type=int)
+        bbox = parse_bbox(request.args["bbox"]) if request.args.get("bbox") else None
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
-    return jsonify(heatmap_points)
+    return jsonify(get_heatmap_pyramid().query(zoom, bbox))
 
 @app.route('/api/trigger_update', methods=['POST'])
 def trigger_update():
-    success = run_langgraph_analysis()
-    return jsonify({"success": success})
+    # Lanzar el pipeline en segundo plano (o unirse a la ejecución en curso) y responder de inmediato
+    try:
+        job, created = pipeline_jobs.submit(trigger="manual")
+    except PipelineBusy as e:
+        response = jsonify({"success": False, "error": str(e)})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(int(PipelineJobs.REMOTE_POLL_INTERVAL))
+        return response
+    status_url = f"/api/trigger_update/{job['job_id']}"
+    response = jsonify({
+        "success": True,
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "coalesced": not created,
+        "status_url": status_url
+    })
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
 
-# Inicialización
-def initialize_app():
-    # Cargar datos existentes
-    load_historical_data()
-    load_current_data()
-    
-    # Iniciar hilo de actualización periódica
-    update_thread = threading.Thread(target=periodic_update, daemon=True)
-    update_thread.start()
-    logger.info("Hilo de actualización periódica iniciado")
+@app.route('/api/trigger_update/<job_id>', methods=['GET'])
+def get_update_job(job_id):
+    # Avance de una ejecución lanzada con POST /api/trigger_update
+    job = pipeline_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Trabajo no encontrado"}), 404
+    return jsonify(job)
 
 
 @app.route('/report')
@@ -341,9 +423,9 @@ def get_citizen_reports():
     
     if days > 0:
         cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-        filtered_reports = [report for report in citizen_reports if report.get("timestamp", "") >= cutoff_date]
+        filtered_reports = citizen_log.since(cutoff_date)
     else:
-        filtered_reports = citizen_reports
+        filtered_reports = citizen_log.reports()
     
     return jsonify(filtered_reports)
 
@@ -383,9 +465,8 @@ def add_citizen_report():
             if field in data:
                 new_report[field] = data[field]
         
-        # Guardar reporte
-        citizen_reports.append(new_report)
-        save_citizen_reports()
+        # Guardar reporte en el registro append-only
+        save_citizen_report(new_report)
         
         return jsonify({
             "success": True,
@@ -397,78 +478,237 @@ def add_citizen_report():
         logger.error(f"Error al guardar reporte ciudadano: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/all-incidents', methods=['GET'])
-def get_all_incidents():
-    # Combinar incidentes del sistema con reportes ciudadanos para visualización en mapa
-    load_citizen_reports()
-    # Cargar datos actuales
+# Formatear un incidente del sistema para el mapa (None si no tiene coordenadas)
+def format_system_incident(incident):
+    if not (incident.get("coordenadas") and incident["coordenadas"].get("lat") and incident["coordenadas"].get("lng")):
+        return None
+    return {
+        "id": incident.get("id", str(uuid.uuid4())[:8]),
+        "title": incident.get("titulo") or incident.get("noticia") or "Incidente sin título",
+        "description": incident.get("resumen") or "Sin descripción",
+        "type": incident.get("tipo") or incident.get("tipo_incidente") or "desconocido",
+        "location": incident.get("lugar") or "Ubicación no especificada",
+        "timestamp": incident.get("fecha_incidente") or datetime.now().strftime("%d/%m/%Y"),
+        "time": incident.get("hora_incidente") or "",
+        "severity": incident.get("gravedad") or "media",
+        "coordinates": incident["coordenadas"],
+        "source": "system",
+        "url": incident.get("url", "")
+    }
+
+# Formatear un reporte ciudadano para el mapa (None si no tiene coordenadas)
+def format_citizen_report(report):
+    if not (report.get("coordenadas") and report["coordenadas"].get("lat") and report["coordenadas"].get("lng")):
+        return None
+    return {
+        "id": report.get("id", str(uuid.uuid4())[:8]),
+        "title": "Reporte ciudadano: " + report.get("tipo", "Incidente").replace("_", " ").title(),
+        "description": report.get("description") or "Sin descripción",
+        "type": report.get("tipo") or "reporte_ciudadano",
+        "location": report.get("lugar") or "Ubicación reportada por ciudadano",
+        "timestamp": datetime.fromisoformat(report.get("timestamp")).strftime("%d/%m/%Y") if report.get("timestamp") else datetime.now().strftime("%d/%m/%Y"),
+        "time": "",
+        "severity": report.get("severity") or "media",
+        "coordinates": report["coordenadas"],
+        "source": "citizen",
+        "verified": report.get("verified", False),
+        "reporter_name": report.get("name", "Anónimo")
+    }
+
+# Índice espacial de incidentes del sistema; se reconstruye solo cuando cambian los datos
+# actuales o el historial. Los reportes ciudadanos van en una rejilla aparte que se
+# actualiza reporte a reporte conforme el registro los lee
+incident_index = {"version": None, "grid": None}
+incident_index_lock = threading.Lock()
+citizen_index = {"grid": GridIndex()}
+citizen_index_lock = threading.Lock()
+
+def index_incident(grid, formatted, indexed_at):
+    if not formatted:
+        return
+    try:
+        lat = float(formatted["coordinates"]["lat"])
+        lng = float(formatted["coordinates"]["lng"])
+    except (TypeError, ValueError):
+        return
+    grid.insert(lat, lng, (indexed_at, formatted))
+
+# Construir el índice con los incidentes actuales y el historial
+def build_incident_index():
+    grid = GridIndex()
+    identity = IncidentIdentity()
+    
+    # Incidentes del sistema: primero los actuales y después el historial, sin duplicados
+    for entry in itertools.chain([current_data], history_store.iter_all()):
+        entry_timestamp = entry.get("timestamp", "") if entry else ""
+        for incident in (entry or {}).get("incidents", []):
+            if identity.add(incident)[1]:
+                index_incident(grid, format_system_incident(incident), entry_timestamp)
+    
+    logger.info(f"Índice espacial reconstruido: {len(grid)} incidentes en {len(grid.cells)} celdas")
+    return grid
+
+def get_incident_index():
     load_current_data()
+    version = (security_snapshot.get().version, history_store.version())
+    if incident_index["version"] != version:
+        # Un solo hilo reconstruye; mientras tanto los demás consultan el índice anterior
+        # (solo esperan si todavía no hay ninguno)
+        if incident_index_lock.acquire(blocking=incident_index["grid"] is None):
+            try:
+                if incident_index["version"] != version:
+                    incident_index["grid"] = build_incident_index()
+                    incident_index["version"] = version
+            finally:
+                incident_index_lock.release()
+    return incident_index["grid"]
+
+def index_citizen_report(report):
+    # Se llama mientras el registro lee: un reporte con datos inválidos no debe interrumpir la lectura
+    try:
+        formatted = format_citizen_report(report)
+    except Exception as e:
+        logger.error(f"Reporte ciudadano no indexado: {str(e)}")
+        return
+    with citizen_index_lock:
+        index_incident(citizen_index["grid"], formatted, report.get("timestamp", ""))
+
+def reset_citizen_index():
+    # El registro se volvió a leer completo (compactación): se vuelve a llenar reporte a reporte
+    with citizen_index_lock:
+        citizen_index["grid"] = GridIndex()
+
+citizen_log.add_listener(index_citizen_report, reset_citizen_index)
+
+def query_incident_index(bbox):
+    """Pares ``(indexed_at, incidente)`` dentro del rectángulo, del sistema y de ciudadanos."""
+    results = list(get_incident_index().query(*bbox))
+    # Incorporar los reportes que otros procesos añadieron al registro
+    citizen_log.version()
+    with citizen_index_lock:
+        results.extend(citizen_index["grid"].query(*bbox))
+    return results
+
+@app.route('/api/incidents', methods=['GET'])
+def get_incidents_in_bbox():
+    """Incidentes dentro del área visible del mapa: ?bbox=minLng,minLat,maxLng,maxLat&since=ISO"""
+    try:
+        bbox = parse_bbox(request.args["bbox"]) if request.args.get("bbox") else (-180.0, -90.0, 180.0, 90.0)
+        since_param = request.args.get("since")
+        since = datetime.fromisoformat(since_param) if since_param else datetime.now() - timedelta(days=1)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     
-    # Inicializar lista combinada
+    since_iso = since.isoformat()
+    incidents = [
+        formatted for indexed_at, formatted in query_incident_index(bbox)
+        if indexed_at >= since_iso
+    ]
+    
+    return jsonify(incidents)
+
+def build_all_incidents(one_day_ago):
+    # Combinar incidentes del sistema con reportes ciudadanos para visualización en mapa
     all_incidents = []
     
-    # Añadir incidentes del sistema
-    system_incidents = []
+    # Incidentes del sistema: los actuales y los del historial de las últimas 24 horas, sin duplicados
+    candidates = []
     if current_data and "incidents" in current_data:
-        system_incidents = current_data.get("incidents", [])
-    
-    # Añadir incidentes del historial (últimas 24 horas)
-    one_day_ago = (datetime.now() - timedelta(days=1)).isoformat()
-    for entry in historical_data:
-        if entry.get("timestamp", "") >= one_day_ago and "incidents" in entry:
-            for incident in entry.get("incidents", []):
-                # Verificar si es un incidente nuevo (no duplicado)
-                is_new = True
-                for existing in system_incidents:
-                    if (existing.get("titulo") == incident.get("titulo") and 
-                        existing.get("lugar") == incident.get("lugar")):
-                        is_new = False
-                        break
-                
-                if is_new:
-                    system_incidents.append(incident)
+        candidates.extend(current_data.get("incidents", []))
+    for entry in history_store.iter_since(one_day_ago):
+        candidates.extend(entry.get("incidents", []))
+    system_incidents = unique_incidents(candidates)
     
     # Preparar todos los incidentes del sistema
     for incident in system_incidents:
-        if incident.get("coordenadas") and incident["coordenadas"].get("lat") and incident["coordenadas"].get("lng"):
-            all_incidents.append({
-                "id": incident.get("id", str(uuid.uuid4())[:8]),
-                "title": incident.get("titulo") or incident.get("noticia") or "Incidente sin título",
-                "description": incident.get("resumen") or "Sin descripción",
-                "type": incident.get("tipo") or incident.get("tipo_incidente") or "desconocido",
-                "location": incident.get("lugar") or "Ubicación no especificada",
-                "timestamp": incident.get("fecha_incidente") or datetime.now().strftime("%d/%m/%Y"),
-                "time": incident.get("hora_incidente") or "",
-                "severity": incident.get("gravedad") or "media",
-                "coordinates": incident["coordenadas"],
-                "source": "system",
-                "url": incident.get("url", "")
-            })
+        formatted = format_system_incident(incident)
+        if formatted:
+            all_incidents.append(formatted)
     
     # Añadir reportes ciudadanos
-    for report in citizen_reports:
-        if report.get("coordenadas") and report["coordenadas"].get("lat") and report["coordenadas"].get("lng"):
-            all_incidents.append({
-                "id": report.get("id", str(uuid.uuid4())[:8]),
-                "title": "Reporte ciudadano: " + report.get("tipo", "Incidente").replace("_", " ").title(),
-                "description": report.get("description") or "Sin descripción",
-                "type": report.get("tipo") or "reporte_ciudadano",
-                "location": report.get("lugar") or "Ubicación reportada por ciudadano",
-                "timestamp": datetime.fromisoformat(report.get("timestamp")).strftime("%d/%m/%Y") if report.get("timestamp") else datetime.now().strftime("%d/%m/%Y"),
-                "time": "",
-                "severity": report.get("severity") or "media",
-                "coordinates": report["coordenadas"],
-                "source": "citizen",
-                "verified": report.get("verified", False),
-                "reporter_name": report.get("name", "Anónimo")
-            })
+    for report in citizen_log.since(one_day_ago):
+        formatted = format_citizen_report(report)
+        if formatted:
+            all_incidents.append(formatted)
     
-    return jsonify(all_incidents)
+    return all_incidents
+
+@app.route('/api/all-incidents', methods=['GET'])
+def get_all_incidents():
+    load_current_data()
+    one_day_ago = (datetime.now() - timedelta(days=1)).isoformat()
+    
+    # La respuesta cambia si cambian los datos o si algún registro sale de la ventana de 24 horas
+    version = (
+        security_snapshot.get().version,
+        history_store.version(),
+        history_store.count_since(one_day_ago),
+        citizen_log.version(),
+        citizen_log.count_since(one_day_ago)
+    )
+    return all_incidents_response.respond(version, lambda: build_all_incidents(one_day_ago))
+
+# Canal de eventos (SSE): avisa cuando cambian los datos del sistema o llegan reportes ciudadanos
+stream_cursor = {"citizen_reports": datetime.now().isoformat()}
+STREAM_DELTA_MAX_REPORTS = 20
+
+def citizen_reports_delta():
+    # Reportes llegados desde el último evento, ya con el formato de /api/all-incidents
+    cursor = stream_cursor["citizen_reports"]
+    new_reports = [report for report in citizen_log.since(cursor) if report.get("timestamp", "") > cursor]
+    if not new_reports:
+        return None
+    stream_cursor["citizen_reports"] = new_reports[-1].get("timestamp", cursor)
+    formatted = [format_citizen_report(report) for report in new_reports[-STREAM_DELTA_MAX_REPORTS:]]
+    return [report for report in formatted if report]
+
+update_broadcaster = VersionBroadcaster(
+    sources={
+        "security_data": lambda: security_snapshot.get().version,
+        "history": history_store.version,
+        "citizen_reports": citizen_log.version
+    },
+    deltas={"citizen_reports": citizen_reports_delta}
+)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_updates():
+    # Si no hay lugar, el navegador sigue con consultas periódicas
+    if not update_broadcaster.acquire():
+        response = jsonify({"status": "error", "message": "Demasiadas conexiones al canal de eventos"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "60"
+        return response
+    
+    response = Response(update_broadcaster.stream(), mimetype="text/event-stream")
+    response.call_on_close(update_broadcaster.release)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # evitar que un proxy acumule los eventos
+    return response
+
+def cache_hit_ratio(families):
+    # Proporción de aciertos por caché a partir de los contadores ya combinados
+    totals = {}
+    for name, _, _, samples in families:
+        if name in ("seguridad_cache_hits_total", "seguridad_cache_misses_total"):
+            for _, labels, value in samples:
+                counts = totals.setdefault(labels["cache"], [0, 0])
+                counts[0 if name == "seguridad_cache_hits_total" else 1] += value
+    samples = [
+        ("seguridad_cache_hit_ratio", {"cache": cache}, hits / (hits + misses))
+        for cache, (hits, misses) in totals.items() if hits + misses
+    ]
+    return ("seguridad_cache_hit_ratio", "gauge", "Proporción de aciertos de cada caché persistente", samples)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas del pipeline en formato de texto de Prometheus."""
+    families = merge_families(REGISTRY.collect(), *load_snapshots(METRICS_SNAPSHOT_DIR, exclude_pid=os.getpid()))
+    families.append(cache_hit_ratio(families))
+    return Response(render_metrics(families), mimetype="text/plain; version=0.0.4")
 
 if __name__ == '__main__':
+    # Si no existen datos actuales, el planificador ejecuta LangGraph de inmediato
     initialize_app()
-    # Si no existen datos actuales, ejecutar LangGraph una vez al inicio
-    if not current_data.get("timestamp"):
-        run_langgraph_analysis()
     
     app.run(debug=True, use_reloader=False)  # Desactivar reloader para evitar duplicar hilos
\ No newline at end of file
@@ -0,0 +1,253 @@
+# article_extraction.py
+# Extracción en una sola pasada de la fecha y el texto de un artículo, con analizador HTML intercambiable
+
+import os
+import logging
+from html.parser import HTMLParser
+from collections import namedtuple
+from bs4.dammit import UnicodeDammit
+
+# lxml es opcional: si no está instalado se usa el analizador de la biblioteca estándar
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+logger = logging.getLogger(__name__)
+
+# Analizador a usar: "lxml", "html.parser" o "auto" (lxml si está disponible)
+ARTICLE_PARSER = os.getenv("ARTICLE_PARSER", "auto")
+
+# Párrafos con este número de caracteres o menos no cuentan como contenido
+MIN_PARAGRAPH_CHARS = 20
+
+# El texto de estas etiquetas nunca forma parte del contenido
+RAW_TEXT_TAGS = frozenset(["script", "style"])
+# Ni el de estas, dentro de <article> o del div principal
+EXCLUDED_TAGS = frozenset(["script", "style", "nav", "footer", "header"])
+# Etiquetas sin cierre: no se abren en la pila
+VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+    "link", "menuitem", "meta", "param", "source", "track", "wbr"
+])
+
+ArticleText = namedtuple("ArticleText", ["date_text", "content"])
+
+
+class _Capture:
+    """Texto acumulado de un elemento abierto."""
+
+    __slots__ = ("depth", "pieces", "skip_excluded", "done")
+
+    def __init__(self, depth, skip_excluded=False):
+        self.depth = depth
+        self.pieces = []
+        self.skip_excluded = skip_excluded
+        self.done = False
+
+
+class ArticleCollector:
+    """Recorre los eventos del analizador una sola vez y reúne lo que usa el scraper.
+
+    Reproduce lo que antes se obtenía con varias búsquedas sobre el árbol de
+    BeautifulSoup: el texto del primer ``<span>`` cuya clase contiene ``Typography``
+    (la fecha), el de cada ``<p>``, y el del primer ``<article>`` y el del primer
+    ``<div>`` con clase ``content``/``article`` sin sus scripts, estilos, menús,
+    encabezados ni pies. Los nodos de texto se recortan y se descartan si quedan
+    vacíos, igual que ``get_text(strip=True)``.
+
+    Sirve como ``target`` de ``lxml.etree.HTMLParser`` y como destino de
+    :class:`_StdlibParser`; las etiquetas de cierre sin apertura se ignoran y las que
+    cierran un elemento exterior cierran también los interiores, como en html.parser.
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._captures = []
+        self._active = []
+        self._raw_depths = []
+        self._excluded_depths = []
+        self._text = []
+        self.date = None
+        self.paragraphs = []
+        self.article = None
+        self.main_div = None
+
+    def start(self, tag, attrib):
+        if self._text:
+            self._flush()
+        if tag in VOID_TAGS:
+            return
+        depth = len(self._stack)
+        self._stack.append(tag)
+        capture = None
+        if tag == "p":
+            capture = _Capture(depth)
+            self.paragraphs.append(capture)
+        elif tag == "span":
+            if self.date is None and "Typography" in (attrib.get("class") or ""):
+                capture = self.date = _Capture(depth)
+        elif tag == "article":
+            if self.article is None:
+                capture = self.article = _Capture(depth, skip_excluded=True)
+        elif tag == "div":
+            if self.main_div is None:
+                css_class = (attrib.get("class") or "").lower()
+                if "content" in css_class or "article" in css_class:
+                    capture = self.main_div = _Capture(depth, skip_excluded=True)
+        self._captures.append(capture)
+        if capture is not None:
+            self._active.append(capture)
+        if tag in EXCLUDED_TAGS:
+            self._excluded_depths.append(depth)
+            if tag in RAW_TEXT_TAGS:
+                self._raw_depths.append(depth)
+
+    def end(self, tag):
+        if self._text:
+            self._flush()
+        stack = self._stack
+        for depth in range(len(stack) - 1, -1, -1):
+            if stack[depth] == tag:
+                break
+        else:
+            return
+        del stack[depth:]
+        closed = self._captures[depth:]
+        del self._captures[depth:]
+        if any(capture is not None for capture in closed):
+            for capture in closed:
+                if capture is not None:
+                    capture.done = True
+            self._active = [capture for capture in self._active if not capture.done]
+        while self._excluded_depths and self._excluded_depths[-1] >= depth:
+            self._excluded_depths.pop()
+        while self._raw_depths and self._raw_depths[-1] >= depth:
+            self._raw_depths.pop()
+
+    def data(self, data):
+        # lxml puede entregar un mismo nodo de texto en varios fragmentos
+        self._text.append(data)
+
+    def comment(self, text):
+        if self._text:
+            self._flush()
+
+    def close(self):
+        if self._text:
+            self._flush()
+        return self
+
+    def _flush(self):
+        text = "".join(self._text).strip()
+        self._text = []
+        if not text or not self._active or self._raw_depths:
+            return
+        excluded = self._excluded_depths[-1] if self._excluded_depths else -1
+        for capture in self._active:
+            if not (capture.skip_excluded and excluded > capture.depth):
+                capture.pieces.append(text)
+
+    def result(self):
+        """La fecha (``None`` si no hay) y el contenido, con la misma prioridad que antes."""
+        date_text = "".join(self.date.pieces) if self.date is not None else None
+        paragraphs = ["".join(capture.pieces) for capture in self.paragraphs]
+        valid_paragraphs = [text for text in paragraphs if len(text) > MIN_PARAGRAPH_CHARS]
+        if valid_paragraphs:
+            content = " ".join(valid_paragraphs)
+        elif self.article is not None:
+            content = " ".join(self.article.pieces)
+        elif self.main_div is not None:
+            content = " ".join(self.main_div.pieces)
+        else:
+            content = ""
+        return ArticleText(date_text, content)
+
+
+class _StdlibParser(HTMLParser):
+    """Adaptador de ``html.parser`` que reenvía los eventos a un :class:`ArticleCollector`."""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def handle_comment(self, data):
+        self.target.comment(data)
+
+    def handle_decl(self, decl):
+        self.target.comment(decl)
+
+    def handle_pi(self, data):
+        self.target.comment(data)
+
+    def unknown_decl(self, data):
+        # Las secciones CDATA también son texto para get_text
+        if data.startswith("CDATA["):
+            self.target.comment(None)
+            self.target.data(data[len("CDATA["):])
+            self.target.comment(None)
+
+
+def _parse_lxml(text):
+    collector = ArticleCollector()
+    parser = etree.HTMLParser(target=collector, recover=True, no_network=True)
+    parser.feed(text)
+    return parser.close()
+
+
+def _parse_stdlib(text):
+    collector = ArticleCollector()
+    parser = _StdlibParser(collector)
+    parser.feed(text)
+    parser.close()
+    return collector.close()
+
+
+PARSERS = {"html.parser": _parse_stdlib}
+if etree is not None:
+    PARSERS["lxml"] = _parse_lxml
+
+
+def resolve_parser(name):
+    """Nombre del analizador a usar; si el pedido no está disponible se usa html.parser."""
+    if name == "auto":
+        return "lxml" if "lxml" in PARSERS else "html.parser"
+    if name not in PARSERS:
+        logger.warning(f"Analizador HTML '{name}' no disponible, se usa html.parser")
+        return "html.parser"
+    return name
+
+
+DEFAULT_PARSER = resolve_parser(ARTICLE_PARSER)
+
+
+def decode_html(markup):
+    """Texto de la página, detectando la codificación como BeautifulSoup."""
+    if isinstance(markup, str):
+        return markup
+    return UnicodeDammit(markup, is_html=True).unicode_markup or ""
+
+
+def extract_article(markup, parser=None):
+    """Fecha y contenido de una página de noticias en bytes o texto.
+
+    El contenido es la unión de los párrafos con más de ``MIN_PARAGRAPH_CHARS``
+    caracteres; si no hay ninguno, el texto del primer ``<article>`` y, si tampoco
+    hay, el del primer div de contenido. ``date_text`` es ``None`` si la página no
+    tiene el ``<span>`` de la fecha.
+    """
+    parser = resolve_parser(parser) if parser else DEFAULT_PARSER
+    return PARSERS[parser](decode_html(markup)).result()
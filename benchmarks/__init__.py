@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Herramientas para medir el rendimiento sin servicios externos (ejecutar desde la raíz con python -m benchmarks.<módulo>)
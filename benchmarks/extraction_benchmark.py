@@ -0,0 +1,164 @@
+# benchmarks/extraction_benchmark.py
+# Compara la extracción de fecha y contenido de artículos con cada analizador HTML disponible
+"""
+Uso, desde la raíz del repositorio:
+
+    python -m benchmarks.extraction_benchmark --repeat 50 --output extraction.json
+    python -m benchmarks.extraction_benchmark --corpus paginas_guardadas/ --repeat 5
+
+Por defecto el corpus son las páginas de medios de Querétaro de
+``benchmarks/fixtures/articles``; con ``--corpus`` se usan todos los ``.html`` de un
+directorio (por ejemplo, páginas descargadas con ``curl`` de los mismos sitios).
+
+``beautifulsoup`` es la extracción anterior a ``article_extraction`` (árbol completo
+de BeautifulSoup con html.parser y varias búsquedas sobre él) y sirve de referencia:
+para cada analizador se reporta el tiempo por página, las páginas por segundo, la
+aceleración respecto a la referencia y las páginas cuya fecha o contenido difieren.
+Los tiempos incluyen la detección de la codificación, igual que en el scraper.
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+
+from article_extraction import PARSERS, ArticleText, extract_article
+from benchmarks.fakes import load_articles
+from benchmarks.report import describe, environment, write_report
+
+REFERENCE = "beautifulsoup"
+EXCLUDED_TAGS = ['script', 'style', 'nav', 'footer', 'header']
+
+
+def extract_with_beautifulsoup(markup):
+    """La extracción del scraper antes de ``article_extraction``."""
+    soup = BeautifulSoup(markup, 'html.parser')
+    date_elem = soup.find('span', class_=lambda x: x and 'Typography' in x)
+    date_text = date_elem.get_text(strip=True) if date_elem else None
+
+    paragraphs = soup.find_all('p')
+    valid_paragraphs = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20]
+    if valid_paragraphs:
+        return ArticleText(date_text, " ".join(valid_paragraphs))
+    main = soup.find('article') or soup.find('div', class_=lambda x: x and ('content' in x.lower() or 'article' in x.lower()))
+    if main:
+        for tag in main.find_all(EXCLUDED_TAGS):
+            tag.decompose()
+        return ArticleText(date_text, main.get_text(separator=' ', strip=True))
+    return ArticleText(date_text, "")
+
+
+def load_corpus(directory=None):
+    """Lista de (nombre, bytes) con las páginas a medir."""
+    if directory is None:
+        return [(article["file"], article["html"]) for article in load_articles()]
+    directory = Path(directory)
+    pages = sorted(path for path in directory.rglob("*") if path.suffix.lower() in (".html", ".htm"))
+    return [(str(path.relative_to(directory)), path.read_bytes()) for path in pages]
+
+
+def extractors(names=None):
+    available = {REFERENCE: extract_with_beautifulsoup}
+    for name in PARSERS:
+        available[name] = lambda markup, parser=name: extract_article(markup, parser)
+    if not names:
+        return available
+    missing = [name for name in names if name not in available]
+    if missing:
+        raise SystemExit(f"Analizadores no disponibles: {', '.join(missing)} (disponibles: {', '.join(available)})")
+    return {name: available[name] for name in names}
+
+
+def measure(extract, pages, repeat):
+    """Tiempo de cada extracción y el resultado de la última, por página."""
+    seconds = []
+    results = {}
+    for _ in range(repeat):
+        for name, markup in pages:
+            start = time.perf_counter()
+            result = extract(markup)
+            seconds.append(time.perf_counter() - start)
+            results[name] = result
+    return seconds, results
+
+
+def mismatches(results, reference):
+    different = []
+    for name, expected in reference.items():
+        result = results[name]
+        fields = [field for field in ArticleText._fields if getattr(result, field) != getattr(expected, field)]
+        if fields:
+            different.append({"page": name, "fields": fields})
+    return different
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la extracción de texto de artículos por analizador HTML")
+    parser.add_argument("--corpus", help="directorio con páginas .html guardadas (por defecto, las de benchmarks/fixtures)")
+    parser.add_argument("--repeat", type=int, default=20, help="veces que se extrae cada página por analizador")
+    parser.add_argument("--parsers", nargs="+",
+                        help=f"analizadores a medir (por defecto {REFERENCE} y todos los disponibles)")
+    parser.add_argument("--output", help="archivo donde guardar el reporte JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print("El corpus no tiene páginas .html", file=sys.stderr)
+        return 1
+    total_bytes = sum(len(markup) for _, markup in pages)
+    print(f"{len(pages)} páginas, {total_bytes / 1024:.0f} KiB, {args.repeat} repeticiones", file=sys.stderr)
+
+    # La referencia siempre se ejecuta para poder comparar los resultados
+    selected = extractors(args.parsers)
+    reference_results = measure(extract_with_beautifulsoup, pages, 1)[1]
+
+    parsers = {}
+    for name, extract in selected.items():
+        extract(pages[0][1])
+        seconds, results = measure(extract, pages, args.repeat)
+        total = sum(seconds)
+        parsers[name] = {
+            "seconds_per_page": describe(seconds),
+            "pages_per_second": round(len(seconds) / total, 1) if total else None,
+            "mib_per_second": round(total_bytes * args.repeat / total / 2 ** 20, 2) if total else None,
+            "mismatches": mismatches(results, reference_results)
+        }
+
+    if REFERENCE in parsers:
+        reference_mean = parsers[REFERENCE]["seconds_per_page"]["mean"]
+        for stats in parsers.values():
+            stats["speedup"] = round(reference_mean / stats["seconds_per_page"]["mean"], 2)
+
+    print(f"{'analizador':<15}{'p50 (ms)':>10}{'p95 (ms)':>10}{'págs/s':>10}{'MiB/s':>8}{'acel.':>7}{'difs.':>7}")
+    for name, stats in parsers.items():
+        seconds = stats["seconds_per_page"]
+        speedup = f"{stats['speedup']:.2f}" if "speedup" in stats else "-"
+        print(f"{name:<15}{seconds['p50'] * 1000:>10.3f}{seconds['p95'] * 1000:>10.3f}"
+              f"{stats['pages_per_second']:>10g}{stats['mib_per_second']:>8g}{speedup:>7}{len(stats['mismatches']):>7}")
+    for name, stats in parsers.items():
+        for mismatch in stats["mismatches"]:
+            print(f"  {name}: {mismatch['page']} difiere en {', '.join(mismatch['fields'])}")
+
+    if args.output:
+        output = os.path.abspath(args.output)
+        write_report(output, {
+            "benchmark": "extraction",
+            "environment": environment(),
+            "config": {"corpus": args.corpus, "repeat": args.repeat, "pages": len(pages), "bytes": total_bytes},
+            "parsers": parsers
+        })
+        print(f"Reporte guardado en {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
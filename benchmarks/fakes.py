@@ -0,0 +1,379 @@
+# benchmarks/fakes.py
+# Sustitutos locales de Gemini, Tavily, OpenCage y los sitios de noticias para ejecutar el pipeline sin red
+
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from langchain_core.messages import AIMessage
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# Zona metropolitana de Querétaro: (lat_min, lat_max, lng_min, lng_max)
+QUERETARO_BOUNDS = (20.50, 20.75, -100.52, -100.30)
+
+
+def load_articles(directory=FIXTURES_DIR):
+    """Artículos guardados: los datos de ``articles.json`` más el HTML de cada uno en ``html``."""
+    directory = Path(directory)
+    with open(directory / "articles.json", "r", encoding="utf-8") as f:
+        articles = json.load(f)
+    for article in articles:
+        article["html"] = (directory / "articles" / article["file"]).read_bytes()
+    return articles
+
+
+def point_in_queretaro(text):
+    """Coordenadas deterministas dentro de Querétaro para un texto cualquiera."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    lat_min, lat_max, lng_min, lng_max = QUERETARO_BOUNDS
+    lat = lat_min + (lat_max - lat_min) * int.from_bytes(digest[:4], "big") / 0xFFFFFFFF
+    lng = lng_min + (lng_max - lng_min) * int.from_bytes(digest[4:], "big") / 0xFFFFFFFF
+    return round(lat, 6), round(lng, 6)
+
+
+class CallCounter:
+    """Llamadas recibidas por los sustitutos, por nombre de servicio."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+class Latency:
+    """Espera simulada de ``mean`` segundos con variación uniforme de ``±jitter``."""
+
+    def __init__(self, mean=0.0, jitter=0.0, seed=0):
+        self.mean = mean
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self):
+        if self.mean <= 0 and self.jitter <= 0:
+            return
+        with self._lock:
+            delay = self.mean + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Conexiones persistentes, como los sitios reales: la sesión HTTP de gguard las reutiliza
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.service.handle(self)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeHttpService:
+    """Servidor HTTP local en su propio puerto (y por lo tanto su propio dominio para gguard)."""
+
+    def __init__(self, counters, latency):
+        self.counters = counters
+        self.latency = latency
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, handler):
+        raise NotImplementedError
+
+    @staticmethod
+    def send(handler, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        if status != 304:
+            handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        if body:
+            handler.wfile.write(body)
+
+
+class FakeNewsSite(FakeHttpService):
+    """Sitio de noticias que sirve los artículos guardados de un medio, con ETag y 304."""
+
+    LAST_MODIFIED = "Wed, 02 Apr 2025 14:00:00 GMT"
+
+    def __init__(self, outlet, articles, counters, latency):
+        super().__init__(counters, latency)
+        self.outlet = outlet
+        self.pages = {f"/{article['file']}": article["html"] for article in articles}
+        self.etags = {path: f'"{hashlib.sha1(html).hexdigest()[:16]}"' for path, html in self.pages.items()}
+
+    def url(self, article, copy=0):
+        url = f"{self.base_url}/{article['file']}"
+        return f"{url}?copia={copy}" if copy else url
+
+    def handle(self, handler):
+        path = urlparse(handler.path).path
+        if path not in self.pages:
+            self.send(handler, 404)
+            return
+        self.latency.sleep()
+        etag = self.etags[path]
+        if handler.headers.get("If-None-Match") == etag:
+            self.counters.inc("article_not_modified")
+            self.send(handler, 304, headers={"ETag": etag})
+            return
+        self.counters.inc("article")
+        self.send(handler, 200, self.pages[path], headers={"ETag": etag, "Last-Modified": self.LAST_MODIFIED})
+
+
+class FakeGeocoder(FakeHttpService):
+    """API compatible con la respuesta de OpenCage y punto de verificación de conectividad."""
+
+    @property
+    def geocode_url(self):
+        return f"{self.base_url}/geocode/v1/json"
+
+    @property
+    def ping_url(self):
+        return f"{self.base_url}/ping"
+
+    def handle(self, handler):
+        parsed = urlparse(handler.path)
+        if parsed.path == "/ping":
+            self.counters.inc("connectivity")
+            self.send(handler, 204)
+            return
+        if parsed.path != "/geocode/v1/json":
+            self.send(handler, 404)
+            return
+        self.latency.sleep()
+        self.counters.inc("geocode")
+        query = parse_qs(parsed.query).get("q", [""])[0]
+        lat, lng = point_in_queretaro(query)
+        body = json.dumps({
+            "results": [{"formatted": query, "confidence": 8, "geometry": {"lat": lat, "lng": lng}}],
+            "status": {"code": 200, "message": "OK"},
+            "total_results": 1
+        }).encode("utf-8")
+        self.send(handler, 200, body, content_type="application/json")
+
+
+class FakeSearch:
+    """Sustituto de ``TavilySearchResults``: gguard lo instancia y llama a ``invoke``."""
+
+    def __init__(self, results, counters, latency):
+        self.results = results
+        self.counters = counters
+        self.latency = latency
+
+    def __call__(self, **kwargs):
+        return self
+
+    def invoke(self, query):
+        self.latency.sleep()
+        self.counters.inc("search")
+        return [dict(result) for result in self.results]
+
+
+class FakeLLM:
+    """Modelo que responde JSON fijo según el agente que pregunta, con latencia configurable.
+
+    Las extracciones de noticias devuelven los datos de ``articles.json`` del artículo
+    cuya URL aparece en el prompt, de modo que el resto del pipeline trabaja con
+    incidentes coherentes. Cada respuesta informa tokens aproximados en
+    ``usage_metadata`` como lo hace Gemini.
+    """
+
+    def __init__(self, articles, counters, latency):
+        self.by_file = {article["file"]: article for article in articles}
+        self.by_title = {article["title"]: article for article in articles}
+        self.counters = counters
+        self.latency = latency
+        # El orden importa: el prompt por lotes también contiene el texto del prompt individual
+        self.routes = [
+            ("Para CADA artículo", self._batch_extraction),
+            ("Extrae EXCLUSIVAMENTE un único incidente", self._extraction),
+            ("selecciona el más urgente", self._routing),
+            ("Clasifica este incidente", self._classification),
+            ("Extrae el lugar exacto", self._location),
+            ("Analiza este incidente", self._analysis),
+            ("Evalúa la confianza", self._evaluation),
+            ("Genera predicciones", self._predictions),
+            ("Genera recomendaciones", self._recommendations),
+            ("Genera reportes", self._reports),
+        ]
+
+    def invoke(self, messages, *args, **kwargs):
+        prompt = messages[-1].content
+        self.latency.sleep()
+        self.counters.inc("llm")
+        for marker, build in self.routes:
+            if marker in prompt:
+                answer = build(prompt)
+                break
+        else:
+            answer = {}
+        # Como Gemini, las respuestas JSON llegan envueltas en un bloque de código
+        content = answer if isinstance(answer, str) else f"```json\n{json.dumps(answer, ensure_ascii=False)}\n```"
+        input_tokens, output_tokens = len(prompt) // 4 + 1, len(content) // 4 + 1
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        })
+
+    def _article_for(self, text):
+        match = re.search(r"URL: (\S+)", text)
+        if not match:
+            return None
+        return self.by_file.get(urlparse(match.group(1)).path.rsplit("/", 1)[-1])
+
+    def _extraction(self, prompt):
+        article = self._article_for(prompt)
+        return dict(article["details"]) if article else {}
+
+    def _batch_extraction(self, prompt):
+        records = []
+        for chunk in re.split(r"--- ARTÍCULO ", prompt)[1:]:
+            match = re.match(r"id=(\d+) ---", chunk)
+            article = self._article_for(chunk)
+            if match and article:
+                records.append(dict(article["details"], id=int(match.group(1))))
+        return records
+
+    def _routing(self, prompt):
+        match = re.search(r'"id": (\d+)', prompt)
+        return {
+            "selected_id": int(match.group(1)) if match else 0,
+            "urgency": "high",
+            "justification": "Afecta una vialidad principal en hora de alta circulación."
+        }
+
+    def _classification(self, prompt):
+        match = re.search(r"Título: (.+)", prompt)
+        article = self.by_title.get(match.group(1).strip()) if match else None
+        return {"incident_type": article["categoria"] if article else "otro"}
+
+    def _location(self, prompt):
+        return "Centro Histórico"
+
+    def _analysis(self, prompt):
+        return {
+            "pattern": "Incidentes recurrentes en horas de mayor afluencia",
+            "impact": "Afectación moderada a la circulación durante la atención del incidente",
+            "affected_routes": ["Bernardo Quintana", "5 de Febrero"],
+            "risk_factors": ["alta densidad vehicular", "poca iluminación"]
+        }
+
+    def _evaluation(self, prompt):
+        return {"confidence": 0.82, "justification": "Fuente local con datos de lugar y hora."}
+
+    def _predictions(self, prompt):
+        return {
+            "risk_level": "moderado",
+            "duration": "2 a 3 horas",
+            "trend": "estable",
+            "affected_hours": ["07:00-10:00", "18:00-21:00"]
+        }
+
+    def _recommendations(self, prompt):
+        return [
+            "Usar Paseo Constituyentes como alternativa a 5 de Febrero",
+            "Tomar el libramiento Sur Poniente para cruzar la ciudad",
+            "Evitar Bernardo Quintana entre Constituyentes y Pie de la Cuesta",
+            "Circular por Avenida Universidad en lugar de Zaragoza",
+            "Salir 20 minutos antes en horas de mayor afluencia"
+        ]
+
+    def _reports(self, prompt):
+        return {
+            "authorities": "Se recomienda reforzar la presencia de tránsito en las vialidades afectadas.",
+            "citizens": "Tome rutas alternas y considere tiempos de traslado mayores.",
+            "media": "Un incidente afectó la circulación en una vialidad principal de Querétaro."
+        }
+
+
+class FakeServices:
+    """Todos los sustitutos con sus servidores en marcha y un contador de llamadas común."""
+
+    def __init__(self, articles=None, results=None, llm_latency=None, fetch_latency=None,
+                 geocode_latency=None, search_latency=None):
+        self.articles = articles if articles is not None else load_articles()
+        self.counters = CallCounter()
+        self.geocoder = FakeGeocoder(self.counters, geocode_latency or Latency()).start()
+
+        outlets = {}
+        for article in self.articles:
+            outlets.setdefault(article["outlet"], []).append(article)
+        self.sites = {
+            outlet: FakeNewsSite(outlet, outlet_articles, self.counters, fetch_latency or Latency()).start()
+            for outlet, outlet_articles in outlets.items()
+        }
+
+        # Con más resultados que artículos guardados se repiten con otra URL
+        count = results if results is not None else len(self.articles)
+        self.search_results = []
+        for position in range(count):
+            article = self.articles[position % len(self.articles)]
+            self.search_results.append({
+                "title": article["title"],
+                "url": self.sites[article["outlet"]].url(article, position // len(self.articles)),
+                "content": article["snippet"]
+            })
+
+        self.search = FakeSearch(self.search_results, self.counters, search_latency or Latency())
+        self.llm = FakeLLM(self.articles, self.counters, llm_latency or Latency())
+
+    def environ(self):
+        """Variables de entorno que gguard debe ver al importarse."""
+        return {
+            "GOOGLE_API_KEY": "offline",
+            "TAVILY_API_KEY": "offline",
+            "OPENCAGE_API_KEY": "offline",
+            "OPENCAGE_URL": self.geocoder.geocode_url,
+            "CONNECTIVITY_CHECK_URL": self.geocoder.ping_url
+        }
+
+    def install(self, gguard):
+        """Reemplaza en gguard el cliente de Gemini y la búsqueda de Tavily."""
+        gguard.initialize_llm = lambda temperature=0.7, model=None: self.llm
+        gguard._llm_clients.clear()
+        gguard.TavilySearchResults = self.search
+
+    def stop(self):
+        self.geocoder.stop()
+        for site in self.sites.values():
+            site.stop()
@@ -0,0 +1,333 @@
+# benchmarks/generate_dataset.py
+# Genera historial, datos actuales y reportes ciudadanos sintéticos con la forma de los archivos reales
+"""
+Uso, desde la raíz del repositorio:
+
+    python -m benchmarks.generate_dataset --incidents 100000 --out-dir datasets/100k
+    python -m benchmarks.generate_dataset --incidents 1000000 --entries 500 --content-chars 400 --out-dir datasets/1m
+
+Escribe en ``--out-dir`` los archivos que la aplicación lee al arrancar
+(``historical_data.json``, ``security_data.json`` y ``citizen_reports.json``, que se
+migran a SQLite y al registro JSONL la primera vez) y ``dataset.json`` con los
+parámetros usados. Los incidentes del historial se reparten en ``--entries`` ciclos
+del pipeline a lo largo de ``--days`` días, con coordenadas concentradas alrededor de
+zonas conocidas de Querétaro. Una fracción (``--duplicate-ratio``) repite noticias de
+ciclos anteriores, como ocurre cuando el pipeline vuelve a encontrar la misma nota.
+
+La aplicación conserva solo ``HISTORY_MAX_ENTRIES`` ciclos (100 por defecto): para usar
+todo el historial generado arránquela con ``HISTORY_MAX_ENTRIES`` mayor o igual a
+``--entries`` (``benchmarks/load_test.py`` lo hace a partir de ``dataset.json``).
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# Zonas con más incidentes: (nombre, latitud, longitud, colonias)
+HOTSPOTS = [
+    ("Centro Histórico", 20.5926, -100.3927, ["Centro", "La Cruz", "San Francisquito", "El Carmen"]),
+    ("5 de Febrero", 20.6010, -100.4100, ["Niños Héroes", "San Pablo", "Industrial", "Obrera"]),
+    ("Bernardo Quintana", 20.6085, -100.3770, ["Carretas", "Arboledas", "Álamos", "Calesa"]),
+    ("Juriquilla", 20.7035, -100.4460, ["Juriquilla", "Jurica", "Jurica Acueducto", "Cumbres del Lago"]),
+    ("Santa Rosa Jáuregui", 20.7400, -100.4490, ["Santa Rosa Jáuregui", "La Solana", "Pinal de Zamorano"]),
+    ("El Marqués", 20.6180, -100.3150, ["La Pradera", "Paseos del Marqués", "Zibatá", "La Griega"]),
+    ("Corregidora", 20.5420, -100.4420, ["El Pueblito", "Candiles", "Los Olvera", "Tejeda"]),
+    ("Menchaca", 20.6420, -100.4230, ["Menchaca", "Lomas de San Pedrito", "Felipe Carrillo Puerto"]),
+    ("Casa Blanca", 20.5700, -100.3800, ["Lomas de Casa Blanca", "Colinas del Cimatario", "Cimatario"]),
+]
+# Incidentes fuera de las zonas anteriores, uniformes en el área metropolitana
+BACKGROUND_BOUNDS = (20.48, 20.78, -100.55, -100.22)
+BACKGROUND_RATIO = 0.2
+HOTSPOT_SPREAD = 0.008  # desviación estándar en grados (~900 m)
+
+STREETS = [
+    "Avenida 5 de Febrero", "Bernardo Quintana", "Paseo Constituyentes", "Avenida Zaragoza",
+    "Avenida Universidad", "Prolongación Tecnológico", "Boulevard Juriquilla", "Avenida Pie de la Cuesta",
+    "Calle Madero", "Calle Juárez", "Avenida Corregidora", "Carretera 57", "Libramiento Sur Poniente",
+    "Avenida de la Luz", "Calle Hidalgo", "Avenida Ezequiel Montes", "Paseo de la República",
+    "Avenida Candiles", "Epigmenio González", "Avenida Fray Luis de León", "Avenida Revolución",
+    "Calzada de los Arcos", "Avenida Luis Pasteur", "Boulevard Bernardo Quintana Sur",
+]
+
+# (tipo_incidente, gravedades posibles, peso relativo)
+INCIDENT_TYPES = [
+    ("accidente vial", ["baja", "media", "alta"], 24),
+    ("robo", ["baja", "media"], 18),
+    ("robo de vehículo", ["media", "alta"], 10),
+    ("asalto", ["media", "alta"], 10),
+    ("robo a casa habitación", ["media"], 8),
+    ("bloqueo vial", ["baja", "media"], 7),
+    ("riña", ["baja", "media"], 6),
+    ("lesiones", ["media", "alta"], 6),
+    ("narcomenudeo", ["media"], 5),
+    ("homicidio", ["alta", "crítica"], 4),
+    ("incendio", ["media", "alta"], 2),
+]
+
+AGENCIES = [
+    "la Policía Municipal", "la Secretaría de Seguridad Ciudadana", "la Guardia Nacional",
+    "la Fiscalía General del Estado", "Protección Civil", "la Cruz Roja", "Tránsito Municipal", "el C5",
+]
+VEHICLES = ["un automóvil compacto", "una camioneta", "un tractocamión", "una motocicleta",
+            "un autobús de transporte público", "un taxi", "una pipa de agua", "un vehículo de carga"]
+COLORS = ["blanco", "gris", "negro", "rojo", "azul", "plateado", "verde", "color arena"]
+VICTIMS = ["un hombre", "una mujer", "un joven", "una adolescente", "un adulto mayor", "un repartidor",
+           "una comerciante", "un estudiante"]
+WEEKDAYS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+TITLES = [
+    "Reportan {tipo} sobre {calle} en {colonia}",
+    "{Tipo} en {colonia} deja {n} afectados",
+    "{Tipo} sobre {calle}; {agencia} atiende el reporte",
+    "Se registra {tipo} en {colonia} la {momento} del {dia}",
+    "Vecinos de {colonia} denuncian {tipo} cerca de {calle}",
+    "{Tipo} a la altura del número {numero} de {calle}",
+]
+SENTENCES = [
+    "De acuerdo con el reporte de {agencia}, el hecho ocurrió alrededor de las {hora} horas del {dia} sobre {calle}, en la colonia {colonia}.",
+    "En el lugar participaron {vehiculo} de color {color} y {vehiculo2}, cuyos ocupantes fueron valorados por paramédicos.",
+    "Según testigos, {victima} de {edad} años fue abordado por {n} sujetos que huyeron con dirección a {calle2}.",
+    "Elementos de {agencia2} acordonaron la zona durante cerca de {minutos} minutos mientras realizaban las diligencias.",
+    "La circulación en {calle} se vio afectada en dirección a {colonia2}, por lo que se recomendó tomar {calle2} como alternativa.",
+    "Hasta el momento se reportan {n} personas detenidas, quienes fueron puestas a disposición del Ministerio Público.",
+    "Vecinos de {colonia} señalaron que en las últimas {semanas} semanas se han registrado al menos {n2} hechos similares en la zona.",
+    "El reporte se recibió a través del número de emergencias 911 con el folio {folio} y fue canalizado a {agencia}.",
+    "Personal de {agencia2} revisa las cámaras de videovigilancia de {calle} para identificar a los responsables.",
+    "{Victima} resultó con lesiones {lesion} y fue trasladado a un hospital de {colonia2} para su atención.",
+    "La unidad involucrada, {vehiculo} {color}, quedó resguardada en un corralón de {colonia2} con el número de inventario {folio}.",
+    "Autoridades municipales anunciaron un operativo de vigilancia de {minutos} días en {colonia} y colonias aledañas.",
+    "El tramo de {calle} entre {calle2} y {calle3} permaneció cerrado {n} horas mientras se retiraban los vehículos.",
+    "Comerciantes de la zona estimaron pérdidas por {monto} pesos debido al cierre de los accesos.",
+    "La Fiscalía abrió la carpeta de investigación {folio} y pidió a quien tenga información llamar al 089.",
+]
+INJURIES = ["leves", "de consideración", "que no ponen en riesgo su vida", "graves"]
+
+CITIZEN_DESCRIPTIONS = [
+    "Hay {tipo} en {calle} a la altura de {colonia}, circulen con precaución",
+    "Acabo de ver {tipo} en {colonia}, llegó {agencia}",
+    "Tráfico detenido en {calle} por {tipo}, lleva {minutos} minutos sin avanzar",
+    "Reporto {tipo} frente al número {numero} de {calle}, {colonia}",
+    "Se escucharon disparos cerca de {calle}, en {colonia}",
+    "Semáforo descompuesto en {calle} y {calle2}, hay riesgo de choque",
+]
+CITIZEN_TYPES = ["accidente", "robo", "asalto", "bloqueo_vial", "vandalismo", "disparos", "reporte_ciudadano"]
+CITIZEN_SEVERITIES = ["baja", "media", "alta"]
+
+
+class DatasetGenerator:
+    """Incidentes, ciclos del pipeline y reportes ciudadanos sintéticos y reproducibles."""
+
+    def __init__(self, seed=0, content_chars=1200, ungeocoded_ratio=0.05):
+        self.random = random.Random(seed)
+        self.content_chars = content_chars
+        self.ungeocoded_ratio = ungeocoded_ratio
+        self._type_weights = [weight for _, _, weight in INCIDENT_TYPES]
+
+    def point(self):
+        """(lat, lng, nombre de la zona, colonia) alrededor de una zona caliente o en el fondo."""
+        r = self.random
+        if r.random() < BACKGROUND_RATIO:
+            lat_min, lat_max, lng_min, lng_max = BACKGROUND_BOUNDS
+            hotspot = r.choice(HOTSPOTS)
+            return r.uniform(lat_min, lat_max), r.uniform(lng_min, lng_max), hotspot[0], r.choice(hotspot[3])
+        name, lat, lng, colonias = r.choice(HOTSPOTS)
+        return r.gauss(lat, HOTSPOT_SPREAD), r.gauss(lng, HOTSPOT_SPREAD), name, r.choice(colonias)
+
+    def _slots(self, tipo, colonia):
+        r = self.random
+        calles = r.sample(STREETS, 3)
+        victima = r.choice(VICTIMS)
+        return {
+            "tipo": tipo, "Tipo": tipo[0].upper() + tipo[1:],
+            "calle": calles[0], "calle2": calles[1], "calle3": calles[2],
+            "colonia": colonia, "colonia2": r.choice(r.choice(HOTSPOTS)[3]),
+            "agencia": r.choice(AGENCIES), "agencia2": r.choice(AGENCIES),
+            "vehiculo": r.choice(VEHICLES), "vehiculo2": r.choice(VEHICLES), "color": r.choice(COLORS),
+            "victima": victima, "Victima": victima[0].upper() + victima[1:],
+            "edad": r.randint(16, 78), "n": r.randint(1, 5), "n2": r.randint(2, 9),
+            "hora": f"{r.randint(0, 23):02d}:{r.randint(0, 59):02d}",
+            "dia": r.choice(WEEKDAYS), "momento": r.choice(["mañana", "tarde", "noche", "madrugada"]),
+            "minutos": r.randint(10, 240), "semanas": r.randint(2, 12),
+            "numero": r.randint(1, 3500), "folio": f"{r.randint(100000, 999999)}",
+            "monto": f"{r.randint(5, 500) * 1000:,}", "lesion": r.choice(INJURIES),
+        }
+
+    def incident(self, incident_id, published_at):
+        r = self.random
+        tipo, severities, _ = r.choices(INCIDENT_TYPES, weights=self._type_weights)[0]
+        lat, lng, zona, colonia = self.point()
+        slots = self._slots(tipo, colonia)
+
+        sentences = r.sample(SENTENCES, r.randint(5, 8))
+        content = " ".join(sentence.format(**slots) for sentence in sentences)
+        while len(content) < self.content_chars:
+            content += " " + r.choice(SENTENCES).format(**self._slots(tipo, colonia))
+        content = content[:self.content_chars] if self.content_chars else content
+
+        occurred = published_at - timedelta(minutes=r.randint(20, 600))
+        geocoded = r.random() >= self.ungeocoded_ratio
+        return {
+            "id": incident_id,
+            "noticia": r.choice(TITLES).format(**slots),
+            "url": f"https://noticias.example/{zona.lower().replace(' ', '-')}/{slots['folio']}-{incident_id}",
+            "fecha_publicacion": published_at.strftime("%d/%m/%Y"),
+            "lugar": f"{slots['calle']} {slots['numero']}, {colonia}",
+            "fecha_incidente": occurred.strftime("%d/%m/%Y"),
+            "hora_incidente": occurred.strftime("%H:%M"),
+            "tipo_incidente": tipo,
+            "gravedad": r.choice(severities),
+            "resumen": sentences[0].format(**slots),
+            "impacto_vial": slots["calle"] if r.random() < 0.4 else "ninguna",
+            "contenido_completo": content,
+            "coordenadas": {"lat": round(lat, 6), "lng": round(lng, 6)} if geocoded else None
+        }
+
+    def pipeline_output(self, timestamp, incidents):
+        """Un ciclo del pipeline con la estructura de security_data.json."""
+        main = {k: v for k, v in incidents[0].items() if k != "contenido_completo"} if incidents else {}
+        return {
+            "timestamp": timestamp.isoformat(),
+            "incidents": incidents,
+            "main_incident": main,
+            "analysis": {
+                "pattern": "Incidentes concentrados en vialidades principales en horas pico",
+                "impact": "Afectación moderada a la circulación",
+                "affected_routes": self.random.sample(STREETS, 2)
+            },
+            "recommendations": [f"Evitar {street} en horas pico" for street in self.random.sample(STREETS, 3)],
+            "reports": {
+                "authorities": "Reforzar la vigilancia en las zonas con más incidentes.",
+                "citizens": "Tome rutas alternas y considere tiempos de traslado mayores.",
+                "media": "Se registraron varios incidentes en vialidades principales de Querétaro."
+            }
+        }
+
+    def history(self, incidents, entries, days, duplicate_ratio, now):
+        """Genera los ciclos del historial del más antiguo al más reciente."""
+        entries = max(1, entries)
+        per_entry, remainder = divmod(incidents, entries)
+        step = timedelta(days=days) / entries
+        recent = []  # incidentes de los ciclos anteriores que pueden volver a aparecer
+        for index in range(entries):
+            timestamp = now - step * (entries - index)
+            count = per_entry + (1 if index < remainder else 0)
+            cycle = []
+            for position in range(count):
+                if recent and self.random.random() < duplicate_ratio:
+                    incident = dict(self.random.choice(recent), id=position)
+                else:
+                    incident = self.incident(position, timestamp)
+                cycle.append(incident)
+            recent = cycle[-200:]
+            yield self.pipeline_output(timestamp, cycle)
+
+    def citizen_report(self, timestamp):
+        r = self.random
+        lat, lng, _, colonia = self.point()
+        tipo = r.choice(CITIZEN_TYPES)
+        slots = self._slots(tipo.replace("_", " "), colonia)
+        report = {
+            "id": f"{r.getrandbits(32):08x}",
+            "timestamp": timestamp.isoformat(),
+            "description": r.choice(CITIZEN_DESCRIPTIONS).format(**slots),
+            "tipo": tipo,
+            "coordenadas": {"lat": round(lat, 6), "lng": round(lng, 6)},
+            "lugar": f"{slots['calle']}, {colonia}",
+            "source": "citizen",
+            "verified": r.random() < 0.1,
+            "severity": r.choice(CITIZEN_SEVERITIES)
+        }
+        if r.random() < 0.3:
+            report["name"] = r.choice(["Ana", "Luis", "María", "Jorge", "Fernanda", "Carlos", "Sofía", "Miguel"])
+        return report
+
+    def citizen_reports(self, count, hours, now):
+        offsets = sorted(self.random.uniform(0, hours * 3600) for _ in range(count))
+        return [self.citizen_report(now - timedelta(seconds=offset)) for offset in reversed(offsets)]
+
+
+def write_json_list(path, items):
+    """Escribe una lista JSON elemento por elemento, sin tenerla completa en memoria."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for item in items:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(item, ensure_ascii=False))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos de incidentes de Querétaro")
+    parser.add_argument("--incidents", type=int, default=10000, help="incidentes en todo el historial")
+    parser.add_argument("--entries", type=int, default=100, help="ciclos del pipeline en el historial")
+    parser.add_argument("--days", type=float, default=7, help="días que abarca el historial")
+    parser.add_argument("--current-incidents", type=int, default=5, help="incidentes en security_data.json")
+    parser.add_argument("--citizen-reports", type=int, default=None,
+                        help="reportes ciudadanos (por defecto, uno por cada 10 incidentes)")
+    parser.add_argument("--citizen-hours", type=float, default=24,
+                        help="horas que abarcan los reportes ciudadanos (la aplicación conserva un día)")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3,
+                        help="fracción de incidentes que repiten una noticia de ciclos anteriores")
+    parser.add_argument("--ungeocoded-ratio", type=float, default=0.05, help="fracción de incidentes sin coordenadas")
+    parser.add_argument("--content-chars", type=int, default=1200, help="longitud del contenido de cada noticia")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="dataset", help="directorio de salida")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.out_dir, exist_ok=True)
+    now = datetime.now()
+    generator = DatasetGenerator(args.seed, args.content_chars, args.ungeocoded_ratio)
+
+    # Se generan del más antiguo al más reciente, pero el archivo guarda el más reciente primero:
+    # se escriben en orden y se invierte el archivo ya terminado, ciclo por ciclo
+    history_path = os.path.join(args.out_dir, "historical_data.json")
+    chronological_path = history_path + ".tmp"
+    offsets = []
+    with open(chronological_path, "w", encoding="utf-8") as f:
+        for entry in generator.history(args.incidents, args.entries, args.days, args.duplicate_ratio, now):
+            offsets.append(f.tell())
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    with open(chronological_path, "r", encoding="utf-8") as source:
+        def newest_first():
+            for offset in reversed(offsets):
+                source.seek(offset)
+                yield json.loads(source.readline())
+        entries = write_json_list(history_path, newest_first())
+    os.remove(chronological_path)
+
+    current = generator.pipeline_output(
+        now, [generator.incident(position, now) for position in range(args.current_incidents)])
+    with open(os.path.join(args.out_dir, "security_data.json"), "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+
+    citizen_count = args.citizen_reports if args.citizen_reports is not None else args.incidents // 10
+    reports = generator.citizen_reports(citizen_count, args.citizen_hours, now)
+    write_json_list(os.path.join(args.out_dir, "citizen_reports.json"), reports)
+
+    manifest = {
+        "generated_at": now.isoformat(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "out_dir"},
+        "history_entries": entries,
+        "history_incidents": args.incidents,
+        "current_incidents": args.current_incidents,
+        "citizen_reports": citizen_count
+    }
+    with open(os.path.join(args.out_dir, "dataset.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"{args.incidents} incidentes en {entries} ciclos, {args.current_incidents} actuales y "
+          f"{citizen_count} reportes ciudadanos en {os.path.abspath(args.out_dir)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
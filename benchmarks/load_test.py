@@ -0,0 +1,334 @@
+# benchmarks/load_test.py
+# Prueba de carga de la API de Flask: latencia p50/p95/p99 y rendimiento por endpoint
+"""
+Uso, desde la raíz del repositorio:
+
+    python -m benchmarks.generate_dataset --incidents 100000 --out-dir datasets/100k
+    python -m benchmarks.load_test --dataset datasets/100k --concurrency 8 --duration 20 --output load.json
+
+Con ``--dataset`` el driver arranca la aplicación con gunicorn (misma configuración
+que el Dockerfile) en un directorio de trabajo con una copia de los datos, sin el
+planificador del pipeline, y espera a que termine de importar los datos; el tiempo de
+arranque también se reporta. Con ``--url`` se mide un servidor ya en marcha.
+
+Cada escenario se mide por separado: ``--concurrency`` clientes con conexiones
+persistentes hacen peticiones sin pausa durante ``--duration`` segundos (o hasta
+completar ``--requests``). La primera petición de cada escenario se reporta aparte
+porque es la que construye los índices y cachés de la aplicación. Los reportes
+ciudadanos (POST) se miden al final porque invalidan las respuestas en caché.
+
+El cliente también usa CPU: para concurrencias altas conviene ejecutarlo en otra
+máquina con ``--url``.
+"""
+
+import os
+import sys
+import time
+import json
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from datetime import datetime
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.generate_dataset import DatasetGenerator, HOTSPOTS
+from benchmarks.report import describe, environment, write_report
+
+DATASET_FILES = ["historical_data.json", "security_data.json", "citizen_reports.json", "dataset.json"]
+VIEWPORT_PIXELS = (1280, 800)  # tamaño del mapa en un navegador de escritorio
+HEATMAP_ZOOMS = [11, 12, 13, 14, 15]
+
+
+def viewport_bbox(lat, lng, zoom, pixels=VIEWPORT_PIXELS):
+    """bbox ``minLng,minLat,maxLng,maxLat`` visible en un mapa web centrado en (lat, lng)."""
+    degrees_per_pixel = 360 / (256 * 2 ** zoom)
+    half_width, half_height = pixels[0] * degrees_per_pixel / 2, pixels[1] * degrees_per_pixel / 2
+    return f"{lng - half_width:.6f},{lat - half_height:.6f},{lng + half_width:.6f},{lat + half_height:.6f}"
+
+
+class Scenarios:
+    """Peticiones de cada endpoint, con parámetros variados como los de los navegadores."""
+
+    NAMES = ["all-incidents", "heatmap", "latest-news", "historical-data", "citizen-report"]
+
+    def __init__(self, history_days=7):
+        self.history_days = history_days
+
+    def build(self, name, rng, generator):
+        if name == "all-incidents":
+            return "GET", "/api/all-incidents", {}
+        if name == "heatmap":
+            _, lat, lng, _ = rng.choice(HOTSPOTS)
+            zoom = rng.choice(HEATMAP_ZOOMS)
+            bbox = viewport_bbox(lat + rng.uniform(-0.02, 0.02), lng + rng.uniform(-0.02, 0.02), zoom)
+            return "GET", f"/api/heatmap_data?zoom={zoom}&bbox={bbox}", {}
+        if name == "latest-news":
+            return "GET", "/api/latest_news", {}
+        if name == "historical-data":
+            return "GET", f"/api/historical_data?days={self.history_days}", {}
+        if name == "citizen-report":
+            report = generator.citizen_report(datetime.now())
+            payload = {
+                "description": report["description"],
+                "latitude": report["coordenadas"]["lat"],
+                "longitude": report["coordenadas"]["lng"],
+                "incident_type": report["tipo"],
+                "location_name": report["lugar"],
+                "severity": report["severity"]
+            }
+            return "POST", "/api/citizen-reports", {"json": payload}
+        raise ValueError(f"Escenario desconocido: {name}")
+
+
+def timed_request(session, base_url, method, path, kwargs, timeout, etags=None):
+    """(segundos, código de estado o "error", bytes recibidos en la red)."""
+    headers = {}
+    if etags is not None and method == "GET" and path in etags:
+        headers["If-None-Match"] = etags[path]
+    start = time.perf_counter()
+    try:
+        response = session.request(method, base_url + path, headers=headers, timeout=timeout, **kwargs)
+        body = response.content
+        seconds = time.perf_counter() - start
+    except requests.RequestException:
+        return time.perf_counter() - start, "error", 0
+    if etags is not None and response.headers.get("ETag"):
+        etags[path] = response.headers["ETag"]
+    return seconds, response.status_code, int(response.headers.get("Content-Length", len(body)))
+
+
+def run_scenario(base_url, scenarios, name, concurrency, duration, max_requests, timeout, seed, conditional):
+    # Primera petición: incluye la construcción de índices y cachés en la aplicación
+    warmup_session = requests.Session()
+    method, path, kwargs = scenarios.build(name, random.Random(seed), DatasetGenerator(seed))
+    first_seconds, first_status, _ = timed_request(warmup_session, base_url, method, path, kwargs, timeout)
+
+    samples = []
+    samples_lock = threading.Lock()
+    issued = [0]
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        generator = DatasetGenerator(seed * 1000 + index)
+        session = requests.Session()
+        etags = {} if conditional else None
+        local = []
+        while time.monotonic() < deadline:
+            if max_requests:
+                with samples_lock:
+                    if issued[0] >= max_requests:
+                        break
+                    issued[0] += 1
+            method, path, kwargs = scenarios.build(name, rng, generator)
+            local.append(timed_request(session, base_url, method, path, kwargs, timeout, etags))
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(index,), daemon=True) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(str(status) for _, status, _ in samples)
+    ok = [(seconds, size) for seconds, status, size in samples if status in (200, 304)]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "status": dict(statuses),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_seconds": describe([seconds for seconds, _ in ok]),
+        "response_bytes_mean": round(sum(size for _, size in ok) / len(ok)) if ok else None,
+        "first_request": {"seconds": round(first_seconds, 6), "status": first_status}
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_workdir(dataset, workdir):
+    """Directorio de trabajo con los archivos del dataset (enlazados si es posible)."""
+    os.makedirs(workdir, exist_ok=True)
+    for name in DATASET_FILES:
+        source, target = os.path.join(dataset, name), os.path.join(workdir, name)
+        if not os.path.exists(source) or os.path.exists(target):
+            continue
+        try:
+            # La aplicación solo lee estos archivos: un enlace evita copiar historiales grandes
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+
+class AppServer:
+    """La aplicación servida por gunicorn en un puerto local."""
+
+    def __init__(self, workdir, workers, threads, history_entries, startup_timeout):
+        self.workdir = workdir
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.startup_timeout = startup_timeout
+        self.command = [
+            sys.executable, "-m", "gunicorn",
+            "--config", os.path.join(ROOT, "gunicorn.conf.py"),
+            "--pythonpath", ROOT,
+            "--chdir", workdir,
+            "--bind", f"127.0.0.1:{self.port}",
+            "--workers", str(workers),
+            "--worker-class", "gthread",
+            "--threads", str(threads),
+            "--timeout", str(max(300, int(startup_timeout))),
+            "--log-level", "warning",
+            "--preload",
+            "app:app"
+        ]
+        self.env = dict(
+            os.environ,
+            SCHEDULER_ENABLED="0",
+            THREADS=str(threads),
+            HISTORY_MAX_ENTRIES=str(max(100, history_entries))
+        )
+        self.process = None
+        self.startup_seconds = None
+
+    def start(self):
+        log = open(os.path.join(self.workdir, "server.log"), "ab")
+        started = time.perf_counter()
+        self.process = subprocess.Popen(self.command, cwd=self.workdir, env=self.env, stdout=log, stderr=log)
+        log.close()
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn terminó al arrancar (ver {os.path.join(self.workdir, 'server.log')})")
+            try:
+                # Responde cuando los workers terminaron de importar los datos
+                if requests.get(self.base_url + "/api/security_data", timeout=self.startup_timeout).ok:
+                    self.startup_seconds = time.perf_counter() - started
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise TimeoutError(f"La aplicación no respondió en {self.startup_timeout} segundos")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def print_summary(results):
+    print(f"{'endpoint':<18}{'peticiones':>11}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'errores':>9}{'primera ms':>12}")
+    for name, result in results.items():
+        latency = result["latency_seconds"]
+
+        def ms(key):
+            return f"{latency[key] * 1000:.1f}" if latency.get(key) is not None else "-"
+
+        print(f"{name:<18}{result['requests']:>11}{result['throughput_rps'] or 0:>9.1f}{ms('p50'):>9}{ms('p95'):>9}"
+              f"{ms('p99'):>9}{result['errors']:>9}{result['first_request']['seconds'] * 1000:>12.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con un dataset sintético")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--dataset", help="directorio generado con benchmarks.generate_dataset")
+    target.add_argument("--url", help="URL base de un servidor ya en marcha")
+    parser.add_argument("--endpoints", default=",".join(Scenarios.NAMES),
+                        help=f"escenarios separados por comas ({', '.join(Scenarios.NAMES)})")
+    parser.add_argument("--concurrency", type=int, default=8, help="clientes simultáneos")
+    parser.add_argument("--duration", type=float, default=15, help="segundos por escenario")
+    parser.add_argument("--requests", type=int, default=0, help="máximo de peticiones por escenario (0 = sin límite)")
+    parser.add_argument("--timeout", type=float, default=60, help="tiempo límite por petición")
+    parser.add_argument("--conditional", action="store_true",
+                        help="reenviar el ETag recibido (If-None-Match), como el navegador al sondear")
+    parser.add_argument("--history-days", type=int, default=7, help="parámetro days de /api/historical_data")
+    parser.add_argument("--workers", type=int, default=1, help="workers de gunicorn (con --dataset)")
+    parser.add_argument("--threads", type=int, default=16, help="hilos por worker (con --dataset)")
+    parser.add_argument("--startup-timeout", type=float, default=900, help="espera máxima al arranque (con --dataset)")
+    parser.add_argument("--workdir", help="directorio de trabajo del servidor; si se reutiliza, se omite la importación")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="archivo donde guardar el reporte JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in names if name not in Scenarios.NAMES]
+    if unknown:
+        print(f"Escenarios desconocidos: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    # Los POST cambian los datos e invalidan las respuestas en caché: se miden al final
+    names.sort(key=lambda name: name == "citizen-report")
+
+    server = tmpdir = None
+    dataset = None
+    if args.dataset:
+        with open(os.path.join(args.dataset, "dataset.json"), "r", encoding="utf-8") as f:
+            dataset = json.load(f)
+        tmpdir = None if args.workdir else tempfile.TemporaryDirectory(prefix="seguridad-load-")
+        workdir = os.path.abspath(args.workdir or tmpdir.name)
+        prepare_workdir(args.dataset, workdir)
+        print(f"Arrancando la aplicación en {workdir}...", file=sys.stderr)
+        server = AppServer(workdir, args.workers, args.threads, dataset["history_entries"], args.startup_timeout).start()
+        base_url = server.base_url
+        print(f"Aplicación lista en {server.startup_seconds:.1f}s", file=sys.stderr)
+    else:
+        base_url = args.url.rstrip("/")
+
+    scenarios = Scenarios(history_days=args.history_days)
+    results = {}
+    try:
+        for name in names:
+            print(f"Midiendo {name}...", file=sys.stderr)
+            results[name] = run_scenario(base_url, scenarios, name, args.concurrency, args.duration,
+                                         args.requests, args.timeout, args.seed, args.conditional)
+    finally:
+        if server is not None:
+            server.stop()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    report = {
+        "benchmark": "load",
+        "environment": environment(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "workdir")},
+        "dataset": dataset,
+        "server": {
+            "startup_seconds": round(server.startup_seconds, 3),
+            "workers": args.workers,
+            "threads": args.threads
+        } if server is not None else {"url": base_url},
+        "endpoints": results
+    }
+    print_summary(results)
+    if args.output:
+        write_report(os.path.abspath(args.output), report)
+        print(f"Reporte guardado en {os.path.abspath(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+# benchmarks/pipeline_benchmark.py
+# Mide graph.invoke de extremo a extremo sin red, con sustitutos locales de todos los servicios externos
+"""
+Uso, desde la raíz del repositorio:
+
+    python -m benchmarks.pipeline_benchmark --runs 5 --llm-latency 0.5 --output bench.json
+    python -m benchmarks.pipeline_benchmark --runs 5 --llm-latency 0.5 --baseline bench.json
+
+Cada ejecución invoca el grafo completo de gguard contra un LLM, una búsqueda, un
+geocodificador y sitios de noticias locales (``benchmarks/fakes.py``). El reporte JSON
+incluye la duración total, el tiempo y número de ejecuciones de cada agente y las
+llamadas a cada servicio externo. Los tiempos de los agentes del subgrafo también
+cuentan dentro de ``subgrafo_analisis``.
+
+Con ``--cache cold`` (por defecto) las cachés en disco se vacían antes de cada
+ejecución; con ``--cache warm`` se hace una ejecución previa sin medir y las demás
+reutilizan las cachés, como en las actualizaciones periódicas.
+
+Con ``--baseline`` se compara contra un reporte anterior con la misma configuración y
+el proceso termina con código 1 si hay regresiones: más llamadas a un servicio, o un
+p50 más lento que el del reporte anterior en más de ``--tolerance``.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FakeServices, Latency, load_articles
+from benchmarks.report import describe, environment, write_report, load_report
+
+# Diferencia mínima en segundos para considerar una regresión de tiempo (ruido del reloj)
+MIN_REGRESSION_SECONDS = 0.005
+
+INITIAL_STATE = {"start_signal": "Y", "raw_data": None, "all_incidents": []}
+
+
+def sample_totals(families, sample_name, label):
+    """Suma de las muestras ``sample_name`` agrupadas por el valor de la etiqueta ``label``."""
+    totals = {}
+    for _, _, _, samples in families:
+        for name, labels, value in samples:
+            if name == sample_name:
+                key = labels.get(label)
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def delta(after, before):
+    return {key: value - before.get(key, 0) for key, value in after.items() if value - before.get(key, 0)}
+
+
+def run_once(gguard, registry, services):
+    """Una invocación del grafo con las métricas de gguard y los contadores de los sustitutos."""
+    before = registry.collect()
+    services.counters.reset()
+
+    start = time.perf_counter()
+    result = gguard.graph.invoke(dict(INITIAL_STATE))
+    seconds = time.perf_counter() - start
+
+    after = registry.collect()
+
+    def changes(sample_name, label):
+        return delta(sample_totals(after, sample_name, label), sample_totals(before, sample_name, label))
+
+    agent_seconds = changes("seguridad_agent_duration_seconds_sum", "agent")
+    agent_calls = changes("seguridad_agent_duration_seconds_count", "agent")
+    llm_seconds = changes("seguridad_llm_request_duration_seconds_sum", "agent")
+    llm_calls = changes("seguridad_llm_request_duration_seconds_count", "agent")
+    return {
+        "seconds": round(seconds, 6),
+        "incidents": len(result.get("raw_data") or []),
+        "agents": {
+            agent: {"seconds": round(agent_seconds.get(agent, 0.0), 6), "calls": int(calls)}
+            for agent, calls in agent_calls.items()
+        },
+        "llm": {
+            agent: {"seconds": round(llm_seconds.get(agent, 0.0), 6), "calls": int(calls)}
+            for agent, calls in llm_calls.items()
+        },
+        "llm_tokens": {key: int(value) for key, value in changes("seguridad_llm_tokens_total", "direction").items()},
+        "services": services.counters.snapshot()
+    }
+
+
+def summarize(runs):
+    def per_run(section):
+        names = sorted({name for run in runs for name in run[section]})
+        return {
+            name: {
+                "seconds": describe([run[section].get(name, {}).get("seconds", 0.0) for run in runs]),
+                "calls_per_run": sum(run[section].get(name, {}).get("calls", 0) for run in runs) / len(runs)
+            }
+            for name in names
+        }
+
+    services = sorted({name for run in runs for name in run["services"]})
+    return {
+        "seconds": describe([run["seconds"] for run in runs]),
+        "incidents_per_run": sum(run["incidents"] for run in runs) / len(runs),
+        "agents": per_run("agents"),
+        "llm": per_run("llm"),
+        "services": {name: sum(run["services"].get(name, 0) for run in runs) / len(runs) for name in services}
+    }
+
+
+def find_regressions(summary, baseline, tolerance):
+    """Diferencias respecto a ``baseline`` que indican una regresión, como texto."""
+    regressions = []
+
+    def slower(label, current, previous):
+        if current is None or previous is None:
+            return
+        if current > previous * (1 + tolerance) and current - previous > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{label}: p50 {previous:.3f}s -> {current:.3f}s")
+
+    slower("graph.invoke", summary["seconds"].get("p50"), baseline["seconds"].get("p50"))
+    for agent, stats in summary["agents"].items():
+        previous = baseline["agents"].get(agent)
+        if previous:
+            slower(f"agente {agent}", stats["seconds"].get("p50"), previous["seconds"].get("p50"))
+
+    # Las llamadas son deterministas: cualquier aumento es una regresión
+    for section, label in (("llm", "llamadas al LLM"), ("agents", "ejecuciones")):
+        for name, stats in summary[section].items():
+            previous = baseline[section].get(name, {}).get("calls_per_run", 0)
+            if stats["calls_per_run"] > previous:
+                regressions.append(f"{label} de {name}: {previous:g} -> {stats['calls_per_run']:g} por ejecución")
+    for name, calls in summary["services"].items():
+        previous = baseline["services"].get(name, 0)
+        if calls > previous:
+            regressions.append(f"llamadas a {name}: {previous:g} -> {calls:g} por ejecución")
+    return regressions
+
+
+def print_summary(summary):
+    seconds = summary["seconds"]
+    print(f"graph.invoke: p50 {seconds['p50']:.3f}s  p95 {seconds['p95']:.3f}s  "
+          f"media {seconds['mean']:.3f}s  ({seconds['count']} ejecuciones, "
+          f"{summary['incidents_per_run']:g} incidentes por ejecución)")
+    print(f"{'agente':<20}{'p50 (s)':>10}{'media (s)':>11}{'ejec.':>7}{'LLM':>6}")
+    for agent, stats in summary["agents"].items():
+        llm_calls = summary["llm"].get(agent, {}).get("calls_per_run", 0)
+        print(f"{agent:<20}{stats['seconds']['p50']:>10.3f}{stats['seconds']['mean']:>11.3f}"
+              f"{stats['calls_per_run']:>7g}{llm_calls:>6g}")
+    other_llm = {agent: stats for agent, stats in summary["llm"].items() if agent not in summary["agents"]}
+    for agent, stats in other_llm.items():
+        print(f"  llamadas LLM {agent}: {stats['calls_per_run']:g} por ejecución")
+    print("servicios por ejecución: " + ", ".join(f"{name}={calls:g}" for name, calls in summary["services"].items()))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sin red del pipeline de LangGraph (gguard.graph.invoke)")
+    parser.add_argument("--runs", type=int, default=5, help="ejecuciones medidas")
+    parser.add_argument("--cache", choices=["cold", "warm"], default="cold",
+                        help="vaciar las cachés en disco antes de cada ejecución (cold) o reutilizarlas (warm)")
+    parser.add_argument("--results", type=int, default=None,
+                        help="resultados de búsqueda por ejecución (por defecto, uno por artículo guardado)")
+    parser.add_argument("--analyze-all", action="store_true", help="analizar todos los incidentes (ANALYZE_ALL_INCIDENTS=1)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="segundos por respuesta del LLM")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="variación ± de la latencia del LLM")
+    parser.add_argument("--fetch-latency", type=float, default=0.05, help="segundos por descarga de artículo")
+    parser.add_argument("--geocode-latency", type=float, default=0.02, help="segundos por geocodificación")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="segundos por búsqueda")
+    parser.add_argument("--seed", type=int, default=0, help="semilla de la variación de latencias")
+    parser.add_argument("--output", help="archivo donde guardar el reporte JSON")
+    parser.add_argument("--baseline", help="reporte anterior contra el cual buscar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="aumento relativo tolerado en los p50")
+    parser.add_argument("--workdir", help="directorio de trabajo (por defecto uno temporal)")
+    parser.add_argument("--verbose", action="store_true", help="mostrar los logs del pipeline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = load_report(os.path.abspath(args.baseline))["summary"] if args.baseline else None
+
+    services = FakeServices(
+        articles=load_articles(),
+        results=args.results,
+        llm_latency=Latency(args.llm_latency, args.llm_jitter, args.seed),
+        fetch_latency=Latency(args.fetch_latency, seed=args.seed + 1),
+        geocode_latency=Latency(args.geocode_latency, seed=args.seed + 2),
+        search_latency=Latency(args.search_latency, seed=args.seed + 3)
+    )
+    tmpdir = None if args.workdir else tempfile.TemporaryDirectory(prefix="seguridad-bench-")
+    workdir = os.path.abspath(args.workdir or tmpdir.name)
+    os.makedirs(workdir, exist_ok=True)
+
+    try:
+        # gguard lee su configuración al importarse y el reporter escribe security_data.json
+        # en el directorio actual: ambos deben quedar dentro del directorio de trabajo
+        os.chdir(workdir)
+        os.environ.update(services.environ())
+        os.environ["CACHE_DB_FILE"] = os.path.join(workdir, "cache.db")
+        os.environ["ANALYZE_ALL_INCIDENTS"] = "1" if args.analyze_all else "0"
+
+        gguard = importlib.import_module("gguard")
+        from metrics import REGISTRY
+        services.install(gguard)
+        logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+        caches = [gguard.llm_cache, gguard.geocode_cache, gguard.article_index]
+
+        warmup = None
+        if args.cache == "warm":
+            for cache in caches:
+                cache.clear()
+            warmup = run_once(gguard, REGISTRY, services)
+
+        runs = []
+        for number in range(1, args.runs + 1):
+            if args.cache == "cold":
+                for cache in caches:
+                    cache.clear()
+            run = run_once(gguard, REGISTRY, services)
+            run["run"] = number
+            runs.append(run)
+            print(f"ejecución {number}/{args.runs}: {run['seconds']:.3f}s, {run['incidents']} incidentes",
+                  file=sys.stderr)
+    finally:
+        os.chdir(ROOT)
+        services.stop()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    summary = summarize(runs)
+    report = {
+        "benchmark": "pipeline",
+        "environment": environment(),
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "baseline", "workdir", "verbose")},
+        "search_results": len(services.search_results),
+        "warmup": warmup,
+        "summary": summary,
+        "runs": runs
+    }
+    regressions = find_regressions(summary, baseline, args.tolerance) if baseline is not None else None
+    if regressions is not None:
+        report["regressions"] = regressions
+
+    print_summary(summary)
+    if output:
+        write_report(output, report)
+        print(f"Reporte guardado en {output}")
+
+    if regressions:
+        print("Regresiones respecto al reporte anterior:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    if regressions is not None:
+        print("Sin regresiones respecto al reporte anterior")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# disk_cache.py
+# Caché persistente en disco (SQLite) compartida por los agentes del grafo
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Archivo por defecto para las cachés persistentes
+CACHE_DB_FILE = os.getenv("CACHE_DB_FILE", "cache.db")
+
+# Cada cuántas escrituras se revisa el límite de entradas
+EVICTION_CHECK_INTERVAL = 50
+
+
+class DiskCache:
+    """Caché clave-valor en SQLite con TTL, caché negativa y desalojo LRU.
+
+    Los valores se guardan serializados como JSON. Un valor ``None`` guardado
+    con ``set_negative`` representa una búsqueda que ya falló y se conserva
+    durante ``negative_ttl`` segundos.
+    """
+
+    def __init__(self, namespace, ttl, negative_ttl=None, max_entries=10000, path=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self.max_entries = max_entries
+        self.path = path or CACHE_DB_FILE
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = None
+
+    def _connection(self):
+        # Abrir la conexión de forma perezosa para no tocar disco al importar
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS "{self.namespace}" (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS "{self.namespace}_last_access" '
+                f'ON "{self.namespace}" (last_access)'
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, key):
+        """Devuelve ``(encontrado, valor)``; ``valor`` es ``None`` en entradas negativas."""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    f'SELECT value, expires_at FROM "{self.namespace}" WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None or row[1] < now:
+                    self.misses += 1
+                    return False, None
+                conn.execute(
+                    f'UPDATE "{self.namespace}" SET last_access = ? WHERE key = ?', (now, key)
+                )
+                conn.commit()
+                self.hits += 1
+                if row[0] is None:
+                    self.negative_hits += 1
+                    return True, None
+                return True, json.loads(row[0])
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Caché '{self.namespace}': error leyendo '{key}': {e}")
+            return False, None
+
+    def set(self, key, value, ttl=None):
+        """Guarda un valor positivo."""
+        self._store(key, json.dumps(value, ensure_ascii=False), ttl if ttl is not None else self.ttl)
+
+    def set_negative(self, key, ttl=None):
+        """Recuerda que ``key`` no tiene resultado durante ``negative_ttl`` segundos."""
+        self._store(key, None, ttl if ttl is not None else self.negative_ttl)
+
+    def delete(self, key):
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(f'DELETE FROM "{self.namespace}" WHERE key = ?', (key,))
+                conn.commit()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Caché '{self.namespace}': error borrando '{key}': {e}")
+
+    def clear(self):
+        """Elimina todas las entradas del espacio de nombres."""
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(f'DELETE FROM "{self.namespace}"')
+                conn.commit()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Caché '{self.namespace}': error vaciando: {e}")
+
+    def _store(self, key, serialized, ttl):
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    f'INSERT OR REPLACE INTO "{self.namespace}" (key, value, expires_at, last_access) '
+                    f'VALUES (?, ?, ?, ?)',
+                    (key, serialized, now + ttl, now)
+                )
+                self._writes += 1
+                if self._writes % EVICTION_CHECK_INTERVAL == 0:
+                    self._evict(conn, now)
+                conn.commit()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Caché '{self.namespace}': error guardando '{key}': {e}")
+
+    def _evict(self, conn, now):
+        # Eliminar primero las entradas expiradas y después las menos usadas
+        conn.execute(f'DELETE FROM "{self.namespace}" WHERE expires_at < ?', (now,))
+        count = conn.execute(f'SELECT COUNT(*) FROM "{self.namespace}"').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                f'DELETE FROM "{self.namespace}" WHERE key IN ('
+                f'SELECT key FROM "{self.namespace}" ORDER BY last_access LIMIT ?)',
+                (excess,)
+            )
+            logger.info(f"Caché '{self.namespace}': desalojadas {excess} entradas por LRU")
+
+    def stats(self):
+        """Contadores de aciertos y fallos desde el arranque del proceso."""
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
@@ -0,0 +1,152 @@
+# event_stream.py
+# Canal Server-Sent Events que avisa a los navegadores cuando cambian los datos
+
+import os
+import json
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Con el worker gthread de gunicorn cada conexión abierta ocupa un hilo: se limita el
+# número de conexiones (por defecto la mitad de los hilos del worker) y su duración para
+# que siempre queden hilos para la API normal
+STREAM_MAX_CLIENTS = int(os.getenv("STREAM_MAX_CLIENTS", str(max(1, int(os.getenv("THREADS", "4")) // 2))))
+STREAM_MAX_DURATION = int(os.getenv("STREAM_MAX_DURATION", "300"))  # segundos por conexión
+STREAM_HEARTBEAT_INTERVAL = 15  # comentario periódico para detectar clientes desconectados
+STREAM_RETRY_MS = 3000  # espera sugerida al navegador antes de reconectar
+VERSION_CHECK_INTERVAL = 1.0  # revisión de cambios hechos por otros procesos
+
+
+def format_event(event, data, event_id=None):
+    """Mensaje SSE con ``data`` serializado como JSON en una sola línea."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class VersionBroadcaster:
+    """Detecta cambios de versión de las fuentes de datos y los reparte a los suscriptores.
+
+    ``sources`` asocia un nombre con una función que devuelve la versión actual de esos
+    datos (barata de calcular). Un hilo revisa las versiones cada ``check_interval``
+    segundos mientras haya clientes conectados, lo que también capta los cambios hechos
+    por otros procesos; ``notify()`` fuerza la revisión inmediata tras un cambio local.
+    ``deltas`` puede asociar un nombre con una función que devuelve el detalle de lo
+    nuevo en esa fuente para incluirlo en el evento.
+    """
+
+    def __init__(self, sources, deltas=None, max_clients=STREAM_MAX_CLIENTS,
+                 max_duration=STREAM_MAX_DURATION, heartbeat_interval=STREAM_HEARTBEAT_INTERVAL,
+                 check_interval=VERSION_CHECK_INTERVAL):
+        self.sources = sources
+        self.deltas = deltas or {}
+        self.max_clients = max_clients
+        self.max_duration = max_duration
+        self.heartbeat_interval = heartbeat_interval
+        self.check_interval = check_interval
+
+        self.sequence = 0
+        self.versions = None
+        self.last_event = None
+        self.clients = 0
+
+        self._cond = threading.Condition()
+        self._check_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._watcher = None
+        self._watcher_pid = None
+
+    def current_versions(self):
+        return {name: str(version()) for name, version in self.sources.items()}
+
+    def notify(self):
+        """Revisar las versiones ya (por ejemplo, justo después de publicar datos nuevos)."""
+        if self.clients:
+            self._wake.set()
+
+    def check(self):
+        with self._check_lock:
+            versions = self.current_versions()
+            if self.versions is None:
+                self.versions = versions
+                return
+            changed = [name for name, version in versions.items() if self.versions.get(name) != version]
+            if not changed:
+                return
+            event = {"versions": versions, "changed": changed}
+            for name in changed:
+                if name in self.deltas:
+                    delta = self.deltas[name]()
+                    if delta:
+                        event.setdefault("delta", {})[name] = delta
+            with self._cond:
+                self.versions = versions
+                self.sequence += 1
+                self.last_event = event
+                self._cond.notify_all()
+
+    def _ensure_watcher(self):
+        # Tras un fork (gunicorn --preload) el hilo del proceso padre no existe en el hijo
+        if self._watcher is None or self._watcher_pid != os.getpid() or not self._watcher.is_alive():
+            self._watcher_pid = os.getpid()
+            self._watcher = threading.Thread(target=self._watch_loop, name="version-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch_loop(self):
+        while True:
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            if not self.clients:
+                continue
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Error revisando versiones para el canal de eventos: {str(e)}")
+
+    def acquire(self):
+        """Reserva un lugar para un cliente; ``False`` si ya se alcanzó el límite."""
+        with self._cond:
+            if self.clients >= self.max_clients:
+                return False
+            self.clients += 1
+        self._ensure_watcher()
+        return True
+
+    def release(self):
+        with self._cond:
+            self.clients -= 1
+
+    def stream(self, retry_ms=STREAM_RETRY_MS):
+        """Generador de mensajes SSE para un cliente aceptado con ``acquire()``.
+
+        El lugar se libera con ``release()`` al cerrar la respuesta, no aquí: si el
+        cliente se va antes de leer nada, el generador nunca llega a ejecutarse.
+        Si hubo varios cambios entre dos mensajes, el cliente recibe solo el último con
+        todas las versiones vigentes.
+        """
+        # Las versiones pueden estar atrasadas si no había clientes conectados
+        self.check()
+        with self._cond:
+            versions, sequence = self.versions, self.sequence
+        # Versión actual al conectar: el navegador decide si debe recargar algo
+        yield f"retry: {retry_ms}\n" + format_event("hello", {"versions": versions}, sequence)
+
+        deadline = time.monotonic() + self.max_duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._cond:
+                self._cond.wait_for(lambda: self.sequence != sequence,
+                                    timeout=min(self.heartbeat_interval, remaining))
+                new_sequence, event = self.sequence, self.last_event
+            if new_sequence != sequence:
+                sequence = new_sequence
+                yield format_event("update", event, sequence)
+            else:
+                yield ": ping\n\n"
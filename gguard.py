@@ -4,17 +4,27 @@
 import os
 import json
 import re
+import hashlib
 import requests
 import time
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from datetime import datetime
-from typing import TypedDict, Dict, List, Optional, Annotated
+from urllib.parse import urlparse
+from typing import TypedDict, Dict, List, Optional
 import logging
-from bs4 import BeautifulSoup
+import unicodedata
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_community.tools.tavily_search import TavilySearchResults
+from disk_cache import DiskCache
+from article_extraction import DEFAULT_PARSER, extract_article
+from metrics import REGISTRY, SIZE_BUCKETS, instrument
+from storage import write_json_atomic
 
 # Cargar variables de entorno
 load_dotenv()
@@ -23,17 +33,134 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Estado del subgrafo
+# Caché persistente de geocodificación (30 días para aciertos, 1 día para lugares no encontrados)
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL", 24 * 3600))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", 5000))
+
+geocode_cache = DiskCache(
+    "geocode",
+    ttl=GEOCODE_CACHE_TTL,
+    negative_ttl=GEOCODE_NEGATIVE_TTL,
+    max_entries=GEOCODE_CACHE_MAX_ENTRIES
+)
+
+# Descarga concurrente de artículos
+SCRAPER_MAX_WORKERS = int(os.getenv("SCRAPER_MAX_WORKERS", 5))
+SCRAPER_PER_DOMAIN_LIMIT = int(os.getenv("SCRAPER_PER_DOMAIN_LIMIT", 2))
+# Tiempo límite de cada fase concurrente del scraper (segundos); cada fase tiene el suyo
+# para que una descarga lenta no deje sin tiempo a la extracción ni a la geocodificación
+SCRAPER_FETCH_TIMEOUT = float(os.getenv("SCRAPER_FETCH_TIMEOUT", 60))
+SCRAPER_EXTRACTION_TIMEOUT = float(os.getenv("SCRAPER_EXTRACTION_TIMEOUT", 60))
+SCRAPER_GEOCODE_TIMEOUT = float(os.getenv("SCRAPER_GEOCODE_TIMEOUT", 30))
+SCRAPER_BATCH_EXTRACTION = os.getenv("SCRAPER_BATCH_EXTRACTION", "1") == "1"
+BATCH_ARTICLE_MAX_CHARS = 6000
+HTTP_POOL_CONNECTIONS = 20
+HTTP_POOL_MAXSIZE = 10
+ARTICLE_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+# Servicios externos (configurables para apuntar a sustitutos locales, p. ej. en benchmarks/)
+OPENCAGE_URL = os.getenv("OPENCAGE_URL", "https://api.opencagedata.com/geocode/v1/json")
+CONNECTIVITY_CHECK_URL = os.getenv("CONNECTIVITY_CHECK_URL", "https://www.google.com")
+
+# Salida para la interfaz web; la aplicación registra su copia en memoria con
+# set_security_data_publisher para publicarla sin volver a leer el archivo
+SECURITY_DATA_FILE = "security_data.json"
+_security_data_publisher = None
+
+_http_session = None
+_http_session_lock = threading.Lock()
+_domain_semaphores = {}
+_domain_semaphores_lock = threading.Lock()
+
+# Registro de clientes LLM compartidos entre agentes e hilos
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash-lite")
+_llm_clients = {}
+_llm_clients_lock = threading.Lock()
+
+# Caché de respuestas del LLM (opcional por llamada, para etapas deterministas)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+llm_cache = DiskCache("llm_responses", ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES)
+
+# Índice persistente de artículos: URL -> validadores HTTP, hash del contenido y datos extraídos
+ARTICLE_INDEX_TTL = int(os.getenv("ARTICLE_INDEX_TTL", 14 * 24 * 3600))
+article_index = DiskCache("article_index", ttl=ARTICLE_INDEX_TTL, max_entries=2000)
+
+# Agentes del subgrafo que solo dependen de incident_data y arrancan en paralelo
+SUBGRAPH_ENTRY_NODES = ["classifier", "geo_spatial"]
+
+# Análisis de todos los incidentes de la ejecución (opcional)
+ANALYZE_ALL_INCIDENTS = os.getenv("ANALYZE_ALL_INCIDENTS", "0") == "1"
+SUBGRAPH_MAX_WORKERS = int(os.getenv("SUBGRAPH_MAX_WORKERS", 4))
+SUBGRAPH_ALL_DEADLINE = float(os.getenv("SUBGRAPH_ALL_DEADLINE", 180))
+
+# Métricas del pipeline (expuestas por la aplicación web en /metrics)
+AGENT_DURATION = REGISTRY.histogram(
+    "seguridad_agent_duration_seconds", "Duración de cada ejecución de un agente", ["agent"])
+AGENT_RUNS = REGISTRY.counter(
+    "seguridad_agent_runs_total", "Ejecuciones de cada agente por resultado", ["agent", "outcome"])
+LLM_DURATION = REGISTRY.histogram(
+    "seguridad_llm_request_duration_seconds", "Duración de las llamadas al LLM (sin contar la caché)", ["agent"])
+LLM_REQUESTS = REGISTRY.counter(
+    "seguridad_llm_requests_total", "Llamadas al LLM por agente y resultado", ["agent", "outcome"])
+LLM_PROMPT_CHARS = REGISTRY.histogram(
+    "seguridad_llm_prompt_chars", "Tamaño de los prompts enviados al LLM", ["agent"], buckets=SIZE_BUCKETS)
+LLM_RESPONSE_CHARS = REGISTRY.histogram(
+    "seguridad_llm_response_chars", "Tamaño de las respuestas del LLM", ["agent"], buckets=SIZE_BUCKETS)
+LLM_TOKENS = REGISTRY.counter(
+    "seguridad_llm_tokens_total", "Tokens consumidos según el proveedor del LLM", ["agent", "direction"])
+LLM_CACHE_LOOKUPS = REGISTRY.counter(
+    "seguridad_llm_cache_lookups_total", "Consultas a la caché de respuestas del LLM", ["agent", "result"])
+GEOCODE_DURATION = REGISTRY.histogram(
+    "seguridad_geocode_request_duration_seconds", "Duración de las consultas a OpenCage")
+GEOCODE_REQUESTS = REGISTRY.counter(
+    "seguridad_geocode_requests_total", "Geocodificaciones por resultado", ["result"])
+ARTICLE_FETCH_DURATION = REGISTRY.histogram(
+    "seguridad_article_fetch_duration_seconds", "Duración de la descarga de cada artículo")
+ARTICLE_FETCHES = REGISTRY.counter(
+    "seguridad_article_fetches_total", "Descargas de artículos por código HTTP", ["status"])
+ARTICLE_BYTES = REGISTRY.histogram(
+    "seguridad_article_bytes", "Tamaño de los artículos descargados", buckets=(10000, 50000, 100000, 250000, 500000, 1000000, 2500000))
+ARTICLE_PARSE_DURATION = REGISTRY.histogram(
+    "seguridad_article_parse_duration_seconds", "Duración de la extracción de fecha y contenido de cada artículo", ["parser"])
+SEARCH_DURATION = REGISTRY.histogram(
+    "seguridad_search_duration_seconds", "Duración de la búsqueda de noticias en Tavily")
+
+
+def instrument_agent(agent):
+    """Registra la duración y el resultado de cada ejecución del agente."""
+    return instrument(AGENT_DURATION, AGENT_RUNS, agent=agent)
+
+
+def disk_cache_metrics():
+    # Aciertos y fallos de las cachés persistentes del pipeline
+    caches = [geocode_cache, llm_cache, article_index]
+    families = []
+    for name, key, documentation in [
+        ("seguridad_cache_hits_total", "hits", "Aciertos de las cachés persistentes"),
+        ("seguridad_cache_misses_total", "misses", "Fallos de las cachés persistentes"),
+        ("seguridad_cache_errors_total", "errors", "Errores de lectura o escritura de las cachés persistentes")
+    ]:
+        samples = [(name, {"cache": cache.namespace}, cache.stats()[key]) for cache in caches]
+        families.append((name, "counter", documentation, samples))
+    return families
+
+REGISTRY.add_collector(disk_cache_metrics)
+
+# Estado del subgrafo: cada agente devuelve solo las claves que produce
 class SubgraphState(TypedDict):
-    iteration: int
     urgency: Optional[str]
-    incident_type: Annotated[Optional[str], "merge"]
-    coordinates: Annotated[Optional[Dict[str, float]], "merge"]
+    incident_type: Optional[str]
+    coordinates: Optional[Dict[str, float]]
     analysis: Optional[Dict]
     confidence: Optional[float]
     predictions: Optional[Dict]
     recommendations: Optional[List[str]]
     incident_data: Optional[Dict]
+    deadline: Optional[float]
 
 # Estado del grafo principal
 class State(TypedDict):
@@ -51,56 +178,154 @@ class State(TypedDict):
     all_incidents: Optional[List[Dict]]
 
 # Inicializar el LLM
-def initialize_llm(temperature=0.7):
+def initialize_llm(temperature=0.7, model=LLM_MODEL):
     google_api_key = os.getenv("GOOGLE_API_KEY")
     if not google_api_key:
         raise ValueError("La clave de la API de Google no está definida")
     
     return ChatGoogleGenerativeAI(
         google_api_key=google_api_key,
-        model="gemini-2.0-flash-lite",
+        model=model,
         temperature=temperature
     )
 
+# Obtener un cliente LLM reutilizable (uno por modelo y temperatura en todo el proceso)
+def get_llm(temperature=0.7, model=LLM_MODEL):
+    key = (model, float(temperature))
+    llm = _llm_clients.get(key)
+    if llm is None:
+        with _llm_clients_lock:
+            llm = _llm_clients.get(key)
+            if llm is None:
+                llm = initialize_llm(temperature, model)
+                _llm_clients[key] = llm
+                logger.info(f"Cliente LLM creado para {model} con temperatura {temperature}")
+    return llm
+
+# Publicar security_data.json (con la copia en memoria de la aplicación, si la registró)
+def set_security_data_publisher(publish):
+    global _security_data_publisher
+    _security_data_publisher = publish
+
+def publish_security_data(data):
+    if _security_data_publisher is not None:
+        _security_data_publisher(data)
+    else:
+        write_json_atomic(SECURITY_DATA_FILE, data)
+
 # Limpiar respuesta del LLM
 def clean_llm_response(response_text):
     return re.sub(r'```json\s*|\s*```', '', response_text).strip()
 
-# Extraer contenido del artículo
-def extract_article_content(soup):
-    # Extraer párrafos
-    paragraphs = soup.find_all('p')
-    if paragraphs:
-        valid_paragraphs = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 20]
-        if valid_paragraphs:
-            return " ".join(valid_paragraphs)
-    
-    # Extraer del artículo
-    article = soup.find('article')
-    if article:
-        for tag in article.find_all(['script', 'style', 'nav', 'footer', 'header']):
-            tag.decompose()
-        return article.get_text(separator=' ', strip=True)
-    
-    # Extraer del div principal
-    main_content = soup.find('div', class_=lambda x: x and ('content' in x.lower() or 'article' in x.lower()))
-    if main_content:
-        for tag in main_content.find_all(['script', 'style', 'nav', 'footer', 'header']):
-            tag.decompose()
-        return main_content.get_text(separator=' ', strip=True)
-    
-    return ""
-
 # Consultar el LLM
-def query_llm(prompt, temperature=0.7):
-    llm = initialize_llm(temperature)
-    response = llm.invoke([HumanMessage(content=prompt)])
+def query_llm(prompt, temperature=0.7, cache=False, agent="general", validate=None, lookup=True):
+    """Consulta el LLM y devuelve el JSON de la respuesta.
+
+    Con ``cache=True`` la respuesta se busca primero en la caché en disco (salvo con
+    ``lookup=False``, cuando quien llama ya la buscó) y se guarda para las siguientes
+    ejecuciones solo si ``validate`` la acepta (por defecto, un objeto JSON); así una
+    respuesta con un formato inesperado no se repite hasta que caduque.
+    """
+    validate = validate or is_json_object
+    if cache and lookup:
+        found, cached = cached_llm_response(prompt, temperature, agent, validate)
+        if found:
+            return cached
+    
+    response = invoke_llm(prompt, temperature, agent)
     cleaned_response = clean_llm_response(response.content)
     
     try:
-        return json.loads(cleaned_response)
+        parsed = json.loads(cleaned_response)
     except json.JSONDecodeError:
+        LLM_REQUESTS.inc(agent=agent, outcome="parse_error")
         return {"error": "No se pudo parsear la respuesta", "text": cleaned_response}
+    
+    LLM_REQUESTS.inc(agent=agent, outcome="ok")
+    if cache and validate(parsed):
+        store_llm_response(prompt, temperature, parsed)
+    return parsed
+
+def is_json_object(value):
+    return isinstance(value, dict)
+
+# Llamar al LLM registrando duración, tamaños y tokens por agente
+def invoke_llm(prompt, temperature, agent="general"):
+    LLM_PROMPT_CHARS.observe(len(prompt), agent=agent)
+    try:
+        with LLM_DURATION.time(agent=agent):
+            response = get_llm(temperature).invoke([HumanMessage(content=prompt)])
+    except Exception:
+        LLM_REQUESTS.inc(agent=agent, outcome="error")
+        raise
+    LLM_RESPONSE_CHARS.observe(len(response.content), agent=agent)
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        LLM_TOKENS.inc(usage["input_tokens"], agent=agent, direction="input")
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc(usage["output_tokens"], agent=agent, direction="output")
+    return response
+
+# Clave de caché de una consulta al LLM
+def llm_cache_key(prompt, temperature, model=LLM_MODEL):
+    return hashlib.sha256(f"{model}\n{float(temperature)}\n{prompt}".encode("utf-8")).hexdigest()
+
+# Buscar una respuesta del LLM en caché y registrar el acierto o fallo por agente en
+# seguridad_llm_cache_lookups_total (una respuesta guardada que ``validate`` rechaza cuenta como fallo)
+def cached_llm_response(prompt, temperature, agent="general", validate=None):
+    if not LLM_CACHE_ENABLED:
+        return False, None
+    
+    found, value = llm_cache.lookup(llm_cache_key(prompt, temperature))
+    found = found and (validate or is_json_object)(value)
+    LLM_CACHE_LOOKUPS.inc(agent=agent, result="hit" if found else "miss")
+    if found:
+        logger.info(f"Respuesta LLM en caché para {agent}")
+    return found, value
+
+# Guardar una respuesta ya parseada del LLM
+def store_llm_response(prompt, temperature, value):
+    if LLM_CACHE_ENABLED:
+        llm_cache.set(llm_cache_key(prompt, temperature), value)
+
+# Sesión HTTP compartida: reutiliza conexiones por host entre artículos y geocodificaciones
+def get_http_session():
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(ARTICLE_HEADERS)
+            _http_session = session
+        return _http_session
+
+# Semáforo por dominio para no saturar un mismo sitio de noticias
+def domain_semaphore(url):
+    domain = urlparse(url).netloc.lower()
+    with _domain_semaphores_lock:
+        if domain not in _domain_semaphores:
+            _domain_semaphores[domain] = threading.BoundedSemaphore(SCRAPER_PER_DOMAIN_LIMIT)
+        return _domain_semaphores[domain]
+
+# Descargar un artículo respetando el límite de concurrencia de su dominio
+def fetch_article(url, headers=None):
+    with domain_semaphore(url):
+        try:
+            with ARTICLE_FETCH_DURATION.time():
+                response = get_http_session().get(url, headers=headers, timeout=15)
+        except Exception:
+            ARTICLE_FETCHES.inc(status="error")
+            raise
+    ARTICLE_FETCHES.inc(status=str(response.status_code))
+    ARTICLE_BYTES.observe(len(response.content))
+    return response
+
+# Normalizar la consulta de geocodificación para usarla como clave de caché
+def normalize_geocode_query(query):
+    query = unicodedata.normalize("NFC", query)
+    return " ".join(query.lower().split())
 
 # Geocodificar un lugar usando OpenCage
 def geocode_location(place):
@@ -118,28 +343,69 @@ def geocode_location(place):
     else:
         query = f"{place}, México"
     
+    # Consultar primero la caché persistente
+    cache_key = normalize_geocode_query(query)
+    found, cached = geocode_cache.lookup(cache_key)
+    if found:
+        if cached is None:
+            logger.info(f"Geocodificación en caché (sin resultados) para '{place}'")
+            GEOCODE_REQUESTS.inc(result="cached_not_found")
+            return None, None
+        logger.info(f"Geocodificación en caché para '{place}'")
+        GEOCODE_REQUESTS.inc(result="cached")
+        return cached["lat"], cached["lng"]
+    
     try:
         api_key = os.getenv("OPENCAGE_API_KEY", "0cd277781a214ffc99f6fac5f756f680")
         encoded_query = requests.utils.quote(query)
-        url = f"https://api.opencagedata.com/geocode/v1/json?q={encoded_query}&key={api_key}&language=es&limit=1"
+        url = f"{OPENCAGE_URL}?q={encoded_query}&key={api_key}&language=es&limit=1"
         
-        response = requests.get(url, timeout=10)
+        with GEOCODE_DURATION.time():
+            response = get_http_session().get(url, timeout=10)
         data = response.json()
         
         if response.status_code == 200 and data.get("results") and len(data["results"]) > 0:
             result = data["results"][0]
             logger.info(f"Geocodificación exitosa para '{place}'")
-            return result["geometry"]["lat"], result["geometry"]["lng"]
+            lat, lng = result["geometry"]["lat"], result["geometry"]["lng"]
+            geocode_cache.set(cache_key, {"lat": lat, "lng": lng})
+            GEOCODE_REQUESTS.inc(result="found")
+            return lat, lng
         
         logger.warning(f"No se encontraron resultados de geocodificación para '{place}'")
+        GEOCODE_REQUESTS.inc(result="not_found" if response.status_code == 200 else "http_error")
+        # Solo se recuerda el fallo si el servicio respondió correctamente
+        if response.status_code == 200:
+            geocode_cache.set_negative(cache_key)
         return None, None
     
     except Exception as e:
         logger.error(f"Error geocodificando '{place}': {e}")
+        GEOCODE_REQUESTS.inc(result="error")
         return None, None
 
+# Obtener las coordenadas de un incidente, geocodificando solo si no se hizo antes en esta ejecución
+def geocode_incident(incident):
+    """Devuelve ``{"lat", "lng"}`` o ``None`` y lo deja guardado en ``incident["coordenadas"]``."""
+    if "coordenadas" in incident:
+        return incident["coordenadas"]
+    
+    lugar = incident.get("lugar")
+    coords = None
+    if lugar:
+        lat, lng = geocode_location(lugar)
+        if lat and lng:
+            logger.info(f"Geocodificación exitosa para {lugar}: {lat}, {lng}")
+            coords = {"lat": lat, "lng": lng}
+        else:
+            logger.warning(f"No se pudo geocodificar {lugar}")
+    
+    incident["coordenadas"] = coords
+    return coords
+
 # --- Agentes del grafo principal ---
 
+@instrument_agent("supervisor")
 def supervisor_agent(state: State) -> State:
     """Monitorea la salud del sistema y supervisa agentes clave."""
     logger.info("Supervisor Agent: Iniciando supervisión del sistema...")
@@ -151,7 +417,7 @@ def supervisor_agent(state: State) -> State:
     
     # Verificar conectividad
     try:
-        requests.get("https://www.google.com", timeout=5)
+        requests.get(CONNECTIVITY_CHECK_URL, timeout=5)
     except:
         logger.error("No hay conexión a internet")
         raise ConnectionError("No se puede conectar a internet")
@@ -161,6 +427,245 @@ def supervisor_agent(state: State) -> State:
     
     return state
 
+# Ejecutar una función sobre varios elementos en paralelo con un tiempo límite para todos
+def run_concurrently(func, items, timeout, max_workers, log_prefix, label="tarea"):
+    """Devuelve los resultados en el orden de ``items``; ``None`` para los que fallan o no terminan en ``timeout`` segundos."""
+    if not items:
+        return []
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=label)
+    futures = {executor.submit(func, item): position for position, item in enumerate(items)}
+    done, pending = wait(futures, timeout=timeout)
+    executor.shutdown(wait=False, cancel_futures=True)
+    
+    if pending:
+        logger.warning(f"{log_prefix}: {len(pending)} {label}(s) descartadas por exceder {timeout}s")
+    
+    results = [None] * len(items)
+    for future in done:
+        try:
+            results[futures[future]] = future.result()
+        except Exception as e:
+            logger.error(f"{log_prefix}: Error en {label}: {str(e)}")
+    return results
+
+# Descargar un resultado de Tavily y extraer su fecha y contenido
+def fetch_article_content(indexed_result):
+    """Devuelve un diccionario con el artículo descargado o ``None`` si falló."""
+    idx, result = indexed_result
+    try:
+        title = result.get("title", "Noticia sin título")
+        url = result.get("url", "")
+        snippet = result.get("content", "")
+        
+        logger.info(f"Procesando artículo: {title}")
+        
+        # Petición condicional con los validadores guardados de ciclos anteriores
+        found, indexed = article_index.lookup(url)
+        indexed = indexed if found and indexed else None
+        conditional_headers = {}
+        if indexed and indexed.get("etag"):
+            conditional_headers["If-None-Match"] = indexed["etag"]
+        if indexed and indexed.get("last_modified"):
+            conditional_headers["If-Modified-Since"] = indexed["last_modified"]
+        
+        # Hacer solicitud al artículo para obtener contenido completo
+        article_response = fetch_article(url, conditional_headers)
+        
+        # Si el artículo no cambió, reutilizar lo extraído sin parsear ni consultar al LLM
+        # (un 304 puede traer validadores nuevos; si no, se conservan los guardados)
+        if indexed and article_response.status_code == 304:
+            logger.info(f"Artículo sin cambios (304): {title}")
+            return reuse_indexed_article(idx, title, url, indexed, {
+                "etag": article_response.headers.get("ETag") or indexed.get("etag"),
+                "last_modified": article_response.headers.get("Last-Modified") or indexed.get("last_modified"),
+                "content_hash": indexed.get("content_hash")
+            })
+        
+        content_hash = hashlib.sha256(article_response.content).hexdigest()
+        if indexed and indexed.get("content_hash") == content_hash:
+            logger.info(f"Artículo sin cambios (mismo contenido): {title}")
+            return reuse_indexed_article(idx, title, url, indexed, {
+                "etag": article_response.headers.get("ETag"),
+                "last_modified": article_response.headers.get("Last-Modified"),
+                "content_hash": content_hash
+            })
+        
+        # Extraer fecha de publicación y contenido completo en una sola pasada
+        with ARTICLE_PARSE_DURATION.time(parser=DEFAULT_PARSER):
+            article_text = extract_article(article_response.content)
+        date_text = article_text.date_text if article_text.date_text is not None else "Fecha no encontrada"
+        content = article_text.content
+        
+        # Si el contenido es muy corto, usar el snippet de Tavily
+        if len(content) < 100:
+            content = snippet
+        
+        return {
+            "id": idx,
+            "title": title,
+            "url": url,
+            "date_text": date_text,
+            "content": content,
+            "validators": {
+                "etag": article_response.headers.get("ETag"),
+                "last_modified": article_response.headers.get("Last-Modified"),
+                "content_hash": content_hash
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Scraper Agent: Error al procesar artículo: {str(e)}")
+        return None
+
+# Reconstruir un artículo a partir de su entrada en el índice de URLs; con sus validadores
+# actuales, el scraper vuelve a guardar la entrada y renueva su vigencia mientras se siga publicando
+def reuse_indexed_article(idx, title, url, indexed, validators):
+    return {
+        "id": idx,
+        "title": title,
+        "url": url,
+        "date_text": indexed.get("date_text", "Fecha no encontrada"),
+        "content": indexed.get("content", ""),
+        "details": indexed.get("details"),
+        "validators": validators
+    }
+
+# Guardar en el índice de URLs el artículo descargado y sus datos extraídos
+def index_article(article, details):
+    validators = article.get("validators")
+    if not validators or not article.get("url"):
+        return
+    article_index.set(article["url"], {
+        "etag": validators.get("etag"),
+        "last_modified": validators.get("last_modified"),
+        "content_hash": validators.get("content_hash"),
+        "date_text": article["date_text"],
+        "content": article["content"],
+        "details": details
+    })
+
+# Campos que el LLM debe extraer de cada noticia
+EXTRACTION_FIELDS = """
+        1. lugar_exacto: Ubicación específica donde ocurrió el incidente (nombre exacto de colonia, calle o punto de referencia)
+        2. fecha_incidente: Fecha del incidente (formato DD/MM/YYYY si se menciona)
+        3. hora_incidente: Hora aproximada (formato HH:MM si se menciona)
+        4. tipo_incidente: Categoría precisa (homicidio, robo, secuestro, asalto, accidente vial, etc.)
+        5. gravedad: Nivel de gravedad (baja, media, alta, crítica)
+        6. resumen_conciso: Párrafo breve que resume el incidente principal
+        7. impacto_vial: Si el incidente afecta alguna vialidad, nombra la vialidad específica o indica "ninguna"
+"""
+
+# Prompt de extracción de un solo artículo (también es la clave de caché por artículo)
+def build_extraction_prompt(article):
+    return f"""
+        Analiza esta noticia policiaca de Querétaro, México y extrae información precisa sobre el incidente principal.
+        
+        TÍTULO: {article["title"]}
+        FECHA DE PUBLICACIÓN: {article["date_text"]}
+        URL: {article["url"]}
+        
+        CONTENIDO:
+        {article["content"]}
+        
+        Extrae EXCLUSIVAMENTE un único incidente principal con los siguientes datos exactos:{EXTRACTION_FIELDS}
+        Responde ÚNICAMENTE en formato JSON con estos campos exactos. Extrae solo datos mencionados explícitamente.
+        Si algún dato no está disponible, asigna null (no inventes datos ni uses "No especificado").
+        """
+
+# Extraer los datos estructurados de un solo artículo (el scraper ya buscó su prompt en caché)
+def extract_article_details(article):
+    # Consultar al LLM con temperatura baja para mayor precisión
+    details = query_llm(build_extraction_prompt(article), temperature=0.1, cache=True, agent="scraper", lookup=False)
+    
+    # Validar respuesta
+    if not isinstance(details, dict):
+        logger.warning(f"Respuesta LLM no válida para {article['title']}: {details}")
+        return None
+    return details
+
+# Extraer los datos de varios artículos con una sola llamada al LLM
+def extract_articles_batch(articles):
+    """Devuelve ``{id: detalles}`` solo para los artículos que el LLM respondió correctamente."""
+    articles_text = ""
+    for article in articles:
+        articles_text += f"""
+        --- ARTÍCULO id={article["id"]} ---
+        TÍTULO: {article["title"]}
+        FECHA DE PUBLICACIÓN: {article["date_text"]}
+        URL: {article["url"]}
+        CONTENIDO:
+        {article["content"][:BATCH_ARTICLE_MAX_CHARS]}
+        """
+    
+    batch_prompt = f"""
+        Analiza estas {len(articles)} noticias policiacas de Querétaro, México. De cada una extrae
+        información precisa sobre su incidente principal.
+        {articles_text}
+        
+        Para CADA artículo extrae EXCLUSIVAMENTE un único incidente principal con los siguientes datos exactos:{EXTRACTION_FIELDS}
+        Responde ÚNICAMENTE con una lista JSON con un objeto por artículo. Cada objeto debe incluir el campo
+        "id" del artículo y los campos anteriores. Extrae solo datos mencionados explícitamente.
+        Si algún dato no está disponible, asigna null (no inventes datos ni uses "No especificado").
+        """
+    
+    result = query_llm(batch_prompt, temperature=0.1, cache=True, agent="scraper_batch", validate=is_batch_response)
+    if isinstance(result, dict):
+        # Aceptar respuestas envueltas en un objeto con una única lista
+        result = next((value for value in result.values() if isinstance(value, list)), [])
+    
+    expected_ids = {article["id"] for article in articles}
+    extracted = {}
+    for record in result if isinstance(result, list) else []:
+        if not isinstance(record, dict):
+            continue
+        try:
+            record_id = int(record.get("id"))
+        except (TypeError, ValueError):
+            continue
+        if record_id in expected_ids:
+            extracted[record_id] = record
+    
+    # Guardar cada registro bajo la clave del prompt individual para reutilizarlo en otros lotes
+    for article in articles:
+        if article["id"] in extracted:
+            record = {k: v for k, v in extracted[article["id"]].items() if k != "id"}
+            store_llm_response(build_extraction_prompt(article), 0.1, record)
+    
+    logger.info(f"Scraper Agent: Extracción por lotes completó {len(extracted)}/{len(articles)} artículos")
+    return extracted
+
+# Respuesta del lote: una lista de objetos, o un objeto que envuelve esa lista
+def is_batch_response(value):
+    if isinstance(value, dict):
+        value = next((item for item in value.values() if isinstance(item, list)), None)
+    return isinstance(value, list) and all(isinstance(record, dict) for record in value)
+
+# Construir el objeto de noticia a partir del artículo y sus datos extraídos
+def build_news_item(article, details):
+    # Crear objeto de noticia con estructura simplificada
+    news_item = {
+        "id": article["id"],
+        "noticia": article["title"],
+        "url": article["url"],
+        "fecha_publicacion": article["date_text"],
+        "lugar": details.get("lugar_exacto"),
+        "fecha_incidente": details.get("fecha_incidente"),
+        "hora_incidente": details.get("hora_incidente"),
+        "tipo_incidente": details.get("tipo_incidente"),
+        "gravedad": details.get("gravedad"),
+        "resumen": details.get("resumen_conciso"),
+        "impacto_vial": details.get("impacto_vial"),
+        "contenido_completo": article["content"]
+    }
+    
+    # Geocodificar una sola vez por ejecución; el resultado viaja con el incidente
+    news_item["coordenadas"] = geocode_incident(news_item)
+    
+    logger.info(f"Scraper Agent: Extraída noticia #{news_item['id']} - '{news_item['noticia']}' - Lugar: {news_item['lugar']}")
+    return news_item
+
+@instrument_agent("scraper")
 def scraper_agent(state: State) -> State:
     """Monitorea noticias de seguridad usando Tavily Search API."""
     logger.info("Scraper Agent: Recolectando datos de noticias con Tavily...")
@@ -180,103 +685,53 @@ def scraper_agent(state: State) -> State:
         # Realizar búsqueda específica para noticias recientes de policía en Querétaro
         search_query = "noticias recientes policía Querétaro últimas 24 horas seguridad"
         
-        search_results = tavily_search.invoke({
-            "query": search_query,
-            "max_results": 5
-        })
+        with SEARCH_DURATION.time():
+            search_results = tavily_search.invoke({
+                "query": search_query,
+                "max_results": 5
+            })
+        
+        # Descargar los artículos en paralelo; el tiempo queda acotado por el más lento
+        fetched = run_concurrently(fetch_article_content, list(enumerate(search_results)), SCRAPER_FETCH_TIMEOUT,
+                                   SCRAPER_MAX_WORKERS, "Scraper Agent", "descarga")
+        articles = [article for article in fetched if article]
         
-        # Preparar lista para almacenar noticias procesadas
-        news_data = []
+        # Reutilizar extracciones de artículos sin cambios y de artículos ya vistos en ciclos anteriores
+        details_by_id = {}
+        for article in articles:
+            if isinstance(article.get("details"), dict):
+                details_by_id[article["id"]] = article["details"]
+                continue
+            found, details = cached_llm_response(build_extraction_prompt(article), 0.1, agent="scraper")
+            if found:
+                details_by_id[article["id"]] = details
         
-        # Procesar cada resultado de la búsqueda
-        for idx, result in enumerate(search_results):
+        # Extraer el resto en una sola llamada y reintentar individualmente los que fallen
+        uncached = [article for article in articles if article["id"] not in details_by_id]
+        if SCRAPER_BATCH_EXTRACTION and len(uncached) > 1:
             try:
-                title = result.get("title", "Noticia sin título")
-                url = result.get("url", "")
-                snippet = result.get("content", "")
-                                
-                
-                logger.info(f"Procesando artículo: {title}")
-                
-                # Hacer solicitud al artículo para obtener contenido completo
-                headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-                article_response = requests.get(url, headers=headers, timeout=15)
-                article_soup = BeautifulSoup(article_response.content, 'html.parser')
-                
-                # Extraer fecha de publicación
-                date_elem = article_soup.find('span', class_=lambda x: x and 'Typography' in x)
-                date_text = date_elem.get_text(strip=True) if date_elem else "Fecha no encontrada"
-                
-                # Extraer contenido completo
-                content = extract_article_content(article_soup)
-                
-                # Si el contenido es muy corto, usar el snippet de Tavily
-                if len(content) < 100:
-                    content = snippet
-                    
-                # Extraer datos estructurados utilizando LLM con contexto enriquecido
-                structured_data_prompt = f"""
-                Analiza esta noticia policiaca de Querétaro, México y extrae información precisa sobre el incidente principal.
-                
-                TÍTULO: {title}
-                FECHA DE PUBLICACIÓN: {date_text}
-                URL: {url}
-                
-                CONTENIDO:
-                {content}
-                
-                Extrae EXCLUSIVAMENTE un único incidente principal con los siguientes datos exactos:
-                1. lugar_exacto: Ubicación específica donde ocurrió el incidente (nombre exacto de colonia, calle o punto de referencia)
-                2. fecha_incidente: Fecha del incidente (formato DD/MM/YYYY si se menciona)
-                3. hora_incidente: Hora aproximada (formato HH:MM si se menciona)
-                4. tipo_incidente: Categoría precisa (homicidio, robo, secuestro, asalto, accidente vial, etc.)
-                5. gravedad: Nivel de gravedad (baja, media, alta, crítica)
-                6. resumen_conciso: Párrafo breve que resume el incidente principal
-                7. impacto_vial: Si el incidente afecta alguna vialidad, nombra la vialidad específica o indica "ninguna"
-                
-                Responde ÚNICAMENTE en formato JSON con estos campos exactos. Extrae solo datos mencionados explícitamente.
-                Si algún dato no está disponible, asigna null (no inventes datos ni uses "No especificado").
-                """
-                
-                # Consultar al LLM con temperatura baja para mayor precisión
-                details = query_llm(structured_data_prompt, temperature=0.1)
-                
-                # Validar respuesta
-                if not isinstance(details, dict):
-                    logger.warning(f"Respuesta LLM no válida para {title}: {details}")
-                    continue
-                
-                # Crear objeto de noticia con estructura simplificada
-                news_item = {
-                    "id": idx,
-                    "noticia": title,
-                    "url": url,
-                    "fecha_publicacion": date_text,
-                    "lugar": details.get("lugar_exacto"),
-                    "fecha_incidente": details.get("fecha_incidente"),
-                    "hora_incidente": details.get("hora_incidente"),
-                    "tipo_incidente": details.get("tipo_incidente"),
-                    "gravedad": details.get("gravedad"),
-                    "resumen": details.get("resumen_conciso"),
-                    "impacto_vial": details.get("impacto_vial"),
-                    "contenido_completo": content
-                }
-                
-                # Geocodificar inmediatamente para verificar validez del lugar
-                lugar = details.get("lugar_exacto", "")
-                if lugar:
-                    lat, lng = geocode_location(lugar)
-                    if lat and lng:
-                        logger.info(f"Geocodificación exitosa para {lugar}: {lat}, {lng}")
-                    else:
-                        logger.warning(f"No se pudo geocodificar {lugar}")
-                
-                news_data.append(news_item)
-                logger.info(f"Scraper Agent: Extraída noticia #{idx} - '{title}' - Lugar: {news_item['lugar']}")
-                
+                details_by_id.update(extract_articles_batch(uncached))
             except Exception as e:
-                logger.error(f"Scraper Agent: Error al procesar artículo: {str(e)}")
-                continue
+                logger.error(f"Scraper Agent: Error en extracción por lotes: {str(e)}")
+        
+        missing = [article for article in articles if article["id"] not in details_by_id]
+        if missing:
+            extracted_details = run_concurrently(extract_article_details, missing, SCRAPER_EXTRACTION_TIMEOUT,
+                                                 SCRAPER_MAX_WORKERS, "Scraper Agent", "extracción")
+            for article, details in zip(missing, extracted_details):
+                if details:
+                    details_by_id[article["id"]] = details
+        
+        # Actualizar el índice de URLs; los artículos reutilizados renuevan así su vigencia
+        for article in articles:
+            if article["id"] in details_by_id:
+                index_article(article, details_by_id[article["id"]])
+        
+        # Construir y geocodificar las noticias en paralelo, en el orden original de la búsqueda
+        extracted = [(article, details_by_id[article["id"]]) for article in articles if article["id"] in details_by_id]
+        built = run_concurrently(lambda pair: build_news_item(*pair), extracted, SCRAPER_GEOCODE_TIMEOUT,
+                                 SCRAPER_MAX_WORKERS, "Scraper Agent", "geocodificación")
+        news_data = [news_item for news_item in built if news_item]
         
         # Guardar los datos
         state["raw_data"] = news_data
@@ -287,6 +742,7 @@ def scraper_agent(state: State) -> State:
     
     return state
 
+@instrument_agent("router")
 def router_agent(state: State) -> State:
     """Enruta eventos según su urgencia y decide el siguiente paso."""
     logger.info("Router Agent: Evaluando datos para determinar urgencia...")
@@ -341,7 +797,7 @@ def router_agent(state: State) -> State:
     """
     
     # Consultar al LLM
-    result = query_llm(routing_prompt, temperature=0.2)
+    result = query_llm(routing_prompt, temperature=0.2, agent="router")
     
     # Extraer el ID seleccionado
     selected_id = result.get("selected_id", 0)
@@ -367,14 +823,14 @@ def router_agent(state: State) -> State:
         state["incident_data"] = {}
         state["urgency"] = "irrelevant"
     
-    # Procesar geocodificación para cada incidente individualmente
+    # Reutilizar la geocodificación hecha por el scraper para cada incidente
     processed_incidents = []
     for incident in state["raw_data"]:
         # Obtener lugar como cadena simple (no lista)
         lugar = incident.get("lugar", "No especificado")
         
-        # Geocodificar el lugar
-        lat, lng = geocode_location(lugar)
+        coords = geocode_incident(incident)
+        lat, lng = (coords["lat"], coords["lng"]) if coords else (None, None)
         
         # Crear versión procesada del incidente
         processed = {
@@ -387,11 +843,11 @@ def router_agent(state: State) -> State:
             "gravedad": incident.get("gravedad", ""),
             "resumen": incident.get("resumen", ""),
             "impacto_vial": incident.get("impacto_vial", ""),
-            "coordenadas": {"lat": lat, "lng": lng} if lat and lng else None
+            "coordenadas": coords
         }
         
         processed_incidents.append(processed)
-        logger.info(f"Router Agent: Geocodificado lugar '{lugar}' -> {lat}, {lng}")
+        logger.info(f"Router Agent: Coordenadas de '{lugar}' -> {lat}, {lng}")
     
     # Guardar todos los incidentes procesados
     state["all_incidents"] = processed_incidents
@@ -402,6 +858,7 @@ def router_agent(state: State) -> State:
     
     return state
 
+@instrument_agent("reporter")
 def reporter_agent(state: State) -> State:
     """Genera reportes para diferentes audiencias."""
     logger.info("Reporter Agent: Creando reportes para diferentes audiencias...")
@@ -446,7 +903,7 @@ def reporter_agent(state: State) -> State:
     Responde en JSON con estos tres campos exactos.
     """
     
-    reports = query_llm(reporting_prompt, temperature=0.4)
+    reports = query_llm(reporting_prompt, temperature=0.4, agent="reporter")
     
     # Verificar y guardar los reportes
     if isinstance(reports, dict) and "authorities" in reports and "citizens" in reports and "media" in reports:
@@ -471,9 +928,9 @@ def reporter_agent(state: State) -> State:
             "reports": state.get("reports", {})
         }
         
-        with open("security_data.json", "w", encoding="utf-8") as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
-        logger.info("Reporter Agent: Datos guardados en security_data.json")
+        # Escritura atómica: la API nunca ve un archivo a medio escribir
+        publish_security_data(output_data)
+        logger.info(f"Reporter Agent: Datos guardados en {SECURITY_DATA_FILE}")
     except Exception as e:
         logger.error(f"Reporter Agent: Error guardando datos: {str(e)}")
     
@@ -481,6 +938,7 @@ def reporter_agent(state: State) -> State:
 
 # --- Agentes del subgrafo ---
 
+@instrument_agent("classifier")
 def classifier_agent(state: SubgraphState) -> SubgraphState:
     """Clasifica el tipo de incidente."""
     logger.info(f"Classifier Agent: Clasificando incidente con urgencia {state['urgency']}")
@@ -488,8 +946,7 @@ def classifier_agent(state: SubgraphState) -> SubgraphState:
     incident_data = state.get("incident_data", {})
     if not incident_data:
         logger.warning("Classifier Agent: No hay datos de incidente para clasificar")
-        state["incident_type"] = "desconocido"
-        return state
+        return {"incident_type": "desconocido"}
     
     # Extraer contenido para clasificación
     content = incident_data.get("contenido_completo", "")
@@ -523,27 +980,34 @@ def classifier_agent(state: SubgraphState) -> SubgraphState:
     Responde en JSON con un solo campo "incident_type" con la categoría exacta.
     """
     
-    result = query_llm(classification_prompt, temperature=0.1)
+    result = query_llm(classification_prompt, temperature=0.1, cache=True, agent="classifier",
+                       validate=lambda value: isinstance(value, dict) and isinstance(value.get("incident_type"), str))
     
     # Extraer y guardar el tipo de incidente
-    incident_type = result.get("incident_type", initial_type)
-    state["incident_type"] = incident_type.lower() if incident_type else "otro"
+    incident_type = result.get("incident_type", initial_type) if isinstance(result, dict) else initial_type
+    incident_type = incident_type.lower() if incident_type else "otro"
     
-    return state
+    return {"incident_type": incident_type}
 
+@instrument_agent("geo_spatial")
 def geo_spatial_agent(state: SubgraphState) -> SubgraphState:
     """Determina coordenadas del incidente."""
-    logger.info(f"GeoSpatial Agent: Geolocalizando {state.get('incident_type', 'incidente no clasificado')}")
+    logger.info("GeoSpatial Agent: Geolocalizando incidente")
     
     incident_data = state.get("incident_data", {})
     if not incident_data:
         logger.warning("GeoSpatial Agent: No hay datos de incidente para geolocalizar")
-        state["coordinates"] = {"lat": None, "lng": None}
-        return state
+        return {"coordinates": {"lat": None, "lng": None}}
     
     # Extraer el lugar mencionado
     lugar = incident_data.get("lugar", "No especificado")
     
+    # Reutilizar la geocodificación que el scraper hizo en esta ejecución
+    coords = incident_data.get("coordenadas")
+    if coords and coords.get("lat") and coords.get("lng"):
+        logger.info(f"GeoSpatial Agent: Reutilizando coordenadas del scraper para '{lugar}'")
+        return {"coordinates": {"lat": coords["lat"], "lng": coords["lng"]}}
+    
     # Si el lugar no es específico, intentar extraerlo del contenido
     if lugar == "No especificado" or not lugar:
         content = incident_data.get("contenido_completo", "")
@@ -557,7 +1021,7 @@ def geo_spatial_agent(state: SubgraphState) -> SubgraphState:
         Responde SOLO con el nombre del lugar, sin explicaciones.
         """
         
-        location_result = initialize_llm(temperature=0.1).invoke([HumanMessage(content=location_prompt)])
+        location_result = invoke_llm(location_prompt, temperature=0.1, agent="geo_spatial")
         lugar = location_result.content.strip()
     
     # Geocodificar el lugar usando OpenCage
@@ -570,10 +1034,9 @@ def geo_spatial_agent(state: SubgraphState) -> SubgraphState:
             lat, lng = geocode_location(vial_info)
     
     # Guardar las coordenadas
-    state["coordinates"] = {"lat": lat, "lng": lng}
-    
-    return state
+    return {"coordinates": {"lat": lat, "lng": lng}}
 
+@instrument_agent("analytics")
 def analytics_agent(state: SubgraphState) -> SubgraphState:
     """Realiza análisis profundo del incidente."""
     logger.info(f"Analytics Agent: Analizando {state['incident_type']} en {state['coordinates']}")
@@ -584,8 +1047,7 @@ def analytics_agent(state: SubgraphState) -> SubgraphState:
     
     if not incident_data or not coordinates.get("lat"):
         logger.warning("Analytics Agent: Datos insuficientes para análisis")
-        state["analysis"] = {"pattern": "No hay datos suficientes para análisis", "impact": "desconocido"}
-        return state
+        return {"analysis": {"pattern": "No hay datos suficientes para análisis", "impact": "desconocido"}}
     
     # Crear prompt para análisis con enfoque en vialidades
     analytics_prompt = f"""
@@ -609,13 +1071,12 @@ def analytics_agent(state: SubgraphState) -> SubgraphState:
     Responde en JSON con estos campos exactos.
     """
     
-    analysis = query_llm(analytics_prompt, temperature=0.4)
+    analysis = query_llm(analytics_prompt, temperature=0.4, agent="analytics")
     
     # Guardar el análisis
-    state["analysis"] = analysis
-    
-    return state
+    return {"analysis": analysis}
 
+@instrument_agent("evaluator")
 def evaluator_agent(state: SubgraphState) -> SubgraphState:
     """Evalúa la calidad del análisis."""
     logger.info(f"Evaluator Agent: Evaluando análisis")
@@ -625,8 +1086,7 @@ def evaluator_agent(state: SubgraphState) -> SubgraphState:
     
     if not incident_data or not analysis:
         logger.warning("Evaluator Agent: Datos insuficientes para evaluación")
-        state["confidence"] = 0.3
-        return state
+        return {"confidence": 0.3}
     
     # Preparar versión limpia del incidente para el prompt
     incident_clean = {k: v for k, v in incident_data.items() if k != 'contenido_completo'}
@@ -657,7 +1117,7 @@ def evaluator_agent(state: SubgraphState) -> SubgraphState:
     Responde en JSON con campo "confidence" (valor numérico) y "justification" (razones).
     """
     
-    result = query_llm(evaluation_prompt, temperature=0.3)
+    result = query_llm(evaluation_prompt, temperature=0.3, agent="evaluator")
     
     # Extraer y guardar la confianza
     confidence = result.get("confidence", 0.5)
@@ -668,10 +1128,11 @@ def evaluator_agent(state: SubgraphState) -> SubgraphState:
         except:
             confidence = 0.5
     
-    state["confidence"] = round(confidence, 2)
+    confidence = round(confidence, 2)
     
-    return state
+    return {"confidence": confidence}
 
+@instrument_agent("predictive")
 def predictive_agent(state: SubgraphState) -> SubgraphState:
     """Genera predicciones basadas en el análisis."""
     logger.info(f"Predictive Agent: Generando predicciones con confianza {state['confidence']}")
@@ -683,8 +1144,7 @@ def predictive_agent(state: SubgraphState) -> SubgraphState:
     
     if not incident_data or confidence < 0.3:
         logger.warning("Predictive Agent: Confianza insuficiente para predicciones")
-        state["predictions"] = {"risk_level": "No determinado", "duration": "No aplicable"}
-        return state
+        return {"predictions": {"risk_level": "No determinado", "duration": "No aplicable"}}
     
     # Crear prompt para predicciones con enfoque en vialidades
     predictive_prompt = f"""
@@ -709,13 +1169,12 @@ def predictive_agent(state: SubgraphState) -> SubgraphState:
     Responde en JSON.
     """
     
-    predictions = query_llm(predictive_prompt, temperature=0.4)
+    predictions = query_llm(predictive_prompt, temperature=0.4, agent="predictive")
     
     # Guardar las predicciones
-    state["predictions"] = predictions
-    
-    return state
+    return {"predictions": predictions}
 
+@instrument_agent("recommender")
 def recommender_agent(state: SubgraphState) -> SubgraphState:
     """Genera recomendaciones de rutas alternativas."""
     logger.info(f"Recommender Agent: Generando recomendaciones específicas de rutas alternativas")
@@ -730,9 +1189,7 @@ def recommender_agent(state: SubgraphState) -> SubgraphState:
     # Validar disponibilidad de datos
     if not predictions or not coordinates.get("lat"):
         logger.warning("Recommender Agent: Datos insuficientes para recomendaciones")
-        state["recommendations"] = ["No hay suficientes datos para recomendar rutas alternativas"]
-        state["iteration"] = state.get("iteration", 0) + 1
-        return state
+        return {"recommendations": ["No hay suficientes datos para recomendar rutas alternativas"]}
     
     # Base de datos simplificada de vialidades de Querétaro
     qro_main_roads = {
@@ -777,7 +1234,7 @@ def recommender_agent(state: SubgraphState) -> SubgraphState:
     
     # Consultar al LLM
     try:
-        result = query_llm(recommender_prompt, temperature=0.4)
+        result = query_llm(recommender_prompt, temperature=0.4, agent="recommender")
     except Exception as e:
         logger.error(f"Error consultando al LLM: {str(e)}")
         result = ["Error al generar recomendaciones. Utilice rutas alternativas principales."]
@@ -791,34 +1248,118 @@ def recommender_agent(state: SubgraphState) -> SubgraphState:
         recommendations = ["No se pudieron generar recomendaciones específicas"]
     
     # Guardar recomendaciones
-    state["recommendations"] = recommendations
-    
-    # Incrementar contador de iteraciones
-    state["iteration"] = state.get("iteration", 0) + 1
-    
-    return state
+    return {"recommendations": recommendations}
 
 # --- Funciones para el subgrafo ---
 
-def invocador_subgrafo(state: State) -> State:
-    """Invoca el subgrafo de análisis."""
-    logger.info("Invocando subgrafo de análisis...")
-    
+class SubgraphDeadlineExceeded(Exception):
+    """La ejecución del subgrafo superó su plazo antes de terminar."""
+
+# Detener la ejecución del subgrafo antes de un agente si su plazo (time.monotonic) ya venció,
+# para que una ejecución abandonada por el invocador no siga consultando al LLM
+def within_deadline(agent_node):
+    @functools.wraps(agent_node)
+    def node(state):
+        deadline = state.get("deadline")
+        if deadline is not None and time.monotonic() >= deadline:
+            raise SubgraphDeadlineExceeded(f"plazo vencido antes de {agent_node.__name__}")
+        return agent_node(state)
+    return node
+
+# Ejecutar el subgrafo de análisis para un incidente
+def analyze_incident(incident_data, urgency, deadline=None):
     # Preparar estado inicial del subgrafo
     subgraph_initial_state = {
-        "iteration": 0,
-        "urgency": state["urgency"],
+        "urgency": urgency,
         "incident_type": None,
         "coordinates": None,
         "analysis": None,
         "confidence": None,
         "predictions": None,
         "recommendations": None,
-        "incident_data": state.get("incident_data", {})
+        "incident_data": incident_data,
+        "deadline": deadline
     }
     
     # Invocar el subgrafo
-    subgraph_result = subgraph.invoke(subgraph_initial_state)
+    return subgraph.invoke(subgraph_initial_state)
+
+# Analizar en paralelo los incidentes secundarios y anexar sus resultados al mapa
+def analyze_secondary_incidents(state, main_future, executor, deadline):
+    """Devuelve una copia de ``all_incidents`` con el análisis de cada incidente que terminó a tiempo."""
+    raw_data = state.get("raw_data") or []
+    all_incidents = [dict(incident) for incident in state.get("all_incidents") or []]
+    
+    # El router genera all_incidents en el mismo orden que raw_data
+    if len(raw_data) != len(all_incidents):
+        logger.warning("Invocador: raw_data y all_incidents no coinciden, se omite el análisis por incidente")
+        return all_incidents
+    
+    main_id = (state.get("incident_data") or {}).get("id")
+    futures = {}
+    for position, incident in enumerate(raw_data):
+        if incident.get("id") == main_id:
+            futures[main_future] = position
+        else:
+            futures[executor.submit(analyze_incident, incident, "standard", deadline)] = position
+    
+    done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    if pending:
+        logger.warning(f"Invocador: {len(pending)} incidentes sin análisis por exceder {SUBGRAPH_ALL_DEADLINE}s")
+    
+    for future in done:
+        try:
+            subgraph_result = future.result()
+        except SubgraphDeadlineExceeded:
+            continue
+        except Exception as e:
+            logger.error(f"Invocador: Error analizando incidente: {str(e)}")
+            continue
+        all_incidents[futures[future]].update({
+            "tipo_clasificado": subgraph_result["incident_type"],
+            "analisis": subgraph_result["analysis"],
+            "confianza": subgraph_result["confidence"],
+            "predicciones": subgraph_result["predictions"],
+            "recomendaciones": subgraph_result["recommendations"]
+        })
+    
+    return all_incidents
+
+# Resultado del incidente principal cuando su análisis no terminó dentro del plazo
+def unanalyzed_result(incident_data):
+    coords = incident_data.get("coordenadas") or {}
+    return {
+        "incident_type": incident_data.get("tipo_incidente") or "desconocido",
+        "coordinates": {"lat": coords.get("lat"), "lng": coords.get("lng")},
+        "analysis": {"pattern": "Análisis no disponible: se excedió el tiempo límite", "impact": "desconocido"},
+        "confidence": 0.3,
+        "predictions": {"risk_level": "No determinado", "duration": "No aplicable"},
+        "recommendations": ["No hay suficientes datos para recomendar rutas alternativas"]
+    }
+
+@instrument_agent("subgrafo_analisis")
+def invocador_subgrafo(state: State) -> State:
+    """Invoca el subgrafo de análisis."""
+    logger.info("Invocando subgrafo de análisis...")
+    
+    analyze_all = ANALYZE_ALL_INCIDENTS and len(state.get("raw_data") or []) > 1 and state.get("incident_data")
+    
+    if analyze_all:
+        # El incidente principal y los secundarios comparten un pool acotado de trabajadores
+        # y un mismo plazo; las ejecuciones que lo excedan se detienen en el siguiente agente
+        deadline = time.monotonic() + SUBGRAPH_ALL_DEADLINE
+        executor = ThreadPoolExecutor(max_workers=SUBGRAPH_MAX_WORKERS, thread_name_prefix="subgrafo")
+        main_future = executor.submit(analyze_incident, state.get("incident_data", {}), state["urgency"], deadline)
+        try:
+            all_incidents = analyze_secondary_incidents(state, main_future, executor, deadline)
+            subgraph_result = main_future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except (FutureTimeoutError, SubgraphDeadlineExceeded):
+            logger.error(f"Invocador: el incidente principal no se analizó en {SUBGRAPH_ALL_DEADLINE}s")
+            subgraph_result = unanalyzed_result(state.get("incident_data", {}))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        subgraph_result = analyze_incident(state.get("incident_data", {}), state["urgency"])
     
     # Transferir resultados del subgrafo al estado principal
     result = {
@@ -829,6 +1370,8 @@ def invocador_subgrafo(state: State) -> State:
         "predictions": subgraph_result["predictions"],
         "recommendations": subgraph_result["recommendations"]
     }
+    if analyze_all:
+        result["all_incidents"] = all_incidents
     
     return result
 
@@ -852,27 +1395,26 @@ graph_builder.add_edge("reporter", END)
 # --- Construir subgrafo ---
 
 subgraph_builder = StateGraph(SubgraphState)
-subgraph_builder.add_node("classifier", classifier_agent)
-subgraph_builder.add_node("geo_spatial", geo_spatial_agent)
-subgraph_builder.add_node("analytics", analytics_agent)
-subgraph_builder.add_node("evaluator", evaluator_agent)
-subgraph_builder.add_node("predictive", predictive_agent)
-subgraph_builder.add_node("recommender", recommender_agent)
-
-# Definir el flujo del subgrafo
-subgraph_builder.set_entry_point("classifier")
-subgraph_builder.add_edge("classifier", "geo_spatial")
-subgraph_builder.add_edge("geo_spatial", "analytics")
+subgraph_builder.add_node("classifier", within_deadline(classifier_agent))
+subgraph_builder.add_node("geo_spatial", within_deadline(geo_spatial_agent))
+subgraph_builder.add_node("analytics", within_deadline(analytics_agent))
+subgraph_builder.add_node("evaluator", within_deadline(evaluator_agent))
+subgraph_builder.add_node("predictive", within_deadline(predictive_agent))
+subgraph_builder.add_node("recommender", within_deadline(recommender_agent))
+
+# Definir el flujo del subgrafo como DAG de dependencias:
+# classifier y geo_spatial solo necesitan incident_data y corren en paralelo;
+# analytics espera a ambos y el resto depende del resultado anterior
+for entry_node in SUBGRAPH_ENTRY_NODES:
+    subgraph_builder.add_edge(START, entry_node)
+subgraph_builder.add_edge(SUBGRAPH_ENTRY_NODES, "analytics")
 subgraph_builder.add_edge("analytics", "evaluator")
 subgraph_builder.add_edge("evaluator", "predictive")
 subgraph_builder.add_edge("predictive", "recommender")
 
-# Iteraciones controladas
-subgraph_builder.add_conditional_edges(
-    "recommender",
-    lambda state: END if state["iteration"] >= 2 else "classifier",
-    {"classifier": "classifier", END: END}
-)
+# Una sola pasada: incident_data no cambia dentro del subgrafo, así que una segunda
+# pasada recibiría las mismas entradas y solo repetiría llamadas al LLM
+subgraph_builder.add_edge("recommender", END)
 
 subgraph = subgraph_builder.compile()
 
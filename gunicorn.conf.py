@@ -0,0 +1,9 @@
+# gunicorn.conf.py
+# Con --preload la aplicación se importa en el proceso maestro antes de crear los workers,
+# así que los hilos (planificador, registro de reportes) y las conexiones a las bases de
+# datos deben iniciarse en cada worker después del fork.
+
+
+def post_worker_init(worker):
+    from app import initialize_app
+    initialize_app()
@@ -0,0 +1,91 @@
+# heatmap.py
+# Rejilla de densidad para el mapa de calor, precalculada por nivel de zoom
+
+import math
+import numpy as np
+
+# Niveles de zoom de Leaflet para los que se precalcula la rejilla
+HEATMAP_ZOOM_LEVELS = list(range(8, 17))
+DEFAULT_HEATMAP_ZOOM = 12
+
+# Tamaño de cada celda en píxeles de pantalla (las teselas de Leaflet miden 256 px)
+CELL_PIXELS = 16
+TILE_SIZE = 256
+
+# Intensidad por gravedad del incidente (el resto pesa 1)
+SEVERITY_WEIGHTS = {"alta": 1.5, "crítica": 2.0}
+
+
+def incident_weight(incident):
+    return SEVERITY_WEIGHTS.get(incident.get("gravedad"), 1.0)
+
+
+def cell_size_degrees(zoom):
+    """Grados de longitud que cubren ``CELL_PIXELS`` píxeles en el nivel de zoom dado."""
+    return 360.0 / (TILE_SIZE * 2 ** zoom) * CELL_PIXELS
+
+
+class HeatmapPyramid:
+    """Densidad ponderada por gravedad agrupada en celdas para varios niveles de zoom.
+
+    Cada nivel guarda tres arreglos (latitud y longitud del centro de la celda y peso
+    acumulado), de modo que la respuesta depende de la resolución de la rejilla y no
+    del número de incidentes en el historial.
+    """
+
+    def __init__(self, lats, lngs, weights, zoom_levels=HEATMAP_ZOOM_LEVELS):
+        self.points = len(lats)
+        self.levels = {}
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        weights = np.asarray(weights, dtype=np.float64)
+        for zoom in zoom_levels:
+            self.levels[zoom] = self._bin(lats, lngs, weights, cell_size_degrees(zoom))
+
+    @staticmethod
+    def _bin(lats, lngs, weights, cell):
+        if lats.size == 0:
+            empty = np.empty(0)
+            return empty, empty, empty
+        rows = np.floor(lats / cell).astype(np.int64)
+        cols = np.floor(lngs / cell).astype(np.int64)
+        cells, inverse = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=weights, minlength=len(cells))
+        return (cells[:, 0] + 0.5) * cell, (cells[:, 1] + 0.5) * cell, totals
+
+    def nearest_zoom(self, zoom):
+        return min(self.levels, key=lambda level: abs(level - zoom))
+
+    def query(self, zoom, bbox=None):
+        """Celdas del nivel más cercano a ``zoom`` dentro de ``bbox`` (minLng, minLat, maxLng, maxLat)."""
+        lat_centers, lng_centers, totals = self.levels[self.nearest_zoom(zoom)]
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            mask = (
+                (lat_centers >= min_lat) & (lat_centers <= max_lat)
+                & (lng_centers >= min_lng) & (lng_centers <= max_lng)
+            )
+            lat_centers, lng_centers, totals = lat_centers[mask], lng_centers[mask], totals[mask]
+        return [
+            {"lat": round(lat, 6), "lng": round(lng, 6), "intensity": round(total, 3)}
+            for lat, lng, total in zip(lat_centers.tolist(), lng_centers.tolist(), totals.tolist())
+        ]
+
+
+def build_heatmap_pyramid(entries):
+    """Construye la pirámide a partir de los registros del historial."""
+    lats, lngs, weights = [], [], []
+    for entry in entries:
+        for incident in entry.get("incidents", []):
+            coords = incident.get("coordenadas")
+            if not (coords and coords.get("lat") and coords.get("lng")):
+                continue
+            try:
+                lat, lng = float(coords["lat"]), float(coords["lng"])
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(lat) and math.isfinite(lng):
+                lats.append(lat)
+                lngs.append(lng)
+                weights.append(incident_weight(incident))
+    return HeatmapPyramid(lats, lngs, weights)
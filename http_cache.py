@@ -0,0 +1,83 @@
+# http_cache.py
+# Respuestas JSON serializadas y comprimidas una sola vez por versión de los datos, con ETag/304
+
+import gzip
+import hashlib
+import threading
+from collections import namedtuple
+
+from flask import current_app, request
+
+# Brotli es opcional: si no está instalado se ofrece solo gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Por debajo de este tamaño comprimir no compensa
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+EncodedBodies = namedtuple("EncodedBodies", ["etag", "identity", "gzip", "br"])
+
+
+def version_etag(name, version):
+    """ETag derivado del nombre del recurso y de la versión de los datos que lo generan."""
+    return hashlib.sha1(f"{name}:{version!r}".encode("utf-8")).hexdigest()[:20]
+
+
+class VersionedResponseCache:
+    """Cuerpo de una respuesta JSON precalculado para la versión actual de sus datos.
+
+    Mientras ``version`` no cambie, el JSON se serializa y se comprime una sola vez y
+    todas las peticiones reutilizan esos bytes. Si el cliente ya tiene la versión
+    (``If-None-Match``), se responde 304 sin construir ni enviar el cuerpo.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._bodies = None
+        self._lock = threading.Lock()
+
+    def _encode(self, etag, payload):
+        body = current_app.json.dumps(payload).encode("utf-8")
+        gzipped = brotli_body = None
+        if len(body) >= MIN_COMPRESS_SIZE:
+            gzipped = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                brotli_body = brotli.compress(body, quality=BROTLI_QUALITY)
+        return EncodedBodies(etag, body, gzipped, brotli_body)
+
+    def bodies(self, etag, build):
+        bodies = self._bodies
+        if bodies is None or bodies.etag != etag:
+            with self._lock:
+                bodies = self._bodies
+                if bodies is None or bodies.etag != etag:
+                    bodies = self._encode(etag, build())
+                    self._bodies = bodies
+        return bodies
+
+    def respond(self, version, build):
+        """Respuesta para ``version``; ``build()`` solo se llama si la versión es nueva."""
+        etag = version_etag(self.name, version)
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            bodies = self.bodies(etag, build)
+            accepted = request.accept_encodings
+            if bodies.br is not None and accepted["br"]:
+                body, encoding = bodies.br, "br"
+            elif bodies.gzip is not None and accepted["gzip"]:
+                body, encoding = bodies.gzip, "gzip"
+            else:
+                body, encoding = bodies.identity, None
+            response = current_app.response_class(body, mimetype="application/json")
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        # El navegador debe revalidar en cada sondeo; con el ETag la respuesta es un 304 vacío
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "no-cache"
+        response.vary.add("Accept-Encoding")
+        return response
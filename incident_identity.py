@@ -0,0 +1,175 @@
+# incident_identity.py
+# Identidad de incidentes: claves canónicas y detección de casi duplicados (SimHash)
+
+import re
+import hashlib
+import unicodedata
+from collections import defaultdict
+
+# Distancia de Hamming máxima (en bits, de 64) para considerar dos textos como la misma nota
+SIMHASH_MAX_DISTANCE = 6
+SIMHASH_BITS = 64
+
+# Clave con la que se guarda la huella en cada incidente del historial (hexadecimal, o None si el texto es corto)
+FINGERPRINT_KEY = "huella_simhash"
+
+# Textos con menos palabras que esto no se comparan por SimHash (demasiado poco contenido)
+MIN_TEXT_TOKENS = 12
+
+# Palabras vacías frecuentes en las notas que no aportan a la similitud
+STOPWORDS = {
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al", "en", "y", "o",
+    "que", "por", "para", "con", "sin", "se", "su", "sus", "lo", "le", "les", "es", "fue",
+    "ha", "han", "como", "mas", "pero", "este", "esta", "estos", "estas", "tras", "sobre",
+    "entre", "cuando", "donde", "ya", "no", "si", "muy", "a", "e", "u"
+}
+
+
+def normalize_text(value):
+    """Minúsculas, sin acentos ni puntuación y con espacios simples."""
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFKD", str(value).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def canonical_keys(incident):
+    """Claves exactas que identifican un incidente.
+
+    - Título y lugar normalizados (una misma página puede listar varios incidentes,
+      así que el título solo no basta).
+    - Lugar, tipo y fecha del incidente juntos (la misma nota con otro titular).
+    """
+    keys = []
+    title = normalize_text(incident.get("titulo"))
+    place = normalize_text(incident.get("lugar"))
+    if title:
+        keys.append(("titulo", title, place))
+    kind = normalize_text(incident.get("tipo"))
+    date = normalize_text(incident.get("fecha_incidente"))
+    if place and kind and date:
+        keys.append(("lugar", place, kind, date))
+    return keys
+
+
+def incident_text(incident):
+    # El contenido completo es más estable entre medios que el resumen generado por el LLM
+    return incident.get("contenido_completo") or incident.get("resumen") or ""
+
+
+def simhash(text):
+    """SimHash de 64 bits sobre palabras y pares de palabras, o ``None`` si el texto es corto."""
+    tokens = [token for token in normalize_text(text).split() if token not in STOPWORDS]
+    if len(tokens) < MIN_TEXT_TOKENS:
+        return None
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * SIMHASH_BITS
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def incident_fingerprint(incident):
+    """Huella SimHash guardada con el incidente o, si no la tiene, calculada a partir de su texto."""
+    if FINGERPRINT_KEY in incident:
+        stored = incident[FINGERPRINT_KEY]
+        return int(stored, 16) if stored else None
+    return simhash(incident_text(incident))
+
+
+def with_fingerprint(incident):
+    """Copia del incidente con su huella guardada, para no recalcularla cada vez que se lee."""
+    if FINGERPRINT_KEY in incident:
+        return incident
+    fingerprint = simhash(incident_text(incident))
+    return dict(incident, **{FINGERPRINT_KEY: f"{fingerprint:016x}" if fingerprint is not None else None})
+
+
+def entry_with_fingerprints(entry):
+    """Copia de un registro del historial con la huella de cada incidente, o ``None`` si ya las tenía."""
+    incidents = entry.get("incidents") or []
+    if all(FINGERPRINT_KEY in incident for incident in incidents):
+        return None
+    return dict(entry, incidents=[with_fingerprint(incident) for incident in incidents])
+
+
+class IncidentIdentity:
+    """Índice de identidad: decide si un incidente ya se vio, en O(1) por incidente.
+
+    Las claves canónicas se buscan en un diccionario. Para los casi duplicados la huella
+    SimHash se parte en ``max_distance + 1`` bandas: dos huellas a distancia
+    ``<= max_distance`` coinciden por fuerza en al menos una banda, así que solo se
+    comparan los candidatos que comparten alguna.
+    """
+
+    def __init__(self, max_distance=SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.bands
+        self._keys = {}
+        self._fingerprints = []
+        self._band_index = defaultdict(list)
+        self._size = 0
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(band, fingerprint >> (band * self.band_bits) & mask) for band in range(self.bands)]
+
+    def find(self, incident):
+        """Identificador del incidente equivalente ya registrado, o ``None``."""
+        for key in canonical_keys(incident):
+            if key in self._keys:
+                return self._keys[key]
+        fingerprint = incident_fingerprint(incident)
+        if fingerprint is not None:
+            return self._find_similar(fingerprint)
+        return None
+
+    def _find_similar(self, fingerprint):
+        for band_key in self._band_keys(fingerprint):
+            for candidate in self._band_index.get(band_key, ()):
+                if bin(self._fingerprints[candidate][0] ^ fingerprint).count("1") <= self.max_distance:
+                    return self._fingerprints[candidate][1]
+        return None
+
+    def add(self, incident):
+        """Registra el incidente; devuelve ``(identificador, es_nuevo)``."""
+        keys = canonical_keys(incident)
+        fingerprint = None
+        incident_id = next((self._keys[key] for key in keys if key in self._keys), None)
+        if incident_id is None:
+            fingerprint = incident_fingerprint(incident)
+            if fingerprint is not None:
+                incident_id = self._find_similar(fingerprint)
+        is_new = incident_id is None
+        if is_new:
+            incident_id = self._size
+            self._size += 1
+        # Registrar también las claves nuevas de un duplicado para reconocer sus variantes
+        for key in keys:
+            self._keys.setdefault(key, incident_id)
+        if fingerprint is not None and is_new:
+            position = len(self._fingerprints)
+            self._fingerprints.append((fingerprint, incident_id))
+            for band_key in self._band_keys(fingerprint):
+                self._band_index[band_key].append(position)
+        return incident_id, is_new
+
+    def __contains__(self, incident):
+        return self.find(incident) is not None
+
+    def __len__(self):
+        return self._size
+
+
+def unique_incidents(incidents, identity=None):
+    """Filtra duplicados conservando el primero de cada grupo y el orden original."""
+    identity = identity if identity is not None else IncidentIdentity()
+    return [incident for incident in incidents if identity.add(incident)[1]]
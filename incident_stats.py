@@ -0,0 +1,134 @@
+# incident_stats.py
+# Contadores de incidentes mantenidos de forma incremental para los widgets del tablero
+
+import bisect
+import threading
+from collections import Counter, defaultdict
+
+SOURCES = ("system", "citizen")
+BUCKETS = {"hour": 13, "day": 10}  # longitud del prefijo ISO de cada cubeta: 2025-04-02T20 / 2025-04-02
+
+
+def incident_type(incident):
+    return incident.get("tipo") or incident.get("tipo_incidente") or "desconocido"
+
+
+def incident_severity(incident):
+    return incident.get("gravedad") or incident.get("severity") or "desconocida"
+
+
+def _adjust(counter, key, sign):
+    # Las claves que vuelven a cero se eliminan para que los contadores no crezcan sin límite
+    counter[key] += sign
+    if not counter[key]:
+        del counter[key]
+
+
+class IncidentStats:
+    """Conteos por tipo, gravedad y cubeta horaria/diaria, separados por fuente.
+
+    Los incidentes del sistema se cuentan con el timestamp del ciclo del historial en
+    el que aparecen; los reportes ciudadanos con su propio timestamp. Los contadores
+    se actualizan al añadir o eliminar registros, así que leerlos no recorre el historial:
+    un resumen parte de los totales acumulados y solo suma (o resta) las cubetas del lado
+    más corto de ``since``. Las cubetas que quedan vacías se eliminan.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals, self._severities, self._series, self._keys = {}, {}, {}, {}
+        self.reset()
+
+    def reset(self, source=None):
+        with self._lock:
+            for name in ([source] if source else SOURCES):
+                self._init_source(name)
+
+    def _init_source(self, source):
+        self._totals[source] = Counter()
+        self._severities[source] = Counter()
+        # _series[source][granularidad][cubeta] = (Counter de tipos, Counter de gravedades)
+        self._series[source] = {name: {} for name in BUCKETS}
+        # _keys[source][granularidad] = cubetas ordenadas, para buscar ``since`` con bisect
+        self._keys[source] = {name: [] for name in BUCKETS}
+
+    def _count(self, source, timestamp, item, sign):
+        kind, severity = incident_type(item), incident_severity(item)
+        _adjust(self._totals[source], kind, sign)
+        _adjust(self._severities[source], severity, sign)
+        for name, length in BUCKETS.items():
+            buckets, keys = self._series[source][name], self._keys[source][name]
+            key = timestamp[:length]
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = (Counter(), Counter())
+                bisect.insort(keys, key)
+            types, severities = bucket
+            _adjust(types, kind, sign)
+            _adjust(severities, severity, sign)
+            if not types and not severities:
+                del buckets[key]
+                del keys[bisect.bisect_left(keys, key)]
+
+    def add_entry(self, entry, sign=1):
+        """Cuenta (o descuenta con ``sign=-1``) los incidentes de un registro del historial."""
+        timestamp = entry.get("timestamp", "") or ""
+        with self._lock:
+            for incident in entry.get("incidents", []):
+                self._count("system", timestamp, incident, sign)
+
+    def remove_entry(self, entry):
+        self.add_entry(entry, sign=-1)
+
+    def add_report(self, report):
+        with self._lock:
+            self._count("citizen", report.get("timestamp", "") or "", report, 1)
+
+    def _sources(self, source):
+        return SOURCES if source == "all" else (source,)
+
+    def totals(self, source="system"):
+        """Conteo por tipo de todos los incidentes registrados."""
+        with self._lock:
+            result = Counter()
+            for name in self._sources(source):
+                result.update(self._totals[name])
+            return {kind: count for kind, count in result.items() if count > 0}
+
+    def summary(self, since_iso="", bucket="day", source="system"):
+        """Conteos por tipo y gravedad desde ``since_iso`` y serie temporal por ``bucket``."""
+        length = BUCKETS[bucket]
+        since_hour = since_iso[:BUCKETS["hour"]]
+        since_bucket = since_iso[:length]
+        by_type, by_severity = Counter(), Counter()
+        series = defaultdict(Counter)
+        with self._lock:
+            for name in self._sources(source):
+                # Los totales usan cubetas horarias para respetar ``since`` con precisión de hora:
+                # se suman las posteriores a ``since`` o, si son menos, se restan las anteriores
+                hours, hour_keys = self._series[name]["hour"], self._keys[name]["hour"]
+                start = bisect.bisect_left(hour_keys, since_hour)
+                if start <= len(hour_keys) - start:
+                    by_type.update(self._totals[name])
+                    by_severity.update(self._severities[name])
+                    for key in hour_keys[:start]:
+                        by_type.subtract(hours[key][0])
+                        by_severity.subtract(hours[key][1])
+                else:
+                    for key in hour_keys[start:]:
+                        by_type.update(hours[key][0])
+                        by_severity.update(hours[key][1])
+                buckets, keys = self._series[name][bucket], self._keys[name][bucket]
+                for key in keys[bisect.bisect_left(keys, since_bucket):]:
+                    series[key].update(buckets[key][0])
+        return {
+            "since": since_iso or None,
+            "bucket": bucket,
+            "source": source,
+            "by_type": {kind: count for kind, count in by_type.items() if count > 0},
+            "by_severity": {severity: count for severity, count in by_severity.items() if count > 0},
+            "series": {
+                key: {kind: count for kind, count in counts.items() if count > 0}
+                for key, counts in sorted(series.items())
+            }
+        }
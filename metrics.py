@@ -0,0 +1,227 @@
+# metrics.py
+# Registro ligero de métricas (contadores e histogramas) con salida en formato de texto de Prometheus
+
+import os
+import glob
+import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from storage import write_json_atomic
+
+# Límites de los histogramas: segundos para duraciones, caracteres para tamaños
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Se esperaban las etiquetas {labelnames}, se recibieron {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Valor acumulado por combinación de etiquetas."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Distribución de observaciones en cubetas acumuladas, con suma y cuenta."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # etiquetas -> [conteo por cubeta..., suma, cuenta]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            values = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, values in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                for bound, count in zip(self.buckets, values):
+                    samples.append((f"{self.name}_bucket", dict(labels, le=_format_value(bound)), count))
+                samples.append((f"{self.name}_bucket", dict(labels, le="+Inf"), values[-1]))
+                samples.append((f"{self.name}_sum", labels, values[-2]))
+                samples.append((f"{self.name}_count", labels, values[-1]))
+        return samples
+
+
+class Registry:
+    """Métricas del proceso y funciones que aportan métricas calculadas al momento.
+
+    Un *colector* es una función sin argumentos que devuelve una lista de familias
+    ``(nombre, tipo, descripción, muestras)``, donde cada muestra es
+    ``(nombre_muestra, etiquetas, valor)``.
+    """
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def collect(self):
+        families = [(m.name, m.type, m.documentation, m.samples()) for m in list(self._metrics.values())]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def write_snapshot(self, path):
+        """Guarda las métricas actuales para que otros procesos las incluyan en ``/metrics``."""
+        write_json_atomic(path, [
+            [name, kind, documentation, [[sample, labels, value] for sample, labels, value in samples]]
+            for name, kind, documentation, samples in self.collect()
+        ], indent=None)
+
+
+def merge_families(*family_lists):
+    """Suma las muestras de varias listas de familias (contadores e histogramas de distintos procesos)."""
+    merged = OrderedDict()
+    for families in family_lists:
+        for name, kind, documentation, samples in families:
+            _, _, _, values = merged.setdefault(name, (name, kind, documentation, OrderedDict()))
+            for sample, labels, value in samples:
+                key = (sample, tuple(sorted(labels.items())))
+                values[key] = values.get(key, 0) + value
+    return [
+        (name, kind, documentation, [(sample, dict(labels), value) for (sample, labels), value in values.items()])
+        for name, kind, documentation, values in merged.values()
+    ]
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def load_snapshots(directory, exclude_pid=None):
+    """Familias guardadas por otros procesos en ``directory`` (un archivo ``<pid>.json`` cada uno).
+
+    Se ignoran las instantáneas de procesos que ya no existen (workers reiniciados o
+    ejecuciones anteriores), como ocurre con los contadores de un proceso que se reinicia.
+    """
+    family_lists = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        pid = os.path.splitext(os.path.basename(path))[0]
+        if not pid.isdigit() or int(pid) == exclude_pid or not _process_alive(int(pid)):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                family_lists.append([
+                    (name, kind, documentation, [(sample, labels, value) for sample, labels, value in samples])
+                    for name, kind, documentation, samples in json.load(f)
+                ])
+        except (OSError, ValueError):
+            continue
+    return family_lists
+
+
+def render(families):
+    """Texto en el formato de exposición de Prometheus (versión 0.0.4)."""
+    lines = []
+    for name, kind, documentation, samples in families:
+        lines.append(f"# HELP {name} {_escape(documentation)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample, labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{sample}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{sample} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def instrument(histogram, counter, **labels):
+    """Decorador que mide la duración de la función y cuenta sus ejecuciones por resultado."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+                counter.inc(outcome=outcome, **labels)
+        return wrapper
+    return decorator
+
+
+# Registro compartido por todo el proceso
+REGISTRY = Registry()
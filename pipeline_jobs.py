@@ -0,0 +1,255 @@
+# pipeline_jobs.py
+# Ejecuciones del pipeline en segundo plano, una a la vez, consultables por identificador
+
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Trabajos terminados que se conservan para consulta
+MAX_FINISHED_JOBS = 50
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+class PipelineBusy(RuntimeError):
+    """Otro proceso tiene el bloqueo del pipeline pero todavía no publicó su trabajo."""
+
+
+class PipelineJob:
+    """Una ejecución del pipeline y el avance de cada etapa."""
+
+    def __init__(self, trigger, stages):
+        self.id = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.status = "queued"
+        self.stages = [{"name": name, "status": "pending"} for name in stages]
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.coalesced_requests = 0
+        self._done = threading.Event()
+
+    def _start_stage(self, index):
+        if index < len(self.stages):
+            self.stages[index]["status"] = "running"
+            self.stages[index]["started_at"] = datetime.now().isoformat()
+
+    def start(self):
+        self.status = "running"
+        self.started_at = datetime.now().isoformat()
+        self._start_stage(0)
+
+    def stage_finished(self, name):
+        """Marca la etapa ``name`` como terminada y la siguiente pendiente como en curso."""
+        for index, stage in enumerate(self.stages):
+            if stage["name"] == name:
+                stage["status"] = "done"
+                stage["finished_at"] = datetime.now().isoformat()
+                if index + 1 < len(self.stages) and self.stages[index + 1]["status"] == "pending":
+                    self._start_stage(index + 1)
+                return
+
+    def finish(self, success, error=None):
+        self.status = "succeeded" if success else "failed"
+        self.error = error
+        self.finished_at = datetime.now().isoformat()
+        for stage in self.stages:
+            if stage["status"] == "running":
+                stage["status"] = "done" if success else "failed"
+        self._done.set()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        completed = sum(1 for stage in self.stages if stage["status"] == "done")
+        current = next((stage["name"] for stage in self.stages if stage["status"] == "running"), None)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "trigger": self.trigger,
+            "current_stage": current,
+            "progress": round(completed / len(self.stages), 2) if self.stages else None,
+            "stages": [dict(stage) for stage in self.stages],
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "coalesced_requests": self.coalesced_requests,
+            "error": self.error
+        }
+
+
+class PipelineJobs:
+    """Lanza el pipeline en un hilo propio sin ejecuciones simultáneas.
+
+    ``run(progress)`` es la función que ejecuta el pipeline: recibe un callback que se
+    llama con el nombre de cada etapa al terminarla y devuelve ``True`` si tuvo éxito.
+    Si ya hay una ejecución en curso, ``submit`` devuelve ese mismo trabajo en lugar de
+    lanzar otro, de modo que las peticiones simultáneas y la actualización periódica se
+    unen a la ejecución existente.
+
+    Con varios workers, ``lock`` (un ``ProcessLock``) garantiza que solo un proceso
+    ejecute el pipeline a la vez y ``store`` (un ``JobStore``) publica el estado de los
+    trabajos para que cualquier worker pueda responder por ellos.
+    """
+
+    # Espera máxima a que otro proceso publique el trabajo que acaba de iniciar
+    REMOTE_JOB_WAIT = 2.0
+    REMOTE_POLL_INTERVAL = 2.0
+
+    def __init__(self, run, stages=(), store=None, lock=None, max_finished=MAX_FINISHED_JOBS,
+                 remote_timeout=3600):
+        self._run = run
+        self.stages = list(stages)
+        self.store = store
+        self.run_lock = lock
+        self.max_finished = max_finished
+        # Espera máxima de ``run`` a un trabajo que ejecuta otro proceso
+        self.remote_timeout = remote_timeout
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock = threading.Lock()
+
+    def submit(self, trigger="manual"):
+        """Devuelve ``(trabajo, creado)`` con el trabajo como diccionario.
+
+        ``creado`` es ``False`` si la petición se unió a una ejecución en curso, de este
+        o de otro proceso.
+        """
+        with self._lock:
+            if self._active is not None:
+                self._active.coalesced_requests += 1
+                self._save(self._active)
+                return self._active.to_dict(), False
+            if self.run_lock is not None and not self.run_lock.acquire():
+                remote = self._remote_active()
+                if remote is not None:
+                    return remote, False
+                # El otro proceso terminó justo ahora: intentar de nuevo
+                if not self.run_lock.acquire():
+                    raise PipelineBusy("El pipeline está en ejecución en otro proceso")
+            return self._start(trigger).to_dict(), True
+
+    def _start(self, trigger):
+        # Se llama con ``self._lock`` y el bloqueo entre procesos ya tomados
+        if self.store is not None:
+            # Con el bloqueo tomado, cualquier trabajo "en curso" pertenece a un proceso que ya no existe
+            self.store.mark_interrupted("Ejecución interrumpida (el proceso terminó)")
+        job = PipelineJob(trigger, self.stages)
+        self._active = job
+        self._jobs[job.id] = job
+        self._prune()
+        self._save(job)
+        threading.Thread(target=self._execute, args=(job,), name=f"pipeline-{job.id}", daemon=True).start()
+        return job
+
+    def _remote_active(self):
+        if self.store is None:
+            return None
+        deadline = time.monotonic() + self.REMOTE_JOB_WAIT
+        while True:
+            remote = self.store.active()
+            if remote is not None or time.monotonic() >= deadline:
+                return remote
+            time.sleep(0.1)
+
+    def run(self, trigger="periodic"):
+        """Ejecuta (o espera la ejecución en curso) y devuelve el trabajo terminado."""
+        job, created = self.submit(trigger)
+        local = self._jobs.get(job["job_id"])
+        if local is None:
+            job, local = self._wait_remote(job, trigger)
+        if local is not None:
+            local.wait()
+            return local.to_dict()
+        return job
+
+    def _wait_remote(self, job, trigger):
+        """Espera el trabajo de otro proceso; devuelve ``(trabajo, trabajo_local)``.
+
+        Si el bloqueo del pipeline queda libre sin que el trabajo haya terminado, su
+        proceso murió (el sistema libera el ``flock``): el trabajo se marca como
+        interrumpido y se lanza uno nuevo en este proceso. La espera dura como mucho
+        ``remote_timeout``; al vencer se devuelve el último estado conocido.
+        """
+        deadline = time.monotonic() + self.remote_timeout
+        while job is not None and job["status"] not in FINISHED_STATUSES:
+            if time.monotonic() >= deadline:
+                logger.warning(f"Trabajo {job['job_id']} sigue en curso tras {self.remote_timeout}s de espera")
+                break
+            time.sleep(self.REMOTE_POLL_INTERVAL)
+            with self._lock:
+                if self._active is None and self.run_lock.acquire():
+                    # El dueño publica el estado final antes de soltar el bloqueo
+                    job = self.store.get(job["job_id"]) or job
+                    if job["status"] in FINISHED_STATUSES:
+                        self.run_lock.release()
+                        break
+                    logger.warning(f"Trabajo {job['job_id']} abandonado por su proceso; se relanza aquí")
+                    return None, self._start(trigger)
+            job = self.store.get(job["job_id"])
+        return job, None
+
+    def get(self, job_id):
+        """El trabajo como diccionario, aunque lo ejecute otro proceso."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.get(job_id) if self.store is not None else None
+
+    def last_finished_at(self):
+        """Fin de la última ejecución terminada en cualquier proceso (ISO), o ``None``."""
+        if self.store is not None:
+            job = self.store.last_finished()
+            return job["finished_at"] if job else None
+        finished = [job.finished_at for job in self._jobs.values() if job.finished]
+        return max(finished) if finished else None
+
+    @property
+    def active(self):
+        return self._active
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        try:
+            self.store.save(job.to_dict())
+        except Exception as e:
+            logger.error(f"No se pudo guardar el estado del trabajo {job.id}: {str(e)}")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _execute(self, job):
+        job.start()
+        self._save(job)
+        logger.info(f"Trabajo {job.id} ({job.trigger}) iniciado")
+
+        def progress(stage):
+            job.stage_finished(stage)
+            self._save(job)
+
+        try:
+            success = bool(self._run(progress))
+            error = None if success else "El pipeline terminó con errores (ver app.log)"
+        except Exception as e:
+            logger.exception(f"Trabajo {job.id} falló")
+            success, error = False, str(e)
+        with self._lock:
+            job.finish(success, error)
+            self._save(job)
+            self._active = None
+            if self.run_lock is not None:
+                self.run_lock.release()
+        logger.info(f"Trabajo {job.id} terminado: {job.status}")
@@ -0,0 +1,85 @@
+# scheduler.py
+# Actualización periódica del pipeline a cargo de un único proceso elegido como líder
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+
+from storage import ProcessLock
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto intenta un worker que no es líder tomar el relevo
+LEADER_RETRY_INTERVAL = 30
+# Espera tras un error inesperado del planificador
+ERROR_RETRY_INTERVAL = 60
+
+
+class PipelineScheduler:
+    """Ejecuta el pipeline cada ``interval`` segundos en un solo proceso.
+
+    Cada worker arranca el planificador, pero solo el que obtiene el bloqueo
+    ``lock_path`` (el líder) ejecuta el pipeline; los demás reintentan cada
+    ``retry_interval`` segundos y toman el relevo si el líder termina. Los resultados
+    llegan a todos los workers por los archivos y bases de datos compartidos.
+
+    El momento de la siguiente ejecución se calcula a partir de la última ejecución
+    terminada en cualquier proceso (``jobs.last_finished_at()``) o, si no hay ninguna,
+    de ``last_update()``, de modo que un cambio de líder o una actualización manual no
+    provocan ejecuciones de más.
+    """
+
+    def __init__(self, jobs, interval, lock_path, last_update=None, retry_interval=LEADER_RETRY_INTERVAL):
+        self.jobs = jobs
+        self.interval = interval
+        self.leader_lock = ProcessLock(lock_path)
+        self.last_update = last_update
+        self.retry_interval = retry_interval
+        self._thread = None
+        self._thread_pid = None
+
+    @property
+    def is_leader(self):
+        return self.leader_lock.held
+
+    def start(self):
+        # Un hilo por proceso: tras un fork el hilo del proceso padre no existe en el hijo
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._loop, name="pipeline-scheduler", daemon=True)
+        self._thread.start()
+
+    def seconds_until_due(self):
+        last = self.jobs.last_finished_at() or (self.last_update() if self.last_update else None)
+        if not last:
+            return 0
+        try:
+            elapsed = (datetime.now() - datetime.fromisoformat(last)).total_seconds()
+        except ValueError:
+            return 0
+        return max(0, self.interval - elapsed)
+
+    def _loop(self):
+        while True:
+            try:
+                if not self.is_leader:
+                    if not self.leader_lock.acquire():
+                        time.sleep(self.retry_interval)
+                        continue
+                    logger.info(f"Proceso {os.getpid()} elegido para ejecutar la actualización periódica")
+
+                wait = self.seconds_until_due()
+                if wait > 0:
+                    time.sleep(wait)
+                    continue
+
+                logger.info("Iniciando actualización periódica...")
+                job = self.jobs.run(trigger="periodic")
+                logger.info(f"Actualización {job['status'] if job else 'desconocida'}. "
+                            f"Próxima actualización en {self.interval} segundos")
+            except Exception as e:
+                logger.exception(f"Error en actualización periódica: {str(e)}")
+                time.sleep(ERROR_RETRY_INTERVAL)
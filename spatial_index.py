@@ -0,0 +1,68 @@
+# spatial_index.py
+# Índice espacial en memoria para consultas de incidentes por área visible del mapa
+
+import math
+from collections import defaultdict
+
+# Tamaño de celda por defecto: 0.01 grados (~1 km en Querétaro)
+DEFAULT_CELL_SIZE = 0.01
+
+
+class GridIndex:
+    """Rejilla uniforme de celdas lat/lng con los elementos que caen en cada una.
+
+    Una consulta por rectángulo solo revisa las celdas que lo intersectan, de modo que
+    el costo depende de lo que está a la vista y no del total de incidentes indexados.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.size = 0
+
+    def _cell(self, lat, lng):
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def insert(self, lat, lng, item):
+        self.cells[self._cell(lat, lng)].append((lat, lng, item))
+        self.size += 1
+
+    def query(self, min_lng, min_lat, max_lng, max_lat):
+        """Elementos dentro del rectángulo (bordes incluidos)."""
+        min_row, min_col = self._cell(min_lat, min_lng)
+        max_row, max_col = self._cell(max_lat, max_lng)
+
+        # Si el rectángulo cubre más celdas de las que están ocupadas, recorrer solo las ocupadas
+        range_cells = (max_row - min_row + 1) * (max_col - min_col + 1)
+        if range_cells > len(self.cells):
+            candidate_cells = [
+                points for (row, col), points in self.cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            ]
+        else:
+            candidate_cells = [
+                self.cells[(row, col)]
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                if (row, col) in self.cells
+            ]
+
+        for points in candidate_cells:
+            for lat, lng, item in points:
+                if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng:
+                    yield item
+
+    def __len__(self):
+        return self.size
+
+
+# Interpretar el parámetro bbox=minLng,minLat,maxLng,maxLat
+def parse_bbox(value):
+    """Devuelve ``(min_lng, min_lat, max_lng, max_lat)`` o lanza ``ValueError``."""
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox debe tener el formato minLng,minLat,maxLng,maxLat")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bbox inválido: los mínimos deben ser menores que los máximos")
+    return min_lng, min_lat, max_lng, max_lat
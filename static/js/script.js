@@ -1474,19 +1474,35 @@ function locateUser() {
     }
 }
 
+// Consultar el avance de una ejecución del pipeline hasta que termine
+const UPDATE_JOB_POLL_INTERVAL = 3000;
+
+async function waitForUpdateJob(statusUrl) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, UPDATE_JOB_POLL_INTERVAL));
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+        if (!response.ok || job.status === 'succeeded' || job.status === 'failed') {
+            return job;
+        }
+        console.log(`Actualización en curso: ${job.current_stage} (${Math.round(job.progress * 100)}%)`);
+    }
+}
+
 // Función para solicitar actualización manual de datos
 async function refreshData() {
     try {
         showLoadingIndicator(true);
 
-        // Solicitar actualización al backend
+        // Solicitar actualización al backend (se ejecuta en segundo plano)
         const response = await fetch('/api/trigger_update', {
             method: 'POST'
         });
 
-        const result = await response.json();
+        const job = await response.json();
+        const result = job.success ? await waitForUpdateJob(job.status_url) : job;
 
-        if (result.success) {
+        if (result.status === 'succeeded') {
             // Cargar los nuevos datos
             await loadSecurityData();
 
@@ -1709,6 +1725,9 @@ document.addEventListener('DOMContentLoaded', function () {
     // Cargar las últimas noticias
     loadLatestNews();
 
+    // Recibir avisos de datos nuevos en lugar de recargar manualmente
+    connectUpdateStream();
+
     // Configurar eventos de botones
     document.getElementById('search-municipality').addEventListener('click', searchMunicipality);
     document.getElementById('municipality-select').addEventListener('change', searchMunicipality);
@@ -1721,4 +1740,84 @@ document.addEventListener('DOMContentLoaded', function () {
     document.getElementById('info-content').classList.add('active');
     document.addEventListener('DOMContentLoaded', fetchAndUpdateChart);
 
-});
\ No newline at end of file
+});
+// Canal de actualizaciones en tiempo real (Server-Sent Events)
+// Si el servidor no acepta la conexión se consultan los datos periódicamente
+const FALLBACK_POLL_INTERVAL = 60000;
+const STREAM_RECONNECT_DELAY = 60000;
+let updateStream = null;
+let fallbackPollTimer = null;
+let knownVersions = null;
+
+// Devuelve los nombres de los datos cuya versión cambió desde el último evento
+function changedVersions(versions) {
+    if (!knownVersions) {
+        knownVersions = versions;
+        return [];
+    }
+    const changed = Object.keys(versions).filter(name => knownVersions[name] !== versions[name]);
+    knownVersions = versions;
+    return changed;
+}
+
+async function reloadChangedData(changed) {
+    if (changed.includes('security_data') || changed.includes('history')) {
+        await loadSecurityData();
+        await loadLatestNews();
+    } else if (changed.includes('citizen_reports')) {
+        await loadAllIncidents();
+    }
+}
+
+function startFallbackPolling() {
+    if (fallbackPollTimer) return;
+    // Las respuestas llevan ETag: si nada cambió el servidor contesta 304 sin cuerpo
+    fallbackPollTimer = setInterval(loadSecurityData, FALLBACK_POLL_INTERVAL);
+}
+
+function stopFallbackPolling() {
+    if (fallbackPollTimer) {
+        clearInterval(fallbackPollTimer);
+        fallbackPollTimer = null;
+    }
+}
+
+function connectUpdateStream() {
+    if (!window.EventSource) {
+        startFallbackPolling();
+        return;
+    }
+
+    updateStream = new EventSource('/api/stream');
+
+    // Al (re)conectar el servidor envía las versiones actuales
+    updateStream.addEventListener('hello', event => {
+        stopFallbackPolling();
+        const changed = changedVersions(JSON.parse(event.data).versions);
+        if (changed.length) {
+            reloadChangedData(changed);
+        }
+    });
+
+    updateStream.addEventListener('update', event => {
+        const data = JSON.parse(event.data);
+        const changed = changedVersions(data.versions);
+        const newReports = (data.delta && data.delta.citizen_reports) || [];
+
+        if (newReports.length) {
+            showNotification(`Nuevo reporte ciudadano: ${newReports[newReports.length - 1].description}`, 'info');
+        } else if (changed.includes('security_data')) {
+            showNotification('Nueva información disponible', 'info');
+        }
+        reloadChangedData(changed);
+    });
+
+    updateStream.onerror = () => {
+        // El navegador reconecta solo; si el servidor rechazó la conexión (límite de clientes) queda cerrada
+        if (updateStream.readyState === EventSource.CLOSED) {
+            updateStream = null;
+            startFallbackPolling();
+            setTimeout(connectUpdateStream, STREAM_RECONNECT_DELAY);
+        }
+    };
+}
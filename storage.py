@@ -0,0 +1,662 @@
+# storage.py
+# Acceso a los archivos de datos compartidos entre el pipeline y la API web
+
+import os
+import json
+import time
+import bisect
+import sqlite3
+import threading
+import logging
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_local_file_lock = threading.Lock()
+
+# Copia inmutable del contenido de un archivo junto con su versión
+Snapshot = namedtuple("Snapshot", ["data", "version", "loaded_at"])
+
+
+# Escribir un JSON de forma atómica: los lectores ven el archivo anterior o el nuevo, nunca uno a medias
+def write_json_atomic(path, data, indent=2):
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Versión de un archivo a partir de su inode, fecha de modificación y tamaño
+def file_version(stat_result):
+    return f"{stat_result.st_ino:x}-{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+
+class FileSnapshot:
+    """Copia en memoria de un archivo JSON que se recarga solo cuando el archivo cambia.
+
+    ``get()`` no toca disco salvo una comprobación de ``stat`` como máximo cada
+    ``check_interval`` segundos; si el inode, la fecha de modificación o el tamaño
+    cambiaron, el archivo se vuelve a leer y la nueva copia se intercambia de forma
+    atómica. Los datos devueltos se comparten entre peticiones y no deben modificarse.
+    """
+
+    def __init__(self, path, default, check_interval=1.0, loader=None):
+        self.path = path
+        self.default = default
+        self.check_interval = check_interval
+        self.loader = loader
+        self._snapshot = Snapshot(default, "vacio", 0.0)
+        self._next_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._refresh()
+        return self._snapshot
+
+    def reload(self):
+        """Fuerza la comprobación del archivo (por ejemplo, tras publicar el pipeline)."""
+        self._next_check = time.monotonic() + self.check_interval
+        self._refresh(force=True)
+        return self._snapshot
+
+    def publish(self, data):
+        """Escribe ``data`` en el archivo y lo publica como la copia actual."""
+        with self._reload_lock:
+            write_json_atomic(self.path, data)
+            version = file_version(os.stat(self.path))
+            self._snapshot = Snapshot(data, version, time.time())
+        return self._snapshot
+
+    def _refresh(self, force=False):
+        # Solo un hilo recarga; los demás siguen sirviendo la copia anterior
+        if not self._reload_lock.acquire(blocking=force):
+            return
+        try:
+            try:
+                stat_result = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            version = file_version(stat_result)
+            if version == self._snapshot.version:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if self.loader:
+                data = self.loader(data)
+            self._snapshot = Snapshot(data, version, time.time())
+            logger.info(f"Copia en memoria de {self.path} actualizada (versión {version})")
+        except Exception as e:
+            # Conservar la copia anterior si el archivo no se puede leer
+            logger.error(f"Error al recargar {self.path}: {str(e)}")
+        finally:
+            self._reload_lock.release()
+
+
+class HistoricalStore:
+    """Historial de ciclos del pipeline en SQLite, indexado por timestamp.
+
+    Cada ciclo es una fila con su JSON completo. Insertar es un ``INSERT`` y las
+    consultas por rango usan el índice de ``timestamp``, de modo que no hace falta
+    cargar todo el historial en memoria.
+    """
+
+    def __init__(self, path, max_entries=None):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+    def _iterate(self, sql, params=()):
+        """Recorre las filas de una consulta sin cargarlas todas en memoria.
+
+        Usa una conexión propia (WAL permite lectores concurrentes) para no retener el
+        candado compartido mientras quien consume el iterador procesa cada fila.
+        """
+        with self._lock:
+            self._connection()
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            yield from conn.execute(sql, params)
+        finally:
+            conn.close()
+
+    def import_json(self, json_path):
+        """Importa el antiguo ``historical_data.json`` si el almacén está vacío."""
+        if not os.path.exists(json_path):
+            return 0
+        with self._lock:
+            conn = self._connection()
+            # Transacción exclusiva para que dos procesos no importen el archivo a la vez
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] > 0:
+                    conn.rollback()
+                    return 0
+                with open(json_path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+                # El archivo JSON guarda el más reciente primero; se insertan del más antiguo al más nuevo
+                conn.executemany(
+                    "INSERT INTO history (timestamp, data) VALUES (?, ?)",
+                    [(entry.get("timestamp", ""), json.dumps(entry, ensure_ascii=False)) for entry in reversed(entries)]
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        logger.info(f"Importados {len(entries)} registros históricos desde {json_path}")
+        return len(entries)
+
+    def append(self, entry):
+        """Inserta un ciclo y devuelve los registros eliminados por el límite ``max_entries``."""
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "INSERT INTO history (timestamp, data) VALUES (?, ?)",
+                (entry.get("timestamp", ""), json.dumps(entry, ensure_ascii=False))
+            )
+            pruned = []
+            if self.max_entries:
+                # Conservar solo los últimos max_entries registros
+                cutoff_id = cursor.lastrowid - self.max_entries
+                pruned = [json.loads(row[0]) for row in conn.execute(
+                    "SELECT data FROM history WHERE id <= ?", (cutoff_id,)
+                )]
+                conn.execute("DELETE FROM history WHERE id <= ?", (cutoff_id,))
+            conn.commit()
+            return pruned
+
+    def schema_version(self):
+        """Versión de los datos guardados (``PRAGMA user_version``); la suben las migraciones."""
+        return self._query("PRAGMA user_version")[0][0]
+
+    def migrate(self, version, transform, where="1", batch_size=500):
+        """Migración de datos de una sola vez: guarda ``transform(registro)`` en las filas que cumplen ``where``.
+
+        Solo se ejecuta si ``schema_version()`` es menor que ``version`` y al terminar la
+        sube, así que las siguientes aperturas no vuelven a recorrer el historial. Las filas
+        se leen del cursor y se escriben por lotes; ``transform`` devuelve ``None`` para
+        dejar un registro como está. Devuelve cuántos registros cambiaron.
+        """
+        if self.schema_version() >= version:
+            return 0
+        updated = 0
+        batch = []
+        for row_id, data in self._iterate(f"SELECT id, data FROM history WHERE {where}"):
+            entry = transform(json.loads(data))
+            if entry is not None:
+                batch.append((json.dumps(entry, ensure_ascii=False), row_id))
+            if len(batch) >= batch_size:
+                updated += self._update_rows(batch)
+                batch = []
+        updated += self._update_rows(batch)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        return updated
+
+    def _update_rows(self, rows):
+        if rows:
+            with self._lock:
+                conn = self._connection()
+                conn.executemany("UPDATE history SET data = ? WHERE id = ?", rows)
+                conn.commit()
+        return len(rows)
+
+    def latest(self, limit):
+        """Los ``limit`` registros más recientes, del más nuevo al más antiguo."""
+        rows = self._query("SELECT data FROM history ORDER BY id DESC LIMIT ?", (limit,))
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_since(self, cutoff_iso):
+        """Registros con ``timestamp >= cutoff_iso`` usando el índice, del más nuevo al más antiguo."""
+        rows = self._iterate(
+            "SELECT data FROM history WHERE timestamp >= ? ORDER BY timestamp DESC, id DESC", (cutoff_iso,)
+        )
+        for row in rows:
+            yield json.loads(row[0])
+
+    def since(self, cutoff_iso):
+        """Lista de los registros de ``iter_since``."""
+        return list(self.iter_since(cutoff_iso))
+
+    def count_since(self, cutoff_iso):
+        """Número de registros con ``timestamp >= cutoff_iso`` (solo consulta el índice)."""
+        return self._query("SELECT COUNT(*) FROM history WHERE timestamp >= ?", (cutoff_iso,))[0][0]
+
+    def iter_all(self):
+        """Todos los registros, del más nuevo al más antiguo."""
+        for row in self._iterate("SELECT data FROM history ORDER BY id DESC"):
+            yield json.loads(row[0])
+
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM history")[0][0]
+
+    def version(self):
+        """Identificador que cambia cuando se inserta o elimina un registro (también desde otro proceso)."""
+        last_id, total = self._query("SELECT MAX(id), COUNT(*) FROM history")[0]
+        return f"{last_id or 0}-{total}"
+
+
+class CitizenReportLog:
+    """Registro append-only de reportes ciudadanos (JSON Lines) con commit agrupado.
+
+    Cada reporte es una línea. ``append`` encola el reporte y espera a que un hilo
+    escritor lo confirme: el escritor junta todos los reportes pendientes, los escribe
+    con una sola llamada y hace un único ``fsync`` por lote, de modo que la latencia
+    de cada envío no depende del número de reportes guardados. Periódicamente el
+    archivo se compacta para descartar reportes más antiguos que ``retention_days``.
+
+    Otros procesos que comparten el archivo se siguen leyendo solo las líneas nuevas
+    desde el último desplazamiento conocido; si el archivo fue compactado (cambió el
+    inode) se vuelve a leer completo.
+    """
+
+    def __init__(self, path, retention_days=1, check_interval=1.0, commit_window=0.005,
+                 compaction_interval=3600):
+        self.path = path
+        self.retention_days = retention_days
+        self.check_interval = check_interval
+        self.commit_window = commit_window
+        self.compaction_interval = compaction_interval
+
+        # Reportes en orden de llegada y sus timestamps (para búsquedas por rango con bisect)
+        self._reports = []
+        self._timestamps = []
+        self._inode = None
+        self._offset = 0
+        self._next_check = 0.0
+        self._last_compaction = time.monotonic()
+        self._state_lock = threading.RLock()
+
+        self._pending = []
+        self._pending_cond = threading.Condition()
+        self._writer = None
+        self._writer_pid = None
+
+        self._listeners = []
+
+    # --- Lectura ---
+
+    def reports(self):
+        """Copia de todos los reportes vigentes en orden de llegada."""
+        self._maybe_refresh()
+        with self._state_lock:
+            return list(self._reports)
+
+    def since(self, cutoff_iso):
+        """Reportes con ``timestamp >= cutoff_iso``."""
+        self._maybe_refresh()
+        with self._state_lock:
+            start = bisect.bisect_left(self._timestamps, cutoff_iso)
+            return self._reports[start:]
+
+    def count_since(self, cutoff_iso):
+        """Número de reportes con ``timestamp >= cutoff_iso`` (sin copiar la lista)."""
+        self._maybe_refresh()
+        with self._state_lock:
+            return len(self._timestamps) - bisect.bisect_left(self._timestamps, cutoff_iso)
+
+    def __len__(self):
+        return len(self._reports)
+
+    def version(self):
+        """Identificador que cambia cuando se añaden reportes o se compacta el registro."""
+        self._maybe_refresh()
+        return f"{self._inode or 0:x}-{self._offset:x}"
+
+    def add_listener(self, on_report, on_reset):
+        """Registra funciones llamadas por cada reporte leído y cuando el registro se vuelve a leer completo."""
+        with self._state_lock:
+            self._listeners.append((on_report, on_reset))
+            for report in self._reports:
+                on_report(report)
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        if self._state_lock.acquire(blocking=False):
+            try:
+                self._catch_up()
+            except Exception as e:
+                logger.error(f"Error al leer {self.path}: {str(e)}")
+            finally:
+                self._state_lock.release()
+
+    def _catch_up(self):
+        # Leer las líneas añadidas por este u otros procesos desde el último desplazamiento
+        try:
+            stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat_result.st_ino != self._inode or stat_result.st_size < self._offset:
+            self._reports, self._timestamps = [], []
+            self._inode, self._offset = stat_result.st_ino, 0
+            for _, on_reset in self._listeners:
+                on_reset()
+        if stat_result.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        # Ignorar una posible última línea incompleta: se leerá en la siguiente pasada
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            if not line.strip():
+                continue
+            try:
+                report = json.loads(line)
+            except ValueError:
+                # Línea dañada (p. ej. una escritura interrumpida): se descarta sin detener la lectura
+                logger.warning(f"Línea ilegible en {self.path} descartada: {line[:80]!r}")
+                continue
+            self._add_in_memory(report)
+        self._offset += len(complete)
+
+    def _add_in_memory(self, report):
+        timestamp = report.get("timestamp", "")
+        if self._timestamps and timestamp < self._timestamps[-1]:
+            position = bisect.bisect_right(self._timestamps, timestamp)
+            self._timestamps.insert(position, timestamp)
+            self._reports.insert(position, report)
+        else:
+            self._timestamps.append(timestamp)
+            self._reports.append(report)
+        for on_report, _ in self._listeners:
+            on_report(report)
+
+    # --- Escritura ---
+
+    def open(self, legacy_json_path=None):
+        """Carga el registro e importa el antiguo ``citizen_reports.json`` si el registro no existe."""
+        with _exclusive_file_lock(self.path):
+            if legacy_json_path and not os.path.exists(self.path) and os.path.exists(legacy_json_path):
+                with open(legacy_json_path, "r", encoding="utf-8") as f:
+                    legacy_reports = json.load(f)
+                legacy_reports.sort(key=lambda report: report.get("timestamp", ""))
+                self._rewrite(legacy_reports)
+                logger.info(f"Importados {len(legacy_reports)} reportes ciudadanos desde {legacy_json_path}")
+            with self._state_lock:
+                self._catch_up()
+        self._next_check = time.monotonic() + self.check_interval
+        return self
+
+    def append(self, report, timeout=10):
+        """Guarda un reporte y espera a que su lote quede en disco."""
+        entry = {"report": report, "done": threading.Event(), "error": None}
+        with self._pending_cond:
+            self._pending.append(entry)
+            self._ensure_writer()
+            self._pending_cond.notify()
+        if not entry["done"].wait(timeout):
+            raise TimeoutError("El reporte no se confirmó a tiempo")
+        if entry["error"]:
+            raise entry["error"]
+
+    def _ensure_writer(self):
+        # El hilo escritor se arranca en el proceso que escribe (también después de un fork)
+        if self._writer is None or not self._writer.is_alive() or self._writer_pid != os.getpid():
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._writer_loop, name="citizen-report-log", daemon=True)
+            self._writer.start()
+
+    def _writer_loop(self):
+        while True:
+            with self._pending_cond:
+                if not self._pending:
+                    self._pending_cond.wait(timeout=self.compaction_interval)
+            if self._pending:
+                # Breve ventana para que lleguen más reportes al mismo lote
+                time.sleep(self.commit_window)
+                with self._pending_cond:
+                    batch, self._pending = self._pending, []
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    logger.error(f"Error al guardar reportes ciudadanos: {str(e)}")
+                    for entry in batch:
+                        entry["error"] = e
+                for entry in batch:
+                    entry["done"].set()
+            if time.monotonic() - self._last_compaction >= self.compaction_interval:
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error(f"Error al compactar {self.path}: {str(e)}")
+
+    def _commit(self, batch):
+        payload = "".join(json.dumps(entry["report"], ensure_ascii=False) + "\n" for entry in batch).encode("utf-8")
+        with _exclusive_file_lock(self.path):
+            with self._state_lock:
+                self._catch_up()
+                self._truncate_torn_tail()
+                offset = self._offset
+            # La escritura y el fsync solo retienen el bloqueo del archivo: los lectores
+            # siguen consultando la memoria mientras el lote llega al disco
+            with open(self.path, "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            with self._state_lock:
+                if self._offset == offset:
+                    # Lo mismo que leerían otros procesos, sin volver a leer el archivo
+                    for line in payload.splitlines():
+                        self._add_in_memory(json.loads(line))
+                    self._offset += len(payload)
+                else:
+                    # Un lector ya incorporó parte del lote mientras se escribía
+                    self._catch_up()
+        logger.info(f"Reportes ciudadanos confirmados: {len(batch)} en un lote")
+
+    def _truncate_torn_tail(self):
+        # Tras ``_catch_up`` todo lo anterior a ``_offset`` son líneas completas; lo que
+        # sigue solo puede ser una línea cortada por una caída (se escribe con el bloqueo
+        # tomado) y se descarta para que el siguiente reporte no quede pegado a ella
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size > self._offset:
+            logger.warning(f"Descartando {size - self._offset} bytes de una línea incompleta al final de {self.path}")
+            os.truncate(self.path, self._offset)
+
+    def compact(self):
+        """Reescribe el registro conservando solo los reportes dentro del periodo de retención."""
+        self._last_compaction = time.monotonic()
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        with _exclusive_file_lock(self.path), self._state_lock:
+            self._catch_up()
+            start = bisect.bisect_left(self._timestamps, cutoff)
+            if start == 0:
+                return
+            kept = self._reports[start:]
+            self._rewrite(kept)
+            self._catch_up()
+        logger.info(f"Registro de reportes compactado: {start} descartados, {len(kept)} conservados")
+
+    def _rewrite(self, reports):
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for report in reports:
+                f.write(json.dumps(report, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class JobStore:
+    """Estado de las ejecuciones del pipeline en SQLite, visible para todos los workers.
+
+    Cada trabajo es una fila con su JSON completo; el proceso que lo ejecuta la
+    reescribe al cambiar de etapa y cualquier otro proceso puede consultarla.
+    """
+
+    ACTIVE_STATUSES = ("queued", "running")
+
+    def __init__(self, path, max_entries=200):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT UNIQUE NOT NULL,
+                    status TEXT NOT NULL,
+                    finished_at TEXT,
+                    data TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def save(self, job):
+        """Inserta o actualiza el trabajo (un diccionario con ``job_id`` y ``status``)."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO jobs (id, status, finished_at, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, "
+                "finished_at = excluded.finished_at, data = excluded.data",
+                (job["job_id"], job["status"], job.get("finished_at"), json.dumps(job, ensure_ascii=False))
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE seq <= (SELECT MAX(seq) FROM jobs) - ?", (self.max_entries,)
+            )
+            conn.commit()
+
+    def _fetch_one(self, sql, params=()):
+        with self._lock:
+            row = self._connection().execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, job_id):
+        return self._fetch_one("SELECT data FROM jobs WHERE id = ?", (job_id,))
+
+    def active(self):
+        """El trabajo en curso más reciente, o ``None``."""
+        return self._fetch_one(
+            "SELECT data FROM jobs WHERE status IN (?, ?) ORDER BY seq DESC LIMIT 1", self.ACTIVE_STATUSES
+        )
+
+    def last_finished(self):
+        """El último trabajo terminado (con éxito o no), o ``None``."""
+        return self._fetch_one(
+            "SELECT data FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT 1"
+        )
+
+    def mark_interrupted(self, error):
+        """Marca como fallidos los trabajos que quedaron en curso (su proceso terminó)."""
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT data FROM jobs WHERE status IN (?, ?)", self.ACTIVE_STATUSES
+            ).fetchall()
+        for row in rows:
+            job = json.loads(row[0])
+            job.update(status="failed", error=error, finished_at=datetime.now().isoformat())
+            self.save(job)
+        return len(rows)
+
+
+class ProcessLock:
+    """Bloqueo exclusivo entre procesos que se conserva hasta ``release()``.
+
+    Usa ``flock`` sobre ``path``: el sistema lo libera solo si el proceso que lo tiene
+    termina, así que otro proceso puede tomar el relevo. Sin fcntl (Windows) solo
+    excluye dentro del proceso.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._local = threading.Lock()
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self, blocking=False):
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            if not self._local.acquire(blocking=blocking):
+                return False
+            self._file = True
+            return True
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if fcntl is None:
+            self._file = None
+            self._local.release()
+            return
+        lock_file, self._file = self._file, None
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+# Bloqueo exclusivo entre procesos sobre un archivo auxiliar ``<path>.lock``
+@contextmanager
+def _exclusive_file_lock(path):
+    if fcntl is None:
+        # Sin fcntl (Windows) solo se protege el acceso dentro del proceso
+        with _local_file_lock:
+            yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)